@@ -0,0 +1 @@
+"""SmartType benchmarks (run with: python -m benchmarks.bench_completion)."""
@@ -0,0 +1,181 @@
+"""
+SmartType - End-to-End Completion Benchmark
+=============================================
+Drives complete_with_ai, stream_with_ai and process_textfield through the
+real ``anthropic`` client against the local stand-in server and reports
+throughput and latency distributions. No network access or API key needed.
+
+    python -m benchmarks.bench_completion --profile lognormal:400,0.4,15 -n 200 -c 8
+"""
+
+import io
+import sys
+import time
+import argparse
+import warnings
+import tempfile
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import anthropic
+
+import smarttype.app as app
+from smarttype import latency
+from smarttype.backend import SimulatedTextField
+from smarttype.cache import CompletionCache
+from smarttype.latency import percentile
+from benchmarks.fake_anthropic import FakeAnthropicServer, LatencyProfile
+
+INPUTS = [
+    "ih mss mrgn zm arzt ghn",
+    "wln wr eign ma schw ghn",
+    "ih hbe sps bei vln din abr bsors brtsple",
+    "Knnst du mr den wg zum bhnhf erkrn",
+    "ds wttr ist hte shr schn",
+]
+
+
+def _row(label: str, values: list, wall: float = None) -> str:
+    ms = [v * 1000 for v in values]
+    rate = f"{len(values) / wall:>8.1f}/s" if wall else " " * 10
+    return (f"  {label:<28} {len(values):>5} {rate} {percentile(ms, 50):>8.1f}"
+            f" {percentile(ms, 90):>8.1f} {percentile(ms, 99):>8.1f}")
+
+
+def _run_concurrent(fn, n: int, concurrency: int):
+    """Calls fn(i) n times on a thread pool; returns (per-call results, wall time)."""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(fn, range(n)))
+    return results, time.perf_counter() - start
+
+
+def bench_create(n: int, concurrency: int):
+    def one(i):
+        start = time.perf_counter()
+        app.complete_with_ai(INPUTS[i % len(INPUTS)])
+        return time.perf_counter() - start
+    return _run_concurrent(one, n, concurrency)
+
+
+def bench_stream(n: int, concurrency: int):
+    def one(i):
+        start = time.perf_counter()
+        first = None
+        for _ in app.stream_with_ai(INPUTS[i % len(INPUTS)]):
+            if first is None:
+                first = time.perf_counter() - start
+        return first, time.perf_counter() - start
+    return _run_concurrent(one, n, concurrency)
+
+
+def bench_pipeline(n: int, log_path: Path, delays: dict):
+    """Runs process_textfield against a simulated field in real time; returns the traced spans."""
+    field = SimulatedTextField(delays=delays, realtime=True)
+    app.backend = field
+    latency.configure_log(log_path)
+    for i in range(n):
+        field.type(INPUTS[i % len(INPUTS)])
+        app.process_textfield()
+    return [r["spans"] for r in latency.read_records(log_path) if r.get("outcome") == "ok"]
+
+
+def bench_field(n: int, cache_dir: Path, server: FakeAnthropicServer):
+    """Runs process_textfield on cache hits in simulated time: capture, parse and replace only.
+
+    Returns the wall time and the number of runs that reached the server.
+    """
+    app.completion_cache = CompletionCache(cache_dir / "cache.sqlite3")
+    field = SimulatedTextField()
+    app.backend = field
+    # Warm the cache with the exact input of each mode: the full line includes "Notiz: ..."
+    for marker in (True, False):
+        app.marker_mode = marker
+        for text in INPUTS:
+            field.type("Notiz: ..." + text)
+            app.process_textfield()
+    latency.configure_log(cache_dir / "field.jsonl")
+    requests = sum(server.requests.values())
+    start = time.perf_counter()
+    for i in range(n):
+        field.type("Notiz: ..." + INPUTS[i % len(INPUTS)])
+        app.marker_mode = i % 2 == 0
+        app.process_textfield()
+    wall = time.perf_counter() - start
+    app.marker_mode = False
+    app.completion_cache.close()
+    app.completion_cache = None
+    return wall, sum(server.requests.values()) - requests
+
+
+def parse_delays(spec: str) -> dict:
+    """Parses "copy=0.05,paste=0.02,key=0" into a delay dict (seconds)."""
+    delays = {}
+    for part in filter(None, spec.split(",")):
+        name, _, value = part.partition("=")
+        delays[name.strip()] = float(value)
+    return delays
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SmartType end-to-end completion benchmark")
+    parser.add_argument("--profile", default="lognormal:400,0.4,15",
+                        help="latency profile of the stand-in server (see benchmarks/fake_anthropic.py)")
+    parser.add_argument("-n", "--requests", type=int, default=100, help="requests per API scenario")
+    parser.add_argument("-c", "--concurrency", type=int, default=8)
+    parser.add_argument("--pipeline", type=int, default=10,
+                        help="process_textfield runs in real time against the simulated app")
+    parser.add_argument("--field-delays", default="copy=0.02,paste=0.01",
+                        help="response times of the simulated app in the pipeline runs (seconds)")
+    parser.add_argument("--field", type=int, default=5000,
+                        help="process_textfield runs on cache hits in simulated time")
+    args = parser.parse_args(argv)
+    # Model deprecation notices from the client are noise here
+    warnings.simplefilter("ignore", DeprecationWarning)
+
+    server = FakeAnthropicServer(LatencyProfile.parse(args.profile)).start()
+    app.async_client = anthropic.AsyncAnthropic(api_key="benchmark", base_url=server.url, max_retries=0)
+    app.PROMPTS.update(app.load_prompts())
+    app.current_prompt = app.PROMPTS[app.current_language]
+    app.completion_cache = None
+
+    print(f"\n  Stand-in server {server.url}, profile {args.profile}")
+    print(f"  {'':<28} {'n':>5} {'rate':>10} {'p50':>8} {'p90':>8} {'p99':>8}   (ms)")
+
+    # SmartType's own progress output would drown the report
+    quiet = contextlib.redirect_stdout(io.StringIO())
+
+    with quiet:
+        totals, wall = bench_create(args.requests, args.concurrency)
+    print(_row("complete_with_ai", totals, wall))
+
+    with quiet:
+        results, wall = bench_stream(args.requests, args.concurrency)
+    print(_row("stream_with_ai ttfb", [r[0] for r in results]))
+    print(_row("stream_with_ai total", [r[1] for r in results], wall))
+
+    if args.pipeline:
+        with tempfile.TemporaryDirectory() as tmp, quiet:
+            spans = bench_pipeline(args.pipeline, Path(tmp) / "latency.jsonl",
+                                   parse_delays(args.field_delays))
+        for phase in latency.PHASES:
+            values = [s[phase] / 1000 for s in spans if phase in s]
+            if values:
+                print(_row(f"pipeline {phase}", values))
+
+    if args.field:
+        with tempfile.TemporaryDirectory() as tmp, quiet:
+            wall, misses = bench_field(args.field, Path(tmp), server)
+        print(f"  {'simulated field (cache hits)':<28} {args.field:>5} {args.field / wall:>8.1f}/s")
+        if misses:
+            print(f"  WARNING: {misses} of the cache hit runs reached the server")
+
+    server.stop()
+    print(f"\n  Server requests: {server.requests}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+SmartType - Startup Import Benchmark
+======================================
+Imports the modules SmartType needs before its hotkeys are registered in
+fresh interpreters with ``python -X importtime`` and reports the import
+time and the slowest modules. Fails (exit code 1) when a module that
+belongs in the background warm-up is imported at startup, or when the
+median import time exceeds ``--budget``.
+
+    python -m benchmarks.bench_import -n 10 --budget 300
+"""
+
+import os
+import sys
+import argparse
+import subprocess
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from smarttype.latency import percentile
+
+# Loaded by the warm-up thread or on first use, never before the hotkeys are ready
+DEFERRED = ["anthropic", "httpx", "pydantic", "tkinter", "smarttype.connection", "smarttype.batch"]
+
+
+def import_times(module: str) -> dict:
+    """Imports module in a fresh interpreter; returns {module: (self us, cumulative us)}."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr}")
+    times = {}
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = (int(own), int(cumulative))
+    return times
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SmartType startup import benchmark")
+    parser.add_argument("-m", "--module", default="smarttype.cli", help="module to import (default: smarttype.cli)")
+    parser.add_argument("-n", "--runs", type=int, default=5, help="fresh interpreters to import it in")
+    parser.add_argument("--top", type=int, default=15, help="slowest modules to list")
+    parser.add_argument("--budget", type=float, help="fail when the median import takes longer (ms)")
+    args = parser.parse_args(argv)
+
+    runs = [import_times(args.module) for _ in range(args.runs)]
+    totals = [run[args.module][1] / 1000 for run in runs]
+    print(f"\n  import {args.module}: {args.runs} runs, p50 {percentile(totals, 50):.1f} ms,"
+          f" min {min(totals):.1f} ms, max {max(totals):.1f} ms")
+
+    # Median self time per module over the runs
+    own = {}
+    for run in runs:
+        for name, (self_us, _) in run.items():
+            own.setdefault(name, []).append(self_us / 1000)
+    slowest = sorted(own.items(), key=lambda item: percentile(item[1], 50), reverse=True)[:args.top]
+    print("\n  Slowest modules (self time, ms)")
+    for name, values in slowest:
+        print(f"  {name:<50} {percentile(values, 50):>8.2f}")
+
+    failed = False
+    loaded = [name for name in DEFERRED if name in runs[0]]
+    if loaded:
+        print(f"\n  FAIL: imported at startup, should be deferred: {', '.join(loaded)}")
+        failed = True
+    if args.budget is not None and percentile(totals, 50) > args.budget:
+        print(f"\n  FAIL: p50 {percentile(totals, 50):.1f} ms over the budget of {args.budget:g} ms")
+        failed = True
+    print()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,213 @@
+"""
+SmartType - Local Stand-in for the Anthropic Messages API
+===========================================================
+A small HTTP server that speaks enough of the Messages API (JSON and SSE
+streaming) for the real ``anthropic`` client, with configurable latency
+profiles. Used by the benchmarks; needs no network access or API key.
+
+Latency profiles (all times in milliseconds):
+  fixed:FIRST[,PER_TOKEN]                  constant time to first token
+  lognormal:MEDIAN,SIGMA[,PER_TOKEN]       log-normally distributed first token
+  slow-first:NORMAL,SLOW,SHARE[,PER_TOKEN] a SHARE (0..1) of requests has a slow first token
+"""
+
+import json
+import math
+import time
+import sys
+import random
+import threading
+import itertools
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class LatencyProfile:
+    """Time to first token and time per further token of a fake response."""
+
+    def __init__(self, kind: str = "fixed", first_ms: float = 300, per_token_ms: float = 15,
+                 sigma: float = 0.0, slow_ms: float = 0.0, slow_share: float = 0.0, seed: int = 0):
+        self.kind = kind
+        self.first_ms = first_ms
+        self.per_token_ms = per_token_ms
+        self.sigma = sigma
+        self.slow_ms = slow_ms
+        self.slow_share = slow_share
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyProfile":
+        """Parses a profile spec such as "lognormal:400,0.5,15"."""
+        kind, _, args = spec.partition(":")
+        values = [float(v) for v in args.split(",") if v.strip()]
+        if kind == "fixed":
+            return cls("fixed", *values[:2])
+        if kind == "lognormal":
+            first, sigma, *rest = values
+            return cls("lognormal", first, *rest[:1], sigma=sigma)
+        if kind == "slow-first":
+            first, slow, share, *rest = values
+            return cls("slow-first", first, *rest[:1], slow_ms=slow, slow_share=share)
+        raise ValueError(f"Unknown latency profile: {spec}")
+
+    def first_token_delay(self) -> float:
+        """Returns the delay before the first token in seconds."""
+        with self._lock:
+            if self.kind == "lognormal":
+                ms = self.first_ms * math.exp(self._random.gauss(0.0, self.sigma))
+            elif self.kind == "slow-first" and self._random.random() < self.slow_share:
+                ms = self.slow_ms
+            else:
+                ms = self.first_ms
+        return ms / 1000
+
+    def token_delay(self) -> float:
+        """Returns the delay between two streamed tokens in seconds."""
+        return self.per_token_ms / 1000
+
+
+def fake_completion(user_message: str) -> str:
+    """Deterministic stand-in answer: the abbreviated text as a sentence."""
+    text = user_message.rsplit(": ", 1)[-1].split("\n\nFollowing context:")[0].strip()
+    if not text:
+        return "."
+    text = text[0].upper() + text[1:]
+    return text if text[-1] in ".!?" else text + "."
+
+
+def _tokens(text: str) -> list:
+    """Splits text into word-sized pieces like the API streams them."""
+    words = text.split(" ")
+    return [w if i == 0 else " " + w for i, w in enumerate(words)]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "FakeAnthropic/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(body)))
+        self.send_header("request-id", payload.get("id", "req_fake"))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.split("?")[0] == "/v1/models":
+            self.server.count("models")
+            self._send_json(200, {"data": [], "has_more": False, "first_id": None, "last_id": None})
+        else:
+            self._send_json(404, {"type": "error", "error": {"type": "not_found_error", "message": self.path}})
+
+    def do_POST(self):
+        length = int(self.headers.get("content-length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if self.path.split("?")[0] != "/v1/messages":
+            self._send_json(404, {"type": "error", "error": {"type": "not_found_error", "message": self.path}})
+            return
+
+        self.server.count("messages")
+        content = request["messages"][-1]["content"]
+        if isinstance(content, list):
+            content = "".join(block.get("text", "") for block in content)
+        answer = fake_completion(content)
+        tokens = _tokens(answer)
+        message_id = f"msg_fake_{next(self.server.ids)}"
+        usage = {"input_tokens": max(1, len(content) // 4), "output_tokens": len(tokens),
+                 "cache_read_input_tokens": 0, "cache_creation_input_tokens": 0}
+        message = {
+            "id": message_id, "type": "message", "role": "assistant",
+            "model": request.get("model", "fake"), "content": [],
+            "stop_reason": None, "stop_sequence": None, "usage": usage,
+        }
+        profile = self.server.profile
+        time.sleep(profile.first_token_delay())
+
+        if not request.get("stream"):
+            time.sleep(profile.token_delay() * (len(tokens) - 1))
+            message["content"] = [{"type": "text", "text": answer}]
+            message["stop_reason"] = "end_turn"
+            self._send_json(200, message)
+            return
+
+        self.send_response(200)
+        self.send_header("content-type", "text/event-stream")
+        self.send_header("cache-control", "no-cache")
+        self.send_header("transfer-encoding", "chunked")
+        self.end_headers()
+
+        def event(name, data):
+            chunk = f"event: {name}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(chunk):x}\r\n".encode("ascii") + chunk + b"\r\n")
+            self.wfile.flush()
+
+        event("message_start", {"type": "message_start", "message": {**message, "usage": {**usage, "output_tokens": 1}}})
+        event("content_block_start", {"type": "content_block_start", "index": 0,
+                                      "content_block": {"type": "text", "text": ""}})
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(profile.token_delay())
+            event("content_block_delta", {"type": "content_block_delta", "index": 0,
+                                          "delta": {"type": "text_delta", "text": token}})
+        event("content_block_stop", {"type": "content_block_stop", "index": 0})
+        event("message_delta", {"type": "message_delta",
+                                "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                                "usage": {"output_tokens": len(tokens)}})
+        event("message_stop", {"type": "message_stop"})
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class FakeAnthropicServer(ThreadingHTTPServer):
+    """Threaded local server; use ``url`` as the client's base_url."""
+
+    daemon_threads = True
+
+    def __init__(self, profile: LatencyProfile = None, port: int = 0):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.profile = profile or LatencyProfile()
+        self.ids = itertools.count(1)
+        self.requests = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def count(self, endpoint: str):
+        with self._lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+
+    def handle_error(self, request, client_address):
+        # Clients that give up on a slow response (timeouts, cancellation) are expected
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def start(self) -> "FakeAnthropicServer":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Local stand-in for the Anthropic Messages API")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--profile", default="fixed:300,15", help="latency profile (see module docstring)")
+    args = parser.parse_args()
+    server = FakeAnthropicServer(LatencyProfile.parse(args.profile), port=args.port)
+    print(f"Fake Anthropic API on {server.url} ({args.profile})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
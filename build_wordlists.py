@@ -0,0 +1,188 @@
+"""
+SmartType - Word List Builder
+===============================
+Regenerates smarttype/wordlists/words_de.txt and words_en.txt, the
+frequency-sorted word lists behind local abbreviation expansion, from
+the wordfreq frequency data. wordfreq lowercases every word and spells ß
+as ss: German nouns are capitalized and ß is restored from the Wiktionary
+noun forms in german_nouns, and a word that is also a verb form ("gehen" /
+"Gehen") is listed in both spellings, so the index never trusts either
+one. The build-only
+dependencies are not needed to run SmartType:
+
+    pip install wordfreq german-nouns
+    python build_wordlists.py --size 50000
+"""
+
+import re
+import argparse
+from pathlib import Path
+
+WORDLISTS = Path(__file__).parent / "smarttype" / "wordlists"
+
+HEADERS = {
+    "de": "Häufige deutsche Wörter, nach Häufigkeit sortiert (ein Wort pro Zeile).",
+    "en": "Common English words, sorted by frequency (one word per line).",
+}
+
+ATTRIBUTION = """\
+Generated by build_wordlists.py from wordfreq (https://github.com/rspeer/wordfreq, Robyn Speer){nouns}.
+This word list is licensed under CC BY-SA 4.0 (https://creativecommons.org/licenses/by-sa/4.0/)."""
+
+# Spellings that differ from the rules (lowercase, German nouns capitalized)
+OVERRIDES = {
+    "de": ["morgen", "abend", "sie", "ihr", "ihnen", "ihre", "ihrer", "ihren", "ihrem", "ihres"],
+    "en": ["I", "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday",
+           "January", "February", "April", "June", "July", "August", "September",
+           "October", "November", "December", "English", "German"],
+}
+
+# Function words that Wiktionary also lists as nominalized nouns ("das Ich", "das Für")
+LOWERCASE = {
+    "de": {
+        "ich", "du", "ist", "von", "für", "fürs", "bei", "aus", "wenn", "werden", "werde", "werd",
+        "man", "ja", "nein", "mehr", "mir", "jetzt", "muss", "soll", "gegen", "gegenüber", "trotz",
+        "etwas", "nichts", "nix", "niemand", "heute", "gestern", "wohl", "selbst", "halt", "fort",
+        "gewesen", "hoch", "bisschen", "leider", "danke", "schade", "hallo", "ach", "au", "weh",
+        "falls", "links", "rechts", "mitten", "sowieso", "miteinander", "zuhause", "voraus",
+        "abends", "morgens", "anfangs", "namens", "teils", "mittels", "angesichts",
+        "null", "eins", "zwei", "drei", "vier", "fünf", "sechs", "sieben", "acht", "neun", "zehn",
+        "elf", "zwölf", "hundert", "tausend", "super", "extra", "top", "live", "ex",
+        "gelassen", "gewann", "trug", "schrieb", "schau", "prima", "wider", "mangels", "eigens",
+        "nachmittags", "sonntags",
+        "to", "on", "no", "as", "my", "el", "air", "german",
+    },
+    "en": set(),
+}
+
+# Words are letters only and contain a vowel: chat spellings like "mrgn" or
+# "wnt" are exactly the abbreviations that have to be expanded
+LETTERS = {"de": re.compile(r"^[a-zäöüß]*[aeiouyäöü][a-zäöüß]*$"),
+           "en": re.compile(r"^[a-z]*[aeiouy][a-z]*$")}
+
+# Words of one or two letters: wordfreq's others are mostly abbreviations ("mr", "yu", "zb")
+SHORT = {
+    "de": {"in", "zu", "es", "im", "er", "an", "so", "du", "am", "um", "da", "ja", "ab", "wo", "ob",
+           "je", "oh", "ok", "na", "eh", "ha", "ah", "hi", "au", "ei", "öl", "nö", "äh"},
+    "en": {"a", "i", "to", "of", "in", "is", "it", "on", "be", "as", "at", "he", "by", "my", "or",
+           "we", "an", "so", "me", "if", "up", "do", "no", "us", "go", "am", "oh", "ok", "hi", "ex",
+           "ah", "ha", "eh", "uh", "um", "ye", "ya", "yo", "ox", "ax", "aw", "lo", "ma", "pa"},
+}
+
+# Verb forms around a stem: "mach" -> "machen", "macht", "mache", "machst", "machte";
+# "wart" -> "warten", "wartet", "wartest", "wartete"
+VERB_ENDINGS = ("en", "t", "e", "st", "te", "et", "est", "ete")
+
+ADJECTIVE_ENDINGS = ("e", "en", "er", "es", "em")
+
+
+def german_nouns() -> tuple:
+    """{lowercase form: capitalized form} of the German common nouns, the lowercase
+    noun lemmas ending like an infinitive ("gehen" from "das Gehen"), every
+    lowercase form spelled with ß (wordfreq folds "Straße" to "strasse") and
+    the noun forms spelled with ss."""
+    from german_nouns.lookup import Nouns
+
+    forms = {}
+    infinitives = set()
+    sharp = set()
+    plain = set()
+    table = Nouns()
+    for row in table.data:
+        entry = table.row_to_dict(row)
+        pos = entry.get("pos", ())
+        spellings = [form for form in entry.get("flexion", {}).values() if form and " " not in form]
+        sharp.update(form.lower() for form in spellings if "ß" in form)
+        if "adjektivische Deklination" in pos:
+            # "das Große": the adjective "groß" is spelled with ß as well
+            sharp.update(form.lower().rstrip("emnrs") for form in spellings if "ß" in form)
+        if list(pos) != ["Substantiv"]:
+            # Names, places, abbreviations and "das Gute" style adjectives stay lowercase
+            continue
+        for form in spellings:
+            if form[0].isupper() and form[1:].islower():
+                forms.setdefault(form.lower(), form)
+                if "ss" in form:
+                    plain.add(form.lower())
+        lemma = entry.get("lemma") or ""
+        if lemma.endswith(("en", "ln", "rn")):
+            infinitives.add(lemma.lower())
+    return forms, infinitives, sharp, plain
+
+
+def respell(word: str, sharp: set, plain: set) -> list:
+    """Undoes wordfreq's case folding of ß: "strasse" -> "straße", "weiss" -> "weiß".
+    Where both spellings are nouns ("Masse" / "Maße", "Ross" / "Roß") both are kept."""
+    if "ss" not in word:
+        return [word]
+    spelled = word.replace("ss", "ß")
+    if spelled in sharp:
+        return [word, spelled] if word in plain else [spelled]
+    # After a diphthong ss is ß ("heisst", "schliesslich"); "aus-s" is usually a
+    # compound ("aussehen"), so only "ausser" and "aussen" are respelled
+    word = re.sub(r"(?<=ei|ie|äu|eu)ss", "ß", word)
+    return [re.sub(r"^(dr)?(a|ä)uss(?=e[nr])", r"\1\2uß", word)]
+
+
+def build(language: str, size: int) -> list:
+    """Returns the spellings of the ``size`` most frequent words, most frequent first."""
+    from wordfreq import top_n_list
+
+    vocabulary = [w for w in top_n_list(language, size * 3, wordlist="large")
+                  if LETTERS[language].match(w) and (len(w) > 2 or w in SHORT[language])]
+    nouns, infinitives, sharp, plain = german_nouns() if language == "de" else ({}, set(), set(), set())
+    if language == "de":
+        vocabulary = list(dict.fromkeys(spelling for word in vocabulary
+                                        for spelling in respell(word, sharp, plain)))
+    known = set(vocabulary)
+    overrides = {word.lower(): word for word in OVERRIDES[language]}
+    lowercase = LOWERCASE[language]
+
+    def is_adjective(word):
+        # "gut": "gute", "guten", "guter", "gutes", "gutem"; "alte" from "alt"
+        stems = [word] + [word[:-len(ending)] for ending in ADJECTIVE_ENDINGS if word.endswith(ending)]
+        return any(sum(stem + ending in known for ending in ADJECTIVE_ENDINGS) >= 4 for stem in stems)
+
+    def is_verb(word):
+        # "macht" next to "machen", "gehen" next to "geht" and "gegangen"
+        stems = [word[:-len(ending)] for ending in VERB_ENDINGS if word.endswith(ending)]
+        return any(sum(form in known and (form not in nouns or form in infinitives)
+                       for form in [stem + ending for ending in VERB_ENDINGS] + ["ge" + stem + "t"]
+                       if form != word) >= 2
+                   for stem in stems if len(stem) > 1) \
+            or (word in infinitives and "ge" + word in known)
+
+    words = []
+    for word in vocabulary:
+        if len(words) >= size:
+            break
+        if word in overrides:
+            words.append(overrides[word])
+        elif word not in nouns or word in lowercase or is_adjective(word):
+            words.append(word)
+        elif is_verb(word):
+            # Verb and noun ("gehen" / "Gehen", "macht" / "Macht"): both spellings, neither trusted
+            words += [word, nouns[word]]
+        else:
+            words.append(nouns[word])
+    return words
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild the SmartType word lists")
+    parser.add_argument("--size", type=int, default=50000, help="words per language")
+    parser.add_argument("languages", nargs="*", default=["de", "en"])
+    args = parser.parse_args(argv)
+    for language in args.languages:
+        words = build(language, args.size)
+        nouns = "\nand german_nouns (https://github.com/gambolputty/german-nouns, Wiktionary)" \
+            if language == "de" else ""
+        header = [HEADERS[language], *ATTRIBUTION.format(nouns=nouns).splitlines()]
+        path = WORDLISTS / f"words_{language}.txt"
+        path.write_text("".join(f"# {line}\n" for line in header) + "\n".join(words) + "\n",
+                        encoding="utf-8")
+        print(f"{path}: {len(words)} words")
+
+
+if __name__ == "__main__":
+    main()
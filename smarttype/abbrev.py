@@ -0,0 +1,314 @@
+"""
+SmartType - Local Abbreviation Expansion
+==========================================
+Offline fast path: a SymSpell-style index that maps consonant skeletons
+and truncated words ("mrgn", "swmmng", "espcly") to dictionary words,
+built from per-language word lists and the user's own history.
+"""
+
+import re
+import pickle
+from itertools import combinations
+from pathlib import Path
+
+INDEX_VERSION = 2
+
+# Characters dropped when building a skeleton (the first letter is always kept)
+VOWELS = set("aeiouäöü")
+
+# Maximum number of skeleton characters that may be missing from an abbreviation
+MAX_DELETES = 2
+
+# Shortest truncated word that is looked up by prefix
+MIN_PREFIX = 3
+
+# Best candidate must outscore the runner-up, and any word missing from the
+# list, by this factor (and all other candidates together) to be trusted
+CONFIDENCE_RATIO = 4.0
+
+# Shortest token that is expanded to a longer word; shorter ones ("m", "wr")
+# match too many words and are only accepted as typed words
+MIN_ABBREVIATION = 3
+
+# Match quality by match type
+QUALITY_EXACT = 3.0
+QUALITY_SKELETON = 0.8
+QUALITY_DELETE = (0.8, 0.3, 0.1)
+QUALITY_PREFIX = 0.2
+
+# Weight of one use of a word in the user's history (word list weights are <= 0.1)
+HISTORY_WEIGHT = 0.02
+
+# Words that turn a sentence into a question when they come first: without
+# a typed "?" Claude decides on the punctuation and word order
+QUESTION_WORDS = {
+    "de": {"wie", "was", "wann", "wo", "wer", "warum", "wohin", "woher", "welche", "welcher",
+           "kannst", "hast", "willst", "bist", "möchtest", "könntest", "musst", "wollen", "sollen"},
+    "en": {"how", "what", "when", "where", "who", "why", "which", "can", "could", "do", "does",
+           "did", "are", "is", "will", "would", "should", "have", "may"},
+}
+
+# Subject pronouns: after an abbreviated verb ("wnt we") they point to a
+# question that needs its word order changed ("Do we want ...?")
+SUBJECT_PRONOUNS = {
+    "de": {"ich", "du", "er", "sie", "es", "wir", "ihr"},
+    "en": {"i", "you", "he", "she", "it", "we", "they"},
+}
+
+_TOKEN_RE = re.compile(r"^(\W*)([\w'’]+)(\W*)$")
+
+
+def fold(word: str) -> str:
+    """Lowercases a word and spells out ß."""
+    return word.lower().replace("ß", "ss")
+
+
+def skeleton(word: str) -> str:
+    """Returns the consonant skeleton of a word: vowels (except a leading
+    one) and doubled letters are dropped, so "swimming" becomes "swmng"."""
+    word = fold(word)
+    if not word:
+        return ""
+    out = [word[0]]
+    for ch in word[1:]:
+        if ch in VOWELS or ch == out[-1]:
+            continue
+        out.append(ch)
+    return "".join(out)
+
+
+def _is_subsequence(short: str, long: str) -> bool:
+    it = iter(long)
+    return all(ch in it for ch in short)
+
+
+def _deletes(skel: str, max_deletes: int):
+    """Yields (variant, distance) for skel with up to max_deletes characters
+    removed, never touching the first character."""
+    for distance in range(1, min(max_deletes, len(skel) - 2) + 1):
+        for positions in combinations(range(1, len(skel)), distance):
+            yield "".join(ch for i, ch in enumerate(skel) if i not in positions), distance
+
+
+class AbbreviationIndex:
+    """Dictionary of words with skeleton, delete and prefix lookups."""
+
+    def __init__(self, language: str):
+        self.language = language
+        self.words = []
+        self.weights = []
+        self.ids = {}
+        self.exact = {}
+        self.skeletons = {}
+        self.prefixes = {}
+        self.history_offset = 0
+        # Weight of the rarest listed word: words missing from the list score at most this
+        self.floor = 0.0
+
+    # ── Building ──────────────────────────────────────────────
+
+    def add_word(self, word: str, weight: float):
+        """Adds a word or increases the weight of a known word."""
+        if word in self.ids:
+            self.weights[self.ids[word]] += weight
+            return
+        word_id = len(self.words)
+        self.words.append(word)
+        self.weights.append(weight)
+        self.ids[word] = word_id
+        self.exact.setdefault(fold(word), word_id)
+
+        skel = skeleton(word)
+        self.skeletons.setdefault(skel, []).append((word_id, 0))
+        for variant, distance in _deletes(skel, MAX_DELETES):
+            self.skeletons.setdefault(variant, []).append((word_id, distance))
+
+        folded = fold(word)
+        for end in range(MIN_PREFIX, len(folded)):
+            self.prefixes.setdefault(folded[:end], []).append(word_id)
+
+    def add_text(self, text: str, weight: float = HISTORY_WEIGHT):
+        """Adds every word of a text, e.g. an accepted completion."""
+        for word in re.findall(r"[^\W\d_]+", text):
+            if len(word) > 1 or word in ("I", "a"):
+                self.add_word(word, weight)
+
+    def add_history(self, path: Path):
+        """Adds completions appended to the history file since the last call."""
+        try:
+            with open(path, "rb") as f:
+                f.seek(self.history_offset)
+                data = f.read()
+        except OSError:
+            return
+        self.history_offset += len(data)
+        for line in data.decode("utf-8", errors="replace").splitlines():
+            self.add_text(line)
+
+    # ── Lookup ───────────────────────────────────────────────
+
+    def candidates(self, token: str) -> list:
+        """Returns [(word, score)] for an abbreviated token, best first."""
+        folded = fold(token)
+        scores = {}
+
+        def offer(word_id, quality):
+            word = self.words[word_id]
+            if not _is_subsequence(folded, fold(word)):
+                return
+            score = self.weights[word_id] * quality
+            if score > scores.get(word_id, 0.0):
+                scores[word_id] = score
+
+        if folded in self.exact:
+            offer(self.exact[folded], QUALITY_EXACT)
+        for word_id, distance in self.skeletons.get(skeleton(token), ()):
+            offer(word_id, QUALITY_DELETE[distance] if distance else QUALITY_SKELETON)
+        if len(folded) >= MIN_PREFIX:
+            for word_id in self.prefixes.get(folded, ()):
+                offer(word_id, QUALITY_PREFIX)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return [(self.words[word_id], score) for word_id, score in ranked]
+
+    def resolve(self, token: str, previous: str = None, personal=None):
+        """Returns the expansion of a token if it is unambiguous, else None.
+
+        A token that already is a word is kept (only its listed capitalization
+        is applied). With a ``personal`` model (see smarttype.personal) the word
+        the user always expands token to wins, and the others are ranked by the
+        user's own usage after ``previous``.
+        """
+        folded = fold(token)
+        if folded in self.exact:
+            return token if token in self.ids else self.words[self.exact[folded]]
+        if personal is not None:
+            word = personal.trusted(token)
+            if word is not None and word in self.exact:
+                return self.words[self.exact[word]]
+        if len(token) < MIN_ABBREVIATION:
+            return None
+        ranked = self.candidates(token)
+        if personal is not None and ranked:
+            ranked = personal.rank(token, previous, ranked)
+        if not ranked:
+            return None
+        # An unlisted word with the same skeleton competes like the rarest listed one
+        unlisted = self.floor * QUALITY_SKELETON
+        best = ranked[0][1]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        if best < CONFIDENCE_RATIO * max(runner_up, unlisted):
+            return None
+        if best < sum(score for _, score in ranked[1:]) + unlisted:
+            # "sch" beats "schon" but not "schon", "schön" and "Sache" together
+            return None
+        return ranked[0][0]
+
+    def expand(self, text: str, personal=None):
+        """Expands every token of text, or returns None if any token is
+        uncertain, nothing needed expanding (then Claude has to fill in
+        missing words anyway) or the input looks like a question without
+        its "?" (then Claude may have to reorder it)."""
+        tokens = text.split()
+        if not tokens:
+            return None
+        out = []
+        words = []
+        expanded = []
+        previous = None
+        for token in tokens:
+            match = _TOKEN_RE.match(token)
+            if not match:
+                return None
+            lead, core, trail = match.groups()
+            word = self.resolve(core, previous, personal)
+            if word is None:
+                return None
+            previous = word
+            words.append(fold(word))
+            expanded.append(fold(word) != fold(core))
+            if core[0].isupper() and word[0].islower():
+                word = word[0].upper() + word[1:]
+            out.append(lead + word + trail)
+        if not any(expanded):
+            return None
+
+        out[0] = out[0][0].upper() + out[0][1:]
+        result = " ".join(out)
+        if result[-1] == "?":
+            return result
+        if words[0] in QUESTION_WORDS.get(self.language, ()):
+            return None
+        if len(words) > 1 and expanded[0] and words[1] in SUBJECT_PRONOUNS.get(self.language, ()):
+            return None
+        return result if result[-1] in ".!" else result + "."
+
+    # ── Persistence ─────────────────────────────────────────────
+
+    def save(self, path: Path, signature):
+        """Writes the index to a compact prebuilt file."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump((INDEX_VERSION, signature, self.__dict__), f, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path, signature):
+        """Loads a prebuilt index, or returns None if it is missing or stale."""
+        try:
+            with open(path, "rb") as f:
+                version, stored_signature, state = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+            return None
+        if version != INDEX_VERSION or stored_signature != signature:
+            return None
+        index = cls(state["language"])
+        index.__dict__.update(state)
+        return index
+
+
+def read_word_list(path: Path) -> list:
+    """Reads a word list (one word per line, most frequent first, # comments)."""
+    words = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if line and not line.startswith("#"):
+            words.append(line)
+    return words
+
+
+def build_index(language: str, word_list: Path) -> AbbreviationIndex:
+    """Builds an index from a frequency-sorted word list."""
+    index = AbbreviationIndex(language)
+    for rank, word in enumerate(read_word_list(word_list)):
+        # Zipf-like weight from frequency rank
+        index.floor = 1.0 / (rank + 10)
+        if word not in index.ids:
+            index.add_word(word, index.floor)
+    return index
+
+
+def load_index(language: str, word_list: Path, index_path: Path, history_path: Path) -> AbbreviationIndex:
+    """Loads the prebuilt index for a language, rebuilding it if the word
+    list changed, and applies new history entries."""
+    stat = word_list.stat()
+    signature = (str(word_list), stat.st_size, stat.st_mtime_ns)
+    index = AbbreviationIndex.load(index_path, signature)
+    if index is None:
+        index = build_index(language, word_list)
+    offset = index.history_offset
+    index.add_history(history_path)
+    if index.history_offset != offset or not index_path.exists():
+        try:
+            index.save(index_path, signature)
+        except OSError as e:
+            print(f"[SmartType] Could not save abbreviation index: {e}")
+    return index
+
+
+def append_history(history_path: Path, completed: str):
+    """Appends an accepted completion to the user's history file."""
+    history_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(history_path, "a", encoding="utf-8") as f:
+        f.write(completed.replace("\n", " ") + "\n")
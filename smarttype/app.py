@@ -2,24 +2,37 @@
 SmartType - Core Application
 ==============================
 AI text completion engine: hotkey listener, clipboard handling,
-Claude API integration, and toast notifications.
+Claude API integration, and toast notifications. Requests, streams and
+timers run on the async engine; the completion worker thread does the
+keyboard and clipboard work.
 """
 
 import re
 import os
 import sys
 import time
+import queue
+import asyncio
 import threading
-import winsound
+import uuid
 
-import tkinter as tk
-
-import keyboard
-import pyperclip
-import anthropic
 from pathlib import Path
+from types import MappingProxyType
 from dotenv import load_dotenv
 
+from smarttype.cache import make_key, prompt_hash
+from smarttype.config import Config, ConfigError, load_config, parse_settings, read_prompts
+from smarttype.budget import MAX_OUTPUT_TOKENS, OutputBudget, RunawayGuard, RunawayOutput
+from smarttype.backend import DesktopBackend
+from smarttype.engine import POLL_INTERVAL, Engine
+from smarttype.routing import Router
+from smarttype.toast import Toasts
+from smarttype.abbrev import append_history, load_index
+from smarttype.personal import append_learned, load_personal_model
+from smarttype.clipboard import AppLatencies, wait_for_change
+from smarttype.context import SentenceMemo, estimate_tokens, split_segment, split_sentences, trim_context
+from smarttype.latency import annotate, current_trace, end_trace, log_span, span, start_trace
+
 # ── Package-level paths ────────────────────────────────────────
 
 # Support PyInstaller frozen mode
@@ -28,6 +41,7 @@ if getattr(sys, 'frozen', False):
 else:
     PACKAGE_DIR = Path(__file__).parent
 PROMPTS_DIR = PACKAGE_DIR / "prompts"
+WORDLISTS_DIR = PACKAGE_DIR / "wordlists"
 
 # ── Configuration ──────────────────────────────────────────────
 
@@ -42,48 +56,341 @@ if _user_env.exists():
 else:
     load_dotenv()
 
+# .env is watched while SmartType runs (settings in smarttype/config.py reload)
+ENV_PATH = _user_env
+
 API_KEY = os.getenv("CLAUDE_API_KEY", "").strip()
-HOTKEY = os.getenv("SMARTTYPE_HOTKEY", "ctrl+shift+j")
-LANG_TOGGLE_HOTKEY = os.getenv("SMARTTYPE_LANG_HOTKEY", "ctrl+shift+g")
-MARKER_TOGGLE_HOTKEY = os.getenv("SMARTTYPE_MARKER_HOTKEY", "ctrl+shift+h")
-MODEL = os.getenv("SMARTTYPE_MODEL", "claude-sonnet-4-5-20250929")
+
+# Reloadable settings: one snapshot, replaced as a whole by apply_config. The
+# globals below mirror it, so the hot path never reads a file or the environment
+config = Config(**parse_settings(os.environ), prompts=MappingProxyType({}))
+HOTKEY = config.hotkey
+LANG_TOGGLE_HOTKEY = config.lang_hotkey
+MARKER_TOGGLE_HOTKEY = config.marker_hotkey
+CANCEL_HOTKEY = config.cancel_hotkey
+# Ordered models for routing (fast model first); defaults to SMARTTYPE_MODEL alone
+MODELS = list(config.models)
+MODEL = MODELS[0]
+ROUTING = config.routing
+
+# Where SmartType keeps its local data (completion cache, ...)
+DATA_DIR = Path(os.getenv("SMARTTYPE_DATA_DIR", "") or Path(os.getenv("LOCALAPPDATA", Path.home())) / "SmartType")
+
+# Completion cache: repeated inputs are answered without calling Claude
+CACHE_ENABLED = os.getenv("SMARTTYPE_CACHE", "1").strip().lower() in ("1", "true", "yes", "on")
+
+# Local abbreviation expansion: skip Claude when every word resolves unambiguously
+LOCAL_EXPANSION = os.getenv("SMARTTYPE_LOCAL_EXPANSION", "0").strip().lower() in ("1", "true", "yes", "on")
+
+# Speculative mode: complete in the background after a typing pause (opt-in, costs API calls)
+SPECULATIVE = os.getenv("SMARTTYPE_SPECULATIVE", "0").strip().lower() in ("1", "true", "yes", "on")
+SPECULATIVE_PAUSE = float(os.getenv("SMARTTYPE_SPECULATIVE_PAUSE", "0.8"))
+SPECULATIVE_MAX_PER_MINUTE = int(os.getenv("SMARTTYPE_SPECULATIVE_MAX_PER_MINUTE", "6"))
+
+# How long to wait for the application to answer Ctrl+C (seconds)
+CAPTURE_TIMEOUT = config.capture_timeout
+
+# Per-phase latency log (smarttype stats latency)
+LATENCY_LOG = os.getenv("SMARTTYPE_LATENCY_LOG", "1").strip().lower() in ("1", "true", "yes", "on")
+
+# Token usage of every API request (smarttype stats usage)
+USAGE_LOG = os.getenv("SMARTTYPE_USAGE_LOG", "1").strip().lower() in ("1", "true", "yes", "on")
+
+# Idle time after which a cheap request keeps the API connection open (seconds, 0 = off)
+KEEPALIVE = float(os.getenv("SMARTTYPE_KEEPALIVE", "45"))
+
+# Streaming mode: insert the completion into the field while Claude is still writing
+STREAMING = config.streaming
+# Minimum time between two incremental pastes in streaming mode (seconds)
+STREAM_PASTE_INTERVAL = 0.25
+
+# Time the application gets to read a pasted completion before the clipboard is restored (seconds)
+CLIPBOARD_RESTORE_DELAY = 1.0
+
+# A completion undone (Ctrl+Z) within this many seconds after its paste is not learned
+UNDO_WINDOW = 5.0
+
+# Full line mode: budget for the finished text before the current paragraph,
+# sent as context (estimated tokens, 0 = no context)
+CONTEXT_TOKENS = config.context_tokens
+
+# Longest time from hotkey press to result before a completion is aborted (seconds, 0 = none)
+DEADLINE = config.deadline
+
+# Hotkey presses waiting for the completion worker; further presses are rejected
+QUEUE_SIZE = max(1, int(os.getenv("SMARTTYPE_QUEUE_SIZE", "3")))
 
 # Language settings (changeable at runtime)
 current_language = os.getenv("SMARTTYPE_LANGUAGE", "de")
 current_prompt = ""
 
+# System prompts of all languages (from the config snapshot, loaded in main)
+PROMPTS = {}
+
 # Marker mode: when True, requires ... prefix; when False, completes entire line
 marker_mode = False
 
 LANG_NAMES = {"de": "Deutsch", "en": "English"}
 
-# Claude Client (initialized in main after API key is available)
+# Claude clients (created by main in the background, after the hotkeys are
+# registered): completions go through the async client on the engine loop,
+# everything else the sync one
 client = None
+async_client = None
+# Why creating them failed; completions waiting for them then fail at once
+startup_error = None
+
+# Event loop for API requests, streams and timers (starts on first use)
+engine = Engine()
+
+# Connection pool owner that keeps the client's connection warm (initialized in main)
+connections = None
+
+# Model routing (configured in main; the single default model until then)
+router = Router([MODEL])
+
+# max_tokens per request from the input length (ratios seeded in main)
+output_budget = OutputBudget()
+
+# Sentences SmartType wrote recently: full line mode only sends the new ones
+sentence_memo = SentenceMemo()
+
+# Completion cache (initialized in main, None = disabled)
+completion_cache = None
+
+# Token usage store (initialized in main, None = disabled)
+usage_store = None
+
+# Local abbreviation indexes and personal models per language (loaded in main when enabled)
+local_indexes = {}
+personal_models = {}
+
+# Background completion of the text being typed (initialized in main, None = disabled)
+speculator = None
 
-# Prevents concurrent processing
-_processing = False
+# Pending hotkey presses, processed one at a time by the completion worker
+_jobs = queue.Queue(maxsize=QUEUE_SIZE)
+_queued = set()
+_queue_lock = threading.Lock()
+_worker = None
+# Job the worker is processing (target of the cancel hotkey)
+_current_job = None
+
+# Keyboard, clipboard and sounds (replaceable, e.g. by a SimulatedTextField)
+backend = DesktopBackend(engine)
+
+# On-screen notifications (UI thread starts with the first toast)
+toasts = Toasts()
+
+# Clipboard response time of each application
+app_latencies = AppLatencies()
+
+# Application that owns the text field being completed
+_target_app = "unknown"
+
+# Clipboard content waiting to be put back after the last completion ([text, job id] or None)
+_pending_clipboard = None
+_clipboard_lock = threading.Lock()
+
+# Last completion waiting for UNDO_WINDOW before it is learned ([args] or None)
+_pending_learning = None
+_learning_lock = threading.Lock()
+# Cache key of the last pasted completion and when it was pasted (dropped on Ctrl+Z)
+_undoable = None
+
+
+def _prompt_files() -> dict:
+    """{language: [prompt file candidates]}: the working directory overrides the bundled prompt."""
+    return {lang: [Path.cwd() / f"prompt_{lang}.txt", PROMPTS_DIR / f"prompt_{lang}.txt"]
+            for lang in dict.fromkeys([*LANG_NAMES, current_language])}
+
+
+def config_files() -> list:
+    """The files a configuration snapshot is read from (watched for changes)."""
+    return [ENV_PATH, *(path for candidates in _prompt_files().values() for path in candidates)]
+
+
+def read_config(check_hotkey=None) -> Config:
+    """Reads .env and the prompt files into a new, validated snapshot (raises ConfigError)."""
+    return load_config(ENV_PATH, _prompt_files(), check_hotkey,
+                       validate=lambda new: Router(list(new.models), new.routing))
+
+
+def apply_config(new: Config):
+    """Makes a snapshot the current configuration.
+
+    Each global is swapped in one assignment; the router keeps its latency
+    statistics when the models change. Jobs already queued keep the prompt
+    they were created with.
+    """
+    global config, HOTKEY, LANG_TOGGLE_HOTKEY, MARKER_TOGGLE_HOTKEY, CANCEL_HOTKEY
+    global MODELS, MODEL, ROUTING, router, STREAMING, CONTEXT_TOKENS, DEADLINE, CAPTURE_TIMEOUT
+    global PROMPTS, current_prompt
+    if list(new.models) != router.models or new.routing != router.policy:
+        router = Router(list(new.models), new.routing, stats=router.stats)
+    MODELS, MODEL, ROUTING = list(new.models), new.models[0], new.routing
+    HOTKEY, LANG_TOGGLE_HOTKEY = new.hotkey, new.lang_hotkey
+    MARKER_TOGGLE_HOTKEY, CANCEL_HOTKEY = new.marker_hotkey, new.cancel_hotkey
+    STREAMING, CONTEXT_TOKENS = new.streaming, new.context_tokens
+    DEADLINE, CAPTURE_TIMEOUT = new.deadline, new.capture_timeout
+    PROMPTS = dict(new.prompts)
+    current_prompt = PROMPTS[current_language]
+    config = new
+
+
+def load_prompts() -> dict:
+    """Loads and validates the prompts of all languages (exits on errors)."""
+    try:
+        return read_prompts(_prompt_files())
+    except ConfigError as e:
+        for error in str(e).splitlines():
+            print(f"[SmartType] ERROR: {error}")
+        sys.exit(1)
+
+
+def _system_blocks(prompt: str) -> list:
+    """Wraps the system prompt in a block marked for Anthropic prompt caching."""
+    return [{"type": "text", "text": prompt, "cache_control": {"type": "ephemeral"}}]
+
+
+def _report_usage(usage):
+    """Prints the token usage of a response, including prompt cache activity."""
+    if usage is None:
+        return
+    print(f"  Tokens: in={usage.input_tokens} out={usage.output_tokens}"
+          f" cache_read={getattr(usage, 'cache_read_input_tokens', None) or 0}"
+          f" cache_write={getattr(usage, 'cache_creation_input_tokens', None) or 0}")
+
+
+def _record_usage(model: str, usage, language: str, prompt: str, kind: str, start: float, outcome: str):
+    """Queues the usage of an API request for the usage store (``start`` from perf_counter)."""
+    if usage_store is not None:
+        usage_store.record(model, usage, language=language, prompt=prompt_hash(prompt), kind=kind,
+                           latency=time.perf_counter() - start, outcome=outcome)
+
+
+def _stream_usage(stream):
+    """Usage of a stream so far (output tokens only as far as reported), or None."""
+    try:
+        return stream.current_message_snapshot.usage
+    except (AttributeError, AssertionError):
+        return None
 
 
-def load_prompt(lang: str) -> str:
-    """Loads the system prompt for the given language."""
-    # First check user's working directory
-    user_prompt = Path.cwd() / f"prompt_{lang}.txt"
-    if user_prompt.exists():
-        return user_prompt.read_text(encoding="utf-8").strip()
-    # Fall back to bundled prompts
-    pkg_prompt = PROMPTS_DIR / f"prompt_{lang}.txt"
-    if pkg_prompt.exists():
-        return pkg_prompt.read_text(encoding="utf-8").strip()
-    print(f"[SmartType] ERROR: Prompt file not found: prompt_{lang}.txt")
-    sys.exit(1)
+# ── Local Expansion ──────────────────────────────────────────────
+
+def _history_path(lang: str) -> Path:
+    return DATA_DIR / f"history_{lang}.txt"
+
+
+def _learned_path(lang: str) -> Path:
+    return DATA_DIR / f"learned_{lang}.tsv"
+
+
+def load_local_indexes():
+    """Loads the prebuilt abbreviation index and personal model for every language."""
+    for lang in LANG_NAMES:
+        word_list = WORDLISTS_DIR / f"words_{lang}.txt"
+        if word_list.exists():
+            local_indexes[lang] = load_index(
+                lang, word_list, DATA_DIR / f"abbrev_{lang}.idx", _history_path(lang),
+            )
+            personal_models[lang] = load_personal_model(
+                lang, DATA_DIR / f"personal_{lang}.model", _learned_path(lang),
+            )
+
+
+def expand_locally(incomplete_text: str, language: str = None):
+    """Expands the text with the local index, or returns None if unsure."""
+    language = language or current_language
+    index = local_indexes.get(language)
+    if index is None:
+        return None
+    return index.expand(incomplete_text, personal_models.get(language))
+
+
+def _learn_completion(completed: str, language: str = None, abbreviated: str = None):
+    """Adds an accepted completion (of ``abbreviated``) to the user's history and personal model."""
+    language = language or current_language
+    index = local_indexes.get(language)
+    if index is None:
+        return
+    index.add_text(completed)
+    model = personal_models.get(language)
+    try:
+        append_history(_history_path(language), completed)
+        if model is not None and abbreviated:
+            model.learn(abbreviated, completed)
+            append_learned(_learned_path(language), abbreviated, completed)
+    except OSError as e:
+        print(f"[SmartType] Could not write history: {e}")
+
+
+def _learn_later(abbreviated: str, completed: str, language: str):
+    """Learns a pasted completion once UNDO_WINDOW has passed without Ctrl+Z."""
+    global _pending_learning
+    if language not in local_indexes:
+        return
+    pending = [completed, language, abbreviated]
+    with _learning_lock:
+        previous, _pending_learning = _pending_learning, pending
+    if previous is not None:
+        # A new completion means the previous one was kept
+        _learn_completion(*previous)
+    backend.call_later(UNDO_WINDOW, commit_learning, pending)
+
+
+def _remember_undoable(key: str):
+    """Notes the cache key of a pasted completion, so Ctrl+Z can drop it from the cache."""
+    global _undoable
+    with _learning_lock:
+        _undoable = (key, time.monotonic())
+
+
+def commit_learning(pending: list = None):
+    """Learns the last pasted completion now, if not undone or learned yet.
+
+    With ``pending`` only that completion is learned (see restore_clipboard).
+    """
+    global _pending_learning
+    with _learning_lock:
+        if _pending_learning is None or (pending is not None and pending is not _pending_learning):
+            return
+        args, _pending_learning = _pending_learning, None
+    _learn_completion(*args)
+
+
+def on_undo():
+    """Called when Ctrl+Z is pressed: the last completion, if just pasted, is not learned or reused."""
+    global _pending_learning, _undoable
+    with _learning_lock:
+        undone, _pending_learning = _pending_learning, None
+        pasted, _undoable = _undoable, None
+    if pasted is not None and completion_cache is not None and time.monotonic() - pasted[1] <= UNDO_WINDOW:
+        completion_cache.discard(pasted[0])
+        print("[SmartType] Completion undone, removed from the cache.")
+    if undone is not None:
+        print("[SmartType] Completion undone, not learned.")
 
 
 # ── AI Completion ────────────────────────────────────────────────
 
-def complete_with_ai(incomplete_text: str, context_before: str = "", context_after: str = "") -> str:
-    """Sends incomplete text to Claude for completion."""
+def _language_and_prompt(language: str = None, prompt: str = None):
+    """Returns the language and system prompt to use (default: the current ones).
+
+    ``prompt`` overrides the language's prompt, e.g. with the one a queued
+    job was created with.
+    """
+    if language is None:
+        return current_language, prompt or current_prompt
+    return language, prompt or PROMPTS[language]
+
+
+def _build_user_message(incomplete_text: str, context_before: str = "", context_after: str = "",
+                        language: str = None) -> str:
+    """Builds the user message for a completion request."""
     # Language-specific instruction prefix
-    if current_language == "de":
+    if (language or current_language) == "de":
         prefix = "Bitte vervollständige folgenden abgekürzten Text: "
     else:
         prefix = "Please complete the following abbreviated text: "
@@ -94,199 +401,688 @@ def complete_with_ai(incomplete_text: str, context_before: str = "", context_aft
     user_msg += prefix + incomplete_text.strip()
     if context_after.strip():
         user_msg += f"\n\nFollowing context: {context_after.strip()}"
+    return user_msg
+
 
-    response = client.messages.create(
-        model=MODEL,
-        max_tokens=2048,
-        system=current_prompt,
+def _cache_key(incomplete_text: str, context_before: str = "", context_after: str = "",
+               language: str = None, prompt: str = None) -> str:
+    """Builds the completion cache key for the language, its prompt and the model."""
+    language, prompt = _language_and_prompt(language, prompt)
+    return make_key(incomplete_text, language, prompt, router.cache_id,
+                    context=context_before + "\x1f" + context_after)
+
+
+def cached_completion(incomplete_text: str, context_before: str = "", context_after: str = "",
+                      language: str = None, prompt: str = None):
+    """Returns a cached completion for the text, or None."""
+    if completion_cache is None:
+        return None
+    return completion_cache.get(_cache_key(incomplete_text, context_before, context_after, language, prompt))
+
+
+def _remember_completion(incomplete_text: str, completed: str, context_before: str = "",
+                         context_after: str = "", language: str = None, prompt: str = None):
+    """Stores a completion in the cache."""
+    if completion_cache is not None and completed:
+        completion_cache.put(
+            _cache_key(incomplete_text, context_before, context_after, language, prompt), completed,
+        )
+
+
+def _message_params(model: str, prompt: str, user_msg: str, max_tokens: int = MAX_OUTPUT_TOKENS) -> dict:
+    """Messages API parameters of a completion request."""
+    return dict(
+        model=model,
+        max_tokens=max_tokens,
+        system=_system_blocks(prompt),
         messages=[{"role": "user", "content": user_msg}],
     )
-    return response.content[0].text.strip()
 
 
-# ── Text Field Processing ───────────────────────────────────────
+def batch_params(incomplete_text: str, context_before: str = "", context_after: str = "",
+                 language: str = None) -> dict:
+    """Returns the parameters of a completion request (for the Message Batches API).
+
+    Batch results are not watched by a RunawayGuard, so they keep the full output budget.
+    """
+    language, prompt = _language_and_prompt(language)
+    user_msg = _build_user_message(incomplete_text, context_before, context_after, language)
+    return _message_params(router.route(incomplete_text)[0], prompt, user_msg)
+
+
+async def _request(model: str, prompt: str, user_msg: str, max_tokens: int, timeout: float = None,
+                   language: str = None):
+    """Sends one completion request to a model (on the engine loop)."""
+    params = _message_params(model, prompt, user_msg, max_tokens)
+    if timeout is not None:
+        params["timeout"] = timeout
+    start = time.perf_counter()
+    response = None
+    outcome = "error"
+    try:
+        response = await async_client.messages.create(**params)
+        outcome = "max_tokens" if response.stop_reason == "max_tokens" else "ok"
+        return response
+    except asyncio.CancelledError:
+        # Lost a hedge, cancelled or past the deadline
+        outcome = "cancelled"
+        raise
+    finally:
+        _record_usage(model, getattr(response, "usage", None), language, prompt, "create", start, outcome)
+
+
+async def acomplete_with_ai(incomplete_text: str, context_before: str = "", context_after: str = "",
+                            language: str = None, timeout: float = None, prompt: str = None) -> str:
+    """Completes incomplete text with Claude; coroutine behind complete_with_ai.
 
-def process_textfield():
-    """Reads backwards from cursor, completes the text."""
-    global _processing
+    ``prompt`` overrides the language's current prompt.
+    """
+    cached = cached_completion(incomplete_text, context_before, context_after, language, prompt)
+    if cached is not None:
+        return cached
 
-    if _processing:
+    language, prompt = _language_and_prompt(language, prompt)
+    user_msg = _build_user_message(incomplete_text, context_before, context_after, language)
+
+    max_tokens = output_budget.max_tokens(language, incomplete_text)
+
+    async def request(model):
+        return await _request(model, prompt, user_msg, max_tokens, timeout, language)
+
+    with span("api_total"):
+        model, response, hedged = await router.run(incomplete_text, request)
+    annotate(model=model)
+    if hedged:
+        annotate(hedged=True)
+        print(f"  Hedged, answered by {model}")
+    _report_usage(response.usage)
+    if response.stop_reason == "max_tokens":
+        raise RunawayOutput(f"Completion cut off at its budget of {max_tokens} tokens")
+    _learn_output_ratio(incomplete_text, response.usage, language)
+    guard = RunawayGuard(incomplete_text)
+    completed = guard.accept(response.content[0].text)
+    if guard.reason is not None:
+        _report_runaway(guard)
+    _remember_completion(incomplete_text, completed, context_before, context_after, language, prompt)
+    return completed
+
+
+def complete_with_ai(incomplete_text: str, context_before: str = "", context_after: str = "",
+                     language: str = None, timeout: float = None) -> str:
+    """Sends incomplete text to Claude for completion.
+
+    ``language`` selects the prompt; by default the current language is used.
+    ``timeout`` (seconds) overrides the client's request timeout. Runs on the
+    engine loop and waits for the result.
+    """
+    return engine.run(acomplete_with_ai(incomplete_text, context_before, context_after, language, timeout))
+
+
+async def astream_with_ai(incomplete_text: str, context_before: str = "", context_after: str = "",
+                          language: str = None, timeout: float = None, prompt: str = None):
+    """Streams the completion of incomplete text from Claude, yielding text chunks (async)."""
+    cached = cached_completion(incomplete_text, context_before, context_after, language, prompt)
+    if cached is not None:
+        yield cached
         return
-    _processing = True
 
+    language, prompt = _language_and_prompt(language, prompt)
+    user_msg = _build_user_message(incomplete_text, context_before, context_after, language)
+    received = []
+    trace = current_trace()
+    start = time.perf_counter()
+    # Streams are routed but not hedged: their text goes straight into the field
+    model = router.route(incomplete_text)[0]
+    annotate(model=model)
+
+    max_tokens = output_budget.max_tokens(language, incomplete_text)
+    guard = RunawayGuard(incomplete_text)
+    params = _message_params(model, prompt, user_msg, max_tokens)
+    if timeout is not None:
+        params["timeout"] = timeout
+    stream = usage = None
+    outcome = "error"
     try:
-        # Save current clipboard
+        async with async_client.messages.stream(**params) as stream:
+            async for text in stream.text_stream:
+                if not received and trace is not None:
+                    trace.add("api_ttfb", time.perf_counter() - start)
+                output = "".join(received)
+                usable = guard.check(output + text)
+                if usable is not None:
+                    # Leaving the stream ends the request: no tokens are spent on the rest
+                    outcome = "runaway"
+                    _report_runaway(guard)
+                    text = usable[len(output):]
+                    if text:
+                        received.append(text)
+                        yield text
+                    break
+                received.append(text)
+                yield text
+            else:
+                message = await stream.get_final_message()
+                usage = message.usage
+                outcome = "max_tokens" if message.stop_reason == "max_tokens" else "ok"
+                _report_usage(message.usage)
+                if message.stop_reason == "max_tokens":
+                    raise RunawayOutput(f"Completion cut off at its budget of {max_tokens} tokens")
+                _learn_output_ratio(incomplete_text, message.usage, language)
+    except (asyncio.CancelledError, GeneratorExit):
+        outcome = "cancelled"
+        raise
+    finally:
+        _record_usage(model, usage or _stream_usage(stream), language, prompt, "stream", start, outcome)
+    if trace is not None:
+        # Includes the time spent pasting between chunks
+        trace.add("api_total", time.perf_counter() - start)
+    _remember_completion(incomplete_text, "".join(received).strip(), context_before, context_after,
+                         language, prompt)
+
+
+def stream_with_ai(incomplete_text: str, context_before: str = "", context_after: str = "",
+                   language: str = None, timeout: float = None):
+    """Streams the completion of incomplete text from Claude, yielding text chunks."""
+    return engine.iterate(astream_with_ai(incomplete_text, context_before, context_after, language, timeout))
+
+
+def _learn_output_ratio(incomplete_text: str, usage, language: str):
+    """Feeds a finished completion into the output budget (and the latency log, which seeds it)."""
+    if usage is None:
+        return
+    output_budget.record(language, len(incomplete_text.strip()), usage.output_tokens)
+    annotate(input_chars=len(incomplete_text.strip()), output_tokens=usage.output_tokens)
+
+
+def _report_runaway(guard: RunawayGuard):
+    print(f"  Output went off the rails ({guard.reason}), kept the part before it")
+    annotate(runaway=guard.reason)
+
+
+def stable_prefix(partial: str) -> str:
+    """Returns the part of a partial completion that ends in a finished word.
+
+    The last word may still grow while the stream continues, so everything
+    up to (and including) the whitespace before it is considered stable.
+    """
+    match = re.match(r"(.*\s)\S", partial.lstrip(), re.S)
+    return match.group(1) if match else ""
+
+
+# ── Completion Jobs ──────────────────────────────────────────────
+
+class CompletionAborted(Exception):
+    """A completion was cancelled by the user or ran out of time."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class CompletionJob:
+    """A hotkey press with the settings that were active when it happened."""
+
+    def __init__(self, language: str, marker_mode: bool):
+        self.language = language
+        # The prompt at the time of the press, kept when the configuration is
+        # reloaded while the job waits (None until the prompts are loaded)
+        self.prompt = PROMPTS.get(language)
+        self.marker_mode = marker_mode
+        self.created = time.perf_counter()
+        self.deadline = self.created + DEADLINE if DEADLINE > 0 else float("inf")
+        self.cancelled = threading.Event()
+        # Joins the latency records of the job (see restore_clipboard)
+        self.id = uuid.uuid4().hex[:12]
+
+    @property
+    def key(self):
+        return self.language, self.marker_mode
+
+    def remaining(self) -> float:
+        """Seconds left until the deadline."""
+        return self.deadline - time.perf_counter()
+
+    def timeout(self):
+        """Seconds left for a blocking wait, or None without a deadline."""
+        return None if self.deadline == float("inf") else max(self.remaining(), 0)
+
+    def aborted(self) -> bool:
+        return self.cancelled.is_set() or self.remaining() <= 0
+
+    def check(self):
+        """Raises CompletionAborted if the job was cancelled or is out of time."""
+        if self.cancelled.is_set():
+            raise CompletionAborted("cancelled")
+        if self.remaining() <= 0:
+            raise CompletionAborted("deadline")
+
+
+def _bounded_stream(job: CompletionJob, chunks):
+    """Iterates an async stream on the engine until the job is cancelled or out of time.
+
+    Raises CompletionAborted without waiting for a stalled request; the
+    stream's task is cancelled, which ends its HTTP request.
+    """
+    return engine.iterate(chunks, job.check)
+
+
+def _bounded_call(job: CompletionJob, coro):
+    """Runs a coroutine on the engine, cancelling it when the job is cancelled or out of time."""
+    return engine.run(coro, job.check)
+
+
+# ── Text Field Processing ───────────────────────────────────────
+
+def _capture_before_cursor() -> str:
+    """Selects from the cursor to the start of the field and copies it.
+
+    Waits until the application has actually put the selection on the
+    clipboard. Returns "" if nothing arrived within CAPTURE_TIMEOUT.
+    """
+    global _target_app
+    _target_app = backend.foreground_app()
+    annotate(app=_target_app)
+
+    # Clear clipboard to detect fresh copy
+    backend.copy("")
+    sequence = backend.clipboard_sequence()
+
+    # Key events are processed in order, so no pause is needed between them
+    start = backend.monotonic()
+    backend.send("ctrl+shift+home")
+    backend.send("ctrl+c")
+    text = wait_for_change(backend, sequence, "", CAPTURE_TIMEOUT)
+    elapsed = backend.monotonic() - start
+    if text is None:
+        print(f"  Clipboard: no answer from {_target_app} within {elapsed * 1000:.0f} ms")
+        return ""
+    app_latencies.record(_target_app, elapsed)
+    print(f"  Clipboard: {_target_app} answered in {elapsed * 1000:.0f} ms")
+    return text
+
+
+def _paste(text: str):
+    """Pastes text at the cursor (replacing any selection) via the clipboard."""
+    with span("paste"):
+        backend.copy(text)
+        backend.send("ctrl+v")
+        # The app reads the clipboard asynchronously: give it time before it changes again
+        backend.sleep(app_latencies.settle_time(_target_app))
+
+
+def _replace_selection(text: str):
+    """Re-selects everything from cursor to start and replaces it with text."""
+    # Selection may have been lost during the API call
+    with span("reselect"):
+        backend.send("right")
+        backend.send("ctrl+shift+home")
+    _paste(text)
+
+
+def _stream_into_field(prefix: str, incomplete: str, context: str, job: CompletionJob) -> str:
+    """Streams the completion into the text field as it arrives.
+
+    Finished words are pasted as soon as they are stable; the tail is
+    appended (or, if the final text diverges, the whole field is fixed up)
+    when the stream ends. Returns the completed text.
+    """
+    received = ""
+    inserted = ""
+    last_paste = 0.0
+    chunks = astream_with_ai(incomplete, context, language=job.language, prompt=job.prompt)
+    for chunk in _bounded_stream(job, chunks):
+        received += chunk
+        stable = stable_prefix(received)
+        if len(stable) <= len(inserted):
+            continue
+        if not inserted:
+            # First stable words: replace the selection right away
+            _replace_selection(prefix + stable)
+        elif time.monotonic() - last_paste >= STREAM_PASTE_INTERVAL:
+            _paste(stable[len(inserted):])
+        else:
+            continue
+        inserted = stable
+        last_paste = time.monotonic()
+
+    completed = received.strip()
+    if not inserted:
+        _replace_selection(prefix + completed)
+    elif completed.startswith(inserted):
+        if len(completed) > len(inserted):
+            _paste(completed[len(inserted):])
+    else:
+        # Final text diverges from what was already inserted: rewrite the field
+        _replace_selection(prefix + completed)
+    return completed
+
+
+def speculable_text(typed: str):
+    """Returns the part of the typed text the hotkey would complete, or None."""
+    if marker_mode:
+        if "..." not in typed:
+            return None
+        return typed[typed.rfind("...") + 3:]
+    return typed
+
+
+def restore_clipboard(pending: list = None):
+    """Puts back the clipboard saved by the last completion, if still pending.
+
+    With ``pending`` only that completion's clipboard is restored, so a
+    late timer cannot restore a newer completion's clipboard early.
+    """
+    global _pending_clipboard
+    with _clipboard_lock:
+        if _pending_clipboard is None or (pending is not None and pending is not _pending_clipboard):
+            return
+        text, job_id = _pending_clipboard
+        _pending_clipboard = None
+        start = time.perf_counter()
         try:
-            old_clipboard = pyperclip.paste()
+            backend.copy(text)
         except Exception:
-            old_clipboard = ""
+            pass
+    # The completion's trace is written by now; the restore is logged under its job
+    log_span("restore", time.perf_counter() - start, job=job_id)
+
+
+def _restore_clipboard_later(old_clipboard: str, job: CompletionJob):
+    """Restores the clipboard once the app has read the pasted completion, without waiting."""
+    global _pending_clipboard
+    pending = [old_clipboard, job.id]
+    with _clipboard_lock:
+        _pending_clipboard = pending
+    backend.call_later(CLIPBOARD_RESTORE_DELAY, restore_clipboard, pending)
+
+
+def _restore_field(text_before_cursor, old_clipboard):
+    """Puts the field and the clipboard back the way they were before a completion."""
+    try:
+        if text_before_cursor and STREAMING:
+            # Part of the completion may already have been inserted
+            _replace_selection(text_before_cursor)
+        elif text_before_cursor is not None:
+            backend.send("right")
+        if old_clipboard is not None:
+            with span("restore"):
+                backend.copy(old_clipboard)
+    except Exception as e:
+        print(f"[SmartType] Could not restore the text field: {e}")
+
+
+def _wait_for_clients(job: CompletionJob):
+    """Waits for the Claude clients if the hotkey was pressed while main was still creating them."""
+    while async_client is None:
+        if startup_error is not None:
+            raise RuntimeError(f"Claude client not available ({startup_error})")
+        job.check()
+        time.sleep(POLL_INTERVAL)
+
+
+def _api_errors():
+    """``anthropic.APIError``, or no exception type while the library is not loaded yet."""
+    anthropic = sys.modules.get("anthropic")
+    return () if anthropic is None else anthropic.APIError
+
 
-        # Clear clipboard to detect fresh copy
-        pyperclip.copy("")
-        time.sleep(0.05)
+def process_textfield(job: CompletionJob = None):
+    """Reads backwards from cursor, completes the text.
+
+    ``job`` carries the settings of the hotkey press; by default the
+    current ones are used.
+    """
+    if job is None:
+        job = CompletionJob(current_language, marker_mode)
+    language = job.language
+    if speculator is not None:
+        speculator.suspend()
+    trace = start_trace(model=MODEL, language=language, job=job.id,
+                        mode="marker" if job.marker_mode else "full", outcome="error")
+    # Time spent waiting in the queue counts towards the total
+    trace.start = job.created
+    trace.add("queue", time.perf_counter() - job.created)
+    old_clipboard = None
+    text_before_cursor = None
+
+    try:
+        job.check()
+        # The previous completion's clipboard is the one to save
+        restore_clipboard()
+
+        # Save current clipboard
+        with span("clipboard_save"):
+            try:
+                old_clipboard = backend.paste()
+            except Exception:
+                old_clipboard = ""
 
         # Select everything from cursor to beginning of text field and copy
-        keyboard.send("ctrl+shift+home")
-        time.sleep(0.1)
-        keyboard.send("ctrl+c")
-        time.sleep(0.15)
-        text_before_cursor = pyperclip.paste()
+        with span("capture"):
+            text_before_cursor = _capture_before_cursor()
 
         if not text_before_cursor or not text_before_cursor.strip():
-            keyboard.send("right")
+            backend.send("right")
             print("[SmartType] No text found.")
-            winsound.MessageBeep(winsound.MB_ICONEXCLAMATION)
+            annotate(outcome="no_text")
+            backend.play("warning")
             try:
-                pyperclip.copy(old_clipboard)
+                backend.copy(old_clipboard)
             except Exception:
                 pass
             return
 
-        if marker_mode:
-            # Marker mode: find ... and complete only the text after it
-            if "..." not in text_before_cursor:
-                keyboard.send("right")
+        with span("parse"):
+            if job.marker_mode:
+                # Marker mode: find ... and complete only the text after it
+                marker_pos = text_before_cursor.rfind("...")
+                incomplete = text_before_cursor[marker_pos + 3:] if marker_pos >= 0 else ""
+                # Keep everything before the ... marker as prefix
+                prefix = text_before_cursor[:marker_pos]
+                done = context = ""
+            else:
+                # Full line mode: complete the paragraph at the cursor; finished
+                # paragraphs before it are kept and sent as context
+                prefix, incomplete = split_segment(text_before_cursor)
+                # So are the sentences SmartType already wrote in this paragraph
+                done, incomplete = sentence_memo.split_known(incomplete)
+                prefix += done
+                context = trim_context(prefix, CONTEXT_TOKENS)
+
+        if job.marker_mode and (marker_pos < 0 or not incomplete.strip()):
+            backend.send("right")
+            if marker_pos < 0:
                 print("[SmartType] No ... marker found.")
-                winsound.MessageBeep(winsound.MB_ICONEXCLAMATION)
-                try:
-                    pyperclip.copy(old_clipboard)
-                except Exception:
-                    pass
-                return
-
-            marker_pos = text_before_cursor.rfind("...")
-            incomplete = text_before_cursor[marker_pos + 3:]
-
-            if not incomplete.strip():
-                keyboard.send("right")
+            else:
                 print("[SmartType] No text after ... found.")
-                winsound.MessageBeep(winsound.MB_ICONEXCLAMATION)
-                try:
-                    pyperclip.copy(old_clipboard)
-                except Exception:
-                    pass
-                return
-
-            # Keep everything before the ... marker as prefix
-            prefix = text_before_cursor[:marker_pos]
-        else:
-            # Full line mode: complete the entire selected text
-            incomplete = text_before_cursor
-            prefix = ""
+            annotate(outcome="no_marker")
+            backend.play("warning")
+            try:
+                backend.copy(old_clipboard)
+            except Exception:
+                pass
+            return
+
+        if not incomplete.strip():
+            backend.send("right")
+            print("[SmartType] Nothing new to complete.")
+            annotate(outcome="unchanged")
+            backend.play("warning")
+            try:
+                backend.copy(old_clipboard)
+            except Exception:
+                pass
+            return
 
         print(f"[SmartType] Processing: \"{incomplete.strip()[:60]}\"")
+        if done:
+            print(f"  Kept {len(split_sentences(done))} sentence(s) completed before")
+        if prefix and not job.marker_mode:
+            print(f"  Context: ~{estimate_tokens(context)} of ~{estimate_tokens(prefix)} tokens before the text")
 
-        # Feedback sound: processing started
-        winsound.Beep(800, 150)
+        source = "api"
+        completed = cached_completion(incomplete, context, language=language, prompt=job.prompt)
+        if completed is not None:
+            source = "cache"
+            print("  Cache hit")
+        # Speculation completes with the current language and prompt
+        if (completed is None and speculator is not None and language == current_language
+                and job.prompt in (None, current_prompt)):
+            completed = speculator.take(incomplete, timeout=job.timeout(), check=job.check) or None
+            if completed is not None:
+                source = "speculative"
+                print("  Speculative hit")
+        if completed is None and LOCAL_EXPANSION:
+            completed = expand_locally(incomplete, language)
+            if completed is not None:
+                source = "local"
+                print("  Local expansion")
+        annotate(source=source)
 
-        completed = complete_with_ai(incomplete)
+        if completed is not None:
+            # Known or locally resolved input: skip the network round trip entirely
+            _replace_selection(prefix + completed)
+        else:
+            _wait_for_clients(job)
+            if connections is not None:
+                annotate(connection=connections.state())
 
-        print(f"  Result: \"{completed[:60]}\"")
+            # Feedback sound: processing started
+            with span("sound"):
+                backend.play("start")
 
-        # Re-select everything from cursor to start (selection may have been lost during API call)
-        keyboard.send("right")
-        time.sleep(0.05)
-        keyboard.send("ctrl+shift+home")
-        time.sleep(0.1)
+            if STREAMING:
+                completed = _stream_into_field(prefix, incomplete, context, job)
+            else:
+                completed = _bounded_call(
+                    job, acomplete_with_ai(incomplete, context, language=language, prompt=job.prompt),
+                )
+                _replace_selection(prefix + completed)
 
-        # Replace entire selection with prefix + completed text
-        pyperclip.copy(prefix + completed)
-        time.sleep(0.05)
-        keyboard.send("ctrl+v")
-        time.sleep(0.2)
+        trace.add("total", time.perf_counter() - trace.start)
+        annotate(outcome="ok")
+        sentence_memo.add(completed)
+        _learn_later(incomplete, completed, language)
+        _remember_undoable(_cache_key(incomplete, context, language=language, prompt=job.prompt))
+        print(f"  Result: \"{completed[:60]}\"")
 
         # Feedback sound: done
-        winsound.Beep(1200, 150)
-        time.sleep(0.1)
-        winsound.Beep(1500, 150)
+        with span("sound"):
+            backend.play("done")
 
         print("[SmartType] Done!\n")
 
-        # Restore clipboard after short delay
-        time.sleep(1.0)
-        try:
-            pyperclip.copy(old_clipboard)
-        except Exception:
-            pass
+        # The worker moves on; the next completion restores it first if still pending
+        _restore_clipboard_later(old_clipboard, job)
 
-    except anthropic.APIError as e:
+    except CompletionAborted as e:
+        annotate(outcome=e.reason)
+        if e.reason == "cancelled":
+            print("[SmartType] Cancelled.")
+        else:
+            print(f"[SmartType] No result within {DEADLINE:g} s, aborted.")
+        _restore_field(text_before_cursor, old_clipboard)
+        backend.play(e.reason)
+    except RunawayOutput as e:
+        print(f"[SmartType] {e}, discarded.")
+        annotate(outcome="runaway")
+        _restore_field(text_before_cursor, old_clipboard)
+        backend.play("warning")
+    except _api_errors() as e:
         print(f"[SmartType] API error: {e}")
-        winsound.MessageBeep(winsound.MB_ICONHAND)
+        annotate(outcome="api_error")
+        _restore_field(text_before_cursor, old_clipboard)
+        backend.play("error")
     except Exception as e:
         print(f"[SmartType] Error: {e}")
-        winsound.MessageBeep(winsound.MB_ICONHAND)
+        _restore_field(text_before_cursor, old_clipboard)
+        backend.play("error")
     finally:
-        _processing = False
+        end_trace()
+        if speculator is not None:
+            speculator.reset()
 
 
-def on_hotkey():
-    """Called when the hotkey is pressed."""
-    threading.Thread(target=process_textfield, daemon=True).start()
+# ── Completion Worker ────────────────────────────────────────────
 
+def _work():
+    """Processes queued hotkey presses one after another.
 
-def show_toast(message: str, duration_ms: int = 1500):
-    """Shows a brief on-screen notification (toast) at the top and bottom."""
-    def _show():
-        root = tk.Tk()
-        root.withdraw()
-
-        screen_w = root.winfo_screenwidth()
-        screen_h = root.winfo_screenheight()
-
-        windows = []
-        for position in ("top", "bottom"):
-            win = tk.Toplevel(root)
-            win.overrideredirect(True)
-            win.attributes("-topmost", True)
-            win.attributes("-alpha", 0.9)
-            win.configure(bg="#1e1e2e")
-
-            label = tk.Label(
-                win, text=message, font=("Segoe UI", 18, "bold"),
-                fg="#cdd6f4", bg="#1e1e2e", padx=30, pady=15,
-            )
-            label.pack()
+    Being the only thread that sends keys and touches the clipboard for a
+    completion, the worker keeps captures and pastes from interleaving.
+    """
+    global _current_job
+    while True:
+        job = _jobs.get()
+        with _queue_lock:
+            _queued.discard(job.key)
+            _current_job = job
+        try:
+            process_textfield(job)
+        finally:
+            with _queue_lock:
+                _current_job = None
+            _jobs.task_done()
 
-            win.update_idletasks()
-            w = win.winfo_reqwidth()
-            h = win.winfo_reqheight()
-            x = (screen_w - w) // 2
 
-            if position == "top":
-                y = 80
-            else:
-                y = screen_h - h - 80
+def start_worker():
+    """Starts the completion worker thread (once)."""
+    global _worker
+    with _queue_lock:
+        if _worker is None:
+            _worker = threading.Thread(target=_work, name="smarttype-worker", daemon=True)
+            _worker.start()
 
-            win.geometry(f"{w}x{h}+{x}+{y}")
-            windows.append(win)
 
-        def _close():
-            for win in windows:
-                win.destroy()
-            root.destroy()
+def submit(job: CompletionJob) -> bool:
+    """Queues a completion; returns False if it was coalesced or rejected."""
+    start_worker()
+    with _queue_lock:
+        if job.key in _queued:
+            # An identical press is still waiting: it will capture the same field
+            print("[SmartType] Completion already queued.")
+            return False
+        try:
+            _jobs.put_nowait(job)
+        except queue.Full:
+            print(f"[SmartType] Busy: {QUEUE_SIZE} completions queued, press ignored.")
+            backend.play("warning")
+            return False
+        _queued.add(job.key)
+    return True
 
-        root.after(duration_ms, _close)
-        root.mainloop()
 
-    threading.Thread(target=_show, daemon=True).start()
+def on_hotkey():
+    """Called when the hotkey is pressed."""
+    if connections is not None:
+        connections.on_activity()
+    submit(CompletionJob(current_language, marker_mode))
+
+
+def cancel_completion():
+    """Called when the cancel hotkey is pressed: aborts the running completion."""
+    with _queue_lock:
+        job = _current_job
+    if job is None:
+        print("[SmartType] Nothing to cancel.")
+        return
+    job.cancelled.set()
+
+
+def show_toast(message: str, duration_ms: int = 1500):
+    """Shows a brief on-screen notification (toast) at the top and bottom."""
+    toasts.show(message, duration_ms)
 
 
 def toggle_language():
     """Toggles between German and English."""
     global current_language, current_prompt
     current_language = "en" if current_language == "de" else "de"
-    current_prompt = load_prompt(current_language)
+    current_prompt = PROMPTS[current_language]
     lang_name = LANG_NAMES.get(current_language, current_language)
     print(f"[SmartType] Language switched: {lang_name}")
     show_toast(f"\U0001F310 SmartType: {lang_name}")
-    if current_language == "de":
-        winsound.Beep(600, 150)
-        time.sleep(0.05)
-        winsound.Beep(800, 150)
-    else:
-        winsound.Beep(800, 150)
-        time.sleep(0.05)
-        winsound.Beep(1100, 150)
+    backend.play("lang_de" if current_language == "de" else "lang_en")
 
 
 def toggle_marker_mode():
@@ -296,11 +1092,4 @@ def toggle_marker_mode():
     mode_name = "...prefix" if marker_mode else "full line"
     print(f"[SmartType] Marker mode: {mode_name}")
     show_toast(f"SmartType: {mode_name}")
-    if marker_mode:
-        winsound.Beep(900, 100)
-        time.sleep(0.05)
-        winsound.Beep(1100, 100)
-    else:
-        winsound.Beep(1100, 100)
-        time.sleep(0.05)
-        winsound.Beep(900, 100)
+    backend.play("marker_on" if marker_mode else "marker_off")
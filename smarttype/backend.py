@@ -0,0 +1,225 @@
+"""
+SmartType - Desktop Backends
+==============================
+Everything the completion pipeline does to the desktop goes through a
+backend: sending keys, reading and writing the clipboard, playing
+feedback sounds, waiting and timers. ``DesktopBackend`` drives the real
+keyboard and clipboard; ``SimulatedTextField`` is an in-process text
+field for tests and benchmarks.
+"""
+
+import time
+import threading
+
+from smarttype.sound import PATTERNS, SYSTEM_SOUNDS
+
+
+class Backend:
+    """Interface between the completion pipeline and the desktop."""
+
+    def send(self, keys: str):
+        """Sends a key combination (keyboard library syntax) to the focused app."""
+        raise NotImplementedError
+
+    def copy(self, text: str):
+        """Puts text on the clipboard."""
+        raise NotImplementedError
+
+    def paste(self) -> str:
+        """Returns the clipboard text."""
+        raise NotImplementedError
+
+    def clipboard_sequence(self):
+        """Returns a number that changes with every clipboard change, or None."""
+        return None
+
+    def foreground_app(self) -> str:
+        """Returns the name of the application that has the focus."""
+        return "unknown"
+
+    def play(self, name: str):
+        """Plays a feedback sound without waiting for it."""
+
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+    def sleep(self, seconds: float):
+        time.sleep(seconds)
+
+    def call_later(self, seconds: float, callback, *args):
+        """Calls callback(*args) after seconds without waiting for it."""
+        timer = threading.Timer(seconds, callback, args)
+        timer.daemon = True
+        timer.start()
+        return timer
+
+
+class DesktopBackend(Backend):
+    """The real keyboard, clipboard and speakers; timers run on the ``engine`` loop
+    and their callbacks on its thread pool."""
+
+    def __init__(self, engine):
+        import keyboard
+        import pyperclip
+        from smarttype import clipboard
+        from smarttype.sound import create_player
+
+        self._keyboard = keyboard
+        self._pyperclip = pyperclip
+        self._clipboard = clipboard
+        self._player = create_player()
+        self._engine = engine
+
+    def send(self, keys: str):
+        self._keyboard.send(keys)
+
+    def copy(self, text: str):
+        self._pyperclip.copy(text)
+
+    def paste(self) -> str:
+        return self._pyperclip.paste()
+
+    def clipboard_sequence(self):
+        return self._clipboard.clipboard_sequence()
+
+    def foreground_app(self) -> str:
+        return self._clipboard.foreground_app()
+
+    def play(self, name: str):
+        self._player.play(name)
+
+    def call_later(self, seconds: float, callback, *args):
+        # The callbacks touch the clipboard and files: off the loop thread
+        return self._engine.call_later_blocking(seconds, callback, *args)
+
+
+class SimulatedTextField(Backend):
+    """A single-line text field with cursor, selection and clipboard.
+
+    Understands the keys SmartType sends (ctrl+shift+home, ctrl+c, ctrl+v,
+    right, ...). ``delays`` model a slow application: seconds until it
+    answers "copy" (puts the selection on the clipboard), "paste" (reads
+    the clipboard) and "key" (handles any other key).
+
+    With ``realtime=False`` delays are ignored, every key takes effect
+    immediately, ``sleep`` only advances a simulated clock and timers fire
+    at once, so the pipeline runs thousands of times per second.
+    """
+
+    def __init__(self, text: str = "", cursor: int = None, delays: dict = None,
+                 realtime: bool = False, app: str = "simulated.exe"):
+        self.text = text
+        self.cursor = len(text) if cursor is None else cursor
+        # Other end of the selection (None = nothing selected)
+        self.anchor = None
+        self.clipboard = ""
+        self.sequence = 0
+        self.delays = dict(delays or {})
+        self.realtime = realtime
+        self.app = app
+        self.sent = []
+        self.played = []
+        self._clock = 0.0
+        self._lock = threading.RLock()
+
+    def type(self, text: str, cursor: int = None):
+        """Replaces the field content, as if the user had typed it."""
+        with self._lock:
+            self.text = text
+            self.cursor = len(text) if cursor is None else cursor
+            self.anchor = None
+
+    @property
+    def selection(self) -> str:
+        with self._lock:
+            if self.anchor is None:
+                return ""
+            start, end = sorted((self.anchor, self.cursor))
+            return self.text[start:end]
+
+    # ── Backend interface ────────────────────────────────────────
+
+    def send(self, keys: str):
+        self.sent.append(keys)
+        kind = {"ctrl+c": "copy", "ctrl+v": "paste"}.get(keys, "key")
+        delay = self.delays.get(kind, 0.0) if self.realtime else 0.0
+        if delay > 0:
+            # Applications handle input asynchronously
+            timer = threading.Timer(delay, self._handle, args=(keys,))
+            timer.daemon = True
+            timer.start()
+        else:
+            self._handle(keys)
+
+    def copy(self, text: str):
+        with self._lock:
+            self.clipboard = text
+            self.sequence += 1
+
+    def paste(self) -> str:
+        with self._lock:
+            return self.clipboard
+
+    def clipboard_sequence(self):
+        with self._lock:
+            return self.sequence
+
+    def foreground_app(self) -> str:
+        return self.app
+
+    def play(self, name: str):
+        if name not in PATTERNS and name not in SYSTEM_SOUNDS:
+            raise KeyError(f"Unknown sound: {name}")
+        self.played.append(name)
+
+    def monotonic(self) -> float:
+        if self.realtime:
+            return time.monotonic()
+        with self._lock:
+            return self._clock
+
+    def sleep(self, seconds: float):
+        if self.realtime:
+            time.sleep(seconds)
+            return
+        with self._lock:
+            self._clock += max(seconds, 0.0)
+
+    def call_later(self, seconds: float, callback, *args):
+        if self.realtime:
+            return super().call_later(seconds, callback, *args)
+        self.sleep(seconds)
+        callback(*args)
+
+    # ── Key handling ─────────────────────────────────────────────
+
+    def _handle(self, keys: str):
+        with self._lock:
+            selected = self.anchor is not None and self.anchor != self.cursor
+            start, end = sorted((self.anchor, self.cursor)) if selected else (self.cursor, self.cursor)
+            if keys == "ctrl+shift+home":
+                if self.anchor is None:
+                    self.anchor = self.cursor
+                self.cursor = 0
+            elif keys == "ctrl+shift+end":
+                if self.anchor is None:
+                    self.anchor = self.cursor
+                self.cursor = len(self.text)
+            elif keys == "ctrl+c":
+                # Like most apps: copying without a selection leaves the clipboard alone
+                if selected:
+                    self.copy(self.text[start:end])
+            elif keys == "ctrl+v":
+                self.text = self.text[:start] + self.clipboard + self.text[end:]
+                self.cursor = start + len(self.clipboard)
+                self.anchor = None
+            elif keys == "right":
+                self.cursor = end if selected else min(self.cursor + 1, len(self.text))
+                self.anchor = None
+            elif keys == "left":
+                self.cursor = start if selected else max(self.cursor - 1, 0)
+                self.anchor = None
+            elif keys == "home":
+                self.cursor, self.anchor = 0, None
+            elif keys == "end":
+                self.cursor, self.anchor = len(self.text), None
@@ -0,0 +1,315 @@
+"""
+SmartType - Batch Expansion
+=============================
+Expands whole files of abbreviated text (``smarttype expand``): lines or
+paragraphs are completed concurrently, written in input order, and
+recorded in a journal so an interrupted run can resume. Very large jobs
+can go through the Message Batches API instead.
+"""
+
+import re
+import sys
+import json
+import time
+import random
+import hashlib
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+import anthropic
+
+# Attempts per unit on rate limits, overload and connection errors
+MAX_ATTEMPTS = 6
+# Backoff when the server gives no Retry-After (seconds, doubled per attempt)
+BACKOFF_INITIAL = 1.0
+BACKOFF_MAX = 60.0
+
+# Requests per Message Batch (the API allows 100,000 or 256 MB)
+MAX_BATCH_REQUESTS = 10_000
+# How often a running Message Batch is checked (seconds)
+BATCH_POLL_INTERVAL = 30.0
+
+
+# ── Input and output ─────────────────────────────────────────────
+
+def split_units(text: str, paragraphs: bool = False) -> list:
+    """Splits text into lines, or into paragraphs separated by blank lines."""
+    if paragraphs:
+        return re.split(r"\n(?:[ \t]*\n)+", text.strip("\n"))
+    return text.splitlines()
+
+
+def join_units(units: list, paragraphs: bool = False) -> str:
+    """Inverse of split_units (with a final newline)."""
+    return ("\n\n" if paragraphs else "\n").join(units) + "\n"
+
+
+def read_input(paths: list) -> str:
+    """Reads and concatenates the files, "-" or no files meaning stdin."""
+    if not paths:
+        paths = ["-"]
+    texts = []
+    for path in paths:
+        if path == "-":
+            texts.append(sys.stdin.read())
+        else:
+            texts.append(Path(path).read_text(encoding="utf-8"))
+    return "\n".join(text.rstrip("\n") for text in texts)
+
+
+def _fingerprint(unit: str) -> str:
+    return hashlib.sha256(unit.encode("utf-8")).hexdigest()[:16]
+
+
+class Journal:
+    """Append-only record of finished units, used to resume a run.
+
+    Each line is {"i": index, "in": input fingerprint, "out": result}, or
+    {"batch": id, "units": [indexes]} for a submitted Message Batch.
+    """
+
+    def __init__(self, path: Path, resume: bool = False):
+        self.path = Path(path)
+        self.done = {}
+        self.batches = []
+        if resume:
+            self._load()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = self.path.open("a" if resume else "w", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def _load(self):
+        try:
+            lines = self.path.read_text(encoding="utf-8").splitlines()
+        except FileNotFoundError:
+            return
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # The last line may be cut off by the interruption
+                continue
+            if "batch" in entry:
+                self.batches.append(entry)
+            else:
+                self.done[entry["i"]] = entry
+
+    def finished(self, index: int, unit: str):
+        """Returns the recorded result of a unit, or None."""
+        entry = self.done.get(index)
+        if entry is None or entry["in"] != _fingerprint(unit):
+            return None
+        return entry["out"]
+
+    def record(self, index: int, unit: str, result: str):
+        self._write({"i": index, "in": _fingerprint(unit), "out": result})
+
+    def record_batch(self, batch_id: str, indexes: list):
+        entry = {"batch": batch_id, "units": indexes}
+        self.batches.append(entry)
+        self._write(entry)
+
+    def _write(self, entry: dict):
+        with self._lock:
+            self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._file.flush()
+
+    def close(self, delete: bool = False):
+        self._file.close()
+        if delete:
+            self.path.unlink(missing_ok=True)
+
+
+# ── Concurrent expansion ─────────────────────────────────────────
+
+class Throttle:
+    """Shared pause for all workers after the API asked to slow down."""
+
+    def __init__(self):
+        self._resume_at = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        while True:
+            with self._lock:
+                delay = self._resume_at - time.monotonic()
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+    def backoff(self, seconds: float):
+        with self._lock:
+            self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+
+
+def retry_delay(error: Exception, attempt: int):
+    """Seconds to wait before retrying after error, or None if it should not be retried."""
+    if not isinstance(error, (anthropic.RateLimitError, anthropic.InternalServerError,
+                              anthropic.APIConnectionError)):
+        return None
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(retry_after)
+    except (TypeError, ValueError):
+        # Jitter keeps the workers from retrying in lockstep
+        return min(BACKOFF_INITIAL * 2 ** attempt, BACKOFF_MAX) * random.uniform(0.75, 1.25)
+
+
+class Stats:
+    """Counters of an expansion run."""
+
+    def __init__(self):
+        self.units = 0
+        self.completed = 0
+        self.resumed = 0
+        self.failed = 0
+        self.retries = 0
+        self.start = time.perf_counter()
+
+    def report(self) -> str:
+        elapsed = time.perf_counter() - self.start
+        rate = self.units / elapsed if elapsed > 0 else 0.0
+        return (f"[SmartType] Expanded {self.units} units in {elapsed:.1f} s ({rate:.1f}/s):"
+                f" {self.completed} completed, {self.resumed} resumed, {self.failed} failed,"
+                f" {self.retries} retries")
+
+
+def expand_concurrently(units: list, complete, concurrency: int = 4, journal: Journal = None,
+                        stats: Stats = None):
+    """Completes units with ``complete(unit)`` on a thread pool.
+
+    Yields the results in input order as soon as they are available.
+    Blank units are passed through, units in the journal are not
+    completed again, and a unit that keeps failing is yielded unchanged.
+    """
+    stats = stats or Stats()
+    throttle = Throttle()
+    retry_lock = threading.Lock()
+
+    def run(unit):
+        for attempt in range(MAX_ATTEMPTS):
+            throttle.wait()
+            try:
+                return complete(unit), None
+            except Exception as e:
+                delay = retry_delay(e, attempt)
+                if delay is None or attempt == MAX_ATTEMPTS - 1:
+                    return None, e
+                with retry_lock:
+                    stats.retries += 1
+                throttle.backoff(delay)
+
+    window = concurrency * 4
+    pending = {}
+    results = {}
+    next_index = 0
+    upcoming = iter(enumerate(units))
+    exhausted = False
+    pool = ThreadPoolExecutor(max_workers=concurrency)
+    try:
+        while True:
+            while next_index in results:
+                yield results.pop(next_index)
+                next_index += 1
+            if exhausted and not pending:
+                return
+            if not exhausted and len(pending) < window and len(results) < window:
+                try:
+                    index, unit = next(upcoming)
+                except StopIteration:
+                    exhausted = True
+                    continue
+                stats.units += 1
+                previous = journal.finished(index, unit) if journal is not None else None
+                if not unit.strip():
+                    results[index] = unit
+                elif previous is not None:
+                    stats.resumed += 1
+                    results[index] = previous
+                else:
+                    pending[pool.submit(run, unit)] = (index, unit)
+                continue
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                index, unit = pending.pop(future)
+                result, error = future.result()
+                if error is not None:
+                    stats.failed += 1
+                    print(f"[SmartType] Unit {index + 1} failed, kept unchanged: {error}")
+                    results[index] = unit
+                    continue
+                stats.completed += 1
+                results[index] = result
+                if journal is not None:
+                    journal.record(index, unit, result)
+    finally:
+        # On interruption, queued units are dropped; the journal has the finished ones
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+# ── Message Batches API ──────────────────────────────────────────
+
+def expand_with_batches(units: list, client, build_params, journal: Journal, stats: Stats = None,
+                        poll_interval: float = BATCH_POLL_INTERVAL) -> list:
+    """Completes units through the Message Batches API; returns all results in order.
+
+    ``build_params(unit)`` returns the Messages API parameters of a unit.
+    Batches recorded in the journal are collected instead of resubmitted.
+    """
+    stats = stats or Stats()
+    results = {}
+    todo = []
+    for index, unit in enumerate(units):
+        stats.units += 1
+        previous = journal.finished(index, unit)
+        if not unit.strip():
+            results[index] = unit
+        elif previous is not None:
+            stats.resumed += 1
+            results[index] = previous
+        else:
+            todo.append(index)
+
+    submitted = {i for batch in journal.batches for i in batch["units"]}
+    batch_ids = [batch["batch"] for batch in journal.batches]
+    todo = [i for i in todo if i not in submitted]
+    for start in range(0, len(todo), MAX_BATCH_REQUESTS):
+        chunk = todo[start:start + MAX_BATCH_REQUESTS]
+        batch = client.messages.batches.create(requests=[
+            {"custom_id": f"unit-{i}", "params": build_params(units[i])} for i in chunk
+        ])
+        journal.record_batch(batch.id, chunk)
+        batch_ids.append(batch.id)
+        print(f"[SmartType] Submitted batch {batch.id} with {len(chunk)} requests")
+
+    for batch_id in batch_ids:
+        while True:
+            batch = client.messages.batches.retrieve(batch_id)
+            counts = batch.request_counts
+            if batch.processing_status == "ended":
+                break
+            print(f"[SmartType] Batch {batch_id}: {counts.succeeded} done,"
+                  f" {counts.processing} processing, {counts.errored} errored")
+            time.sleep(poll_interval)
+        for entry in client.messages.batches.results(batch_id):
+            index = int(entry.custom_id.rsplit("-", 1)[1])
+            if index in results:
+                continue
+            if entry.result.type == "succeeded":
+                text = entry.result.message.content[0].text.strip()
+                stats.completed += 1
+                results[index] = text
+                journal.record(index, units[index], text)
+            else:
+                stats.failed += 1
+                print(f"[SmartType] Unit {index + 1} {entry.result.type}, kept unchanged")
+                results[index] = units[index]
+
+    # Units of batches that expired from the API before they were collected
+    for index, unit in enumerate(units):
+        if index not in results:
+            stats.failed += 1
+            results[index] = unit
+    return [results[i] for i in range(len(units))]
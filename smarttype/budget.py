@@ -0,0 +1,125 @@
+"""
+SmartType - Output Budget
+===========================
+Keeps completions from running long: ``max_tokens`` of each request is
+set from the input length and how much completions of that language
+usually expand, and a guard watches the output and ends it when it
+turns into an explanation, a list of alternatives or a second answer.
+"""
+
+import re
+import threading
+from collections import deque
+from itertools import islice
+
+from smarttype.latency import percentile
+
+# Upper limit of every request (the former fixed max_tokens)
+MAX_OUTPUT_TOKENS = 2048
+# Lower limit: short inputs still get room for punctuation and capitalization
+MIN_OUTPUT_TOKENS = 64
+# Output tokens per input character until enough completions were seen (generous)
+DEFAULT_RATIO = 1.0
+# Budget = input characters x p95 ratio x margin
+BUDGET_MARGIN = 1.5
+BUDGET_MIN_SAMPLES = 20
+# Recent completions per language kept for the ratio
+BUDGET_WINDOW = 200
+
+# Guard: output longer than this many characters per input character went off the rails
+MAX_OUTPUT_RATIO = 4.0
+MIN_OUTPUT_CHARS = 80
+
+# Breaks followed by more text (a trailing newline is harmless); Windows
+# clipboards end lines with \r\n
+_PARAGRAPH_BREAK = re.compile(r"\r?\n(?:[ \t]*\r?\n)+(?=\s*\S)")
+_LINE_BREAK = re.compile(r"[ \t]*\r?\n(?=\s*\S)")
+
+
+class RunawayOutput(Exception):
+    """A completion went off the rails and has no usable part."""
+
+
+class OutputBudget:
+    """Per-language output token budgets learned from past completions."""
+
+    def __init__(self, window: int = BUDGET_WINDOW):
+        self.window = window
+        self._ratios = {}
+        self._lock = threading.Lock()
+
+    def record(self, language: str, input_chars: int, output_tokens: int):
+        """Adds a finished completion (not one cut off by its budget)."""
+        if input_chars <= 0:
+            return
+        with self._lock:
+            self._ratios.setdefault(language, deque(maxlen=self.window)).append(output_tokens / input_chars)
+
+    def seed(self, records):
+        """Adds the completions of latency log records (see smarttype.latency)."""
+        for record in records:
+            if record.get("language") and record.get("input_chars") and record.get("output_tokens"):
+                self.record(record["language"], record["input_chars"], record["output_tokens"])
+
+    def ratio(self, language: str) -> float:
+        """p95 output tokens per input character of a language."""
+        with self._lock:
+            ratios = list(self._ratios.get(language, ()))
+        if len(ratios) < BUDGET_MIN_SAMPLES:
+            return DEFAULT_RATIO
+        return percentile(ratios, 95)
+
+    def max_tokens(self, language: str, text: str) -> int:
+        """The max_tokens of a request completing text."""
+        budget = len(text.strip()) * self.ratio(language) * BUDGET_MARGIN
+        return int(min(max(budget, MIN_OUTPUT_TOKENS), MAX_OUTPUT_TOKENS))
+
+
+class RunawayGuard:
+    """Watches the output of one completion for signs that it went off the rails.
+
+    A completion has as many line breaks as a single line input and as
+    many paragraph breaks as any other input: an extra break starts an
+    explanation, a list of alternatives or a repeated answer, and only the
+    text before it is used. Output much longer than the input has no
+    usable part.
+    """
+
+    def __init__(self, input_text: str, max_ratio: float = MAX_OUTPUT_RATIO):
+        text = input_text.strip()
+        self.max_chars = max(MIN_OUTPUT_CHARS, int(len(text) * max_ratio))
+        if not _LINE_BREAK.search(text):
+            self._break, self._break_name = _LINE_BREAK, "a line break"
+        else:
+            self._break, self._break_name = _PARAGRAPH_BREAK, "an extra paragraph"
+        # Breaks of the input itself are kept
+        self._allowed = len(self._break.findall(text))
+        self.reason = None
+
+    def check(self, output: str):
+        """Returns None while output looks fine, else the usable beginning of it.
+
+        Raises RunawayOutput when the output has no usable beginning.
+        """
+        end = len(output)
+        breaks = self._break.finditer(output, len(output) - len(output.lstrip()))
+        match = next(islice(breaks, self._allowed, None), None)
+        if match is not None:
+            end = match.start()
+            self.reason = self._break_name
+        if len(output[:end].strip()) > self.max_chars:
+            self.reason = f"over {self.max_chars} characters"
+            return self._usable("")
+        if end < len(output):
+            return self._usable(output[:end])
+        return None
+
+    def accept(self, output: str) -> str:
+        """Returns the usable part of a finished output (stripped)."""
+        usable = self.check(output)
+        return (output if usable is None else usable).strip()
+
+    def _usable(self, text: str) -> str:
+        if not text.strip():
+            raise RunawayOutput(f"Completion went off the rails ({self.reason})")
+        return text
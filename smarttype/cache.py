@@ -0,0 +1,161 @@
+"""
+SmartType - Completion Cache
+==============================
+Two-tier cache for completions: an in-memory LRU in front of an
+on-disk SQLite store with size and age eviction.
+"""
+
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+
+
+def normalize_text(text: str) -> str:
+    """Normalizes Unicode (NFC) and collapses all whitespace runs."""
+    text = unicodedata.normalize("NFC", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def prompt_hash(prompt: str) -> str:
+    """Returns a short, stable hash of a system prompt."""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+
+
+def make_key(text: str, language: str, prompt: str, model: str, context: str = "") -> str:
+    """Builds the cache key for a completion request."""
+    parts = [normalize_text(text), language, prompt_hash(prompt), model, normalize_text(context)]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+class CompletionCache:
+    """In-memory LRU backed by a SQLite file.
+
+    Entries older than ``max_age_days`` are dropped, and the disk store is
+    trimmed to the ``max_entries`` most recently used completions.
+    """
+
+    def __init__(self, path: Path, max_memory: int = 256, max_entries: int = 5000,
+                 max_age_days: float = 90):
+        self.path = Path(path)
+        self.max_memory = max_memory
+        self.max_entries = max_entries
+        self.max_age = max_age_days * 86400
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._puts = 0
+        self._db = None
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS completions ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                " created REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS completions_last_used ON completions(last_used)"
+            )
+            self._db.commit()
+            self.evict()
+        except sqlite3.Error as e:
+            print(f"[SmartType] Cache disabled on disk ({self.path}): {e}")
+            self._db = None
+
+    def get(self, key: str):
+        """Returns the cached completion for key, or None."""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+            if self._db is None:
+                return None
+            now = time.time()
+            try:
+                row = self._db.execute(
+                    "SELECT value, created FROM completions WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                if now - row[1] > self.max_age:
+                    self._db.execute("DELETE FROM completions WHERE key = ?", (key,))
+                    self._db.commit()
+                    return None
+                self._db.execute(
+                    "UPDATE completions SET last_used = ? WHERE key = ?", (now, key)
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"[SmartType] Cache read failed: {e}")
+                return None
+            self._remember(key, row[0])
+            return row[0]
+
+    def put(self, key: str, value: str):
+        """Stores a completion in both tiers."""
+        with self._lock:
+            self._remember(key, value)
+            if self._db is None:
+                return
+            now = time.time()
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO completions (key, value, created, last_used)"
+                    " VALUES (?, ?, ?, ?)",
+                    (key, value, now, now),
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"[SmartType] Cache write failed: {e}")
+                return
+            self._puts += 1
+        if self._puts % 100 == 0:
+            self.evict()
+
+    def discard(self, key: str):
+        """Removes a completion from both tiers (e.g. one the user undid)."""
+        with self._lock:
+            self._memory.pop(key, None)
+            if self._db is None:
+                return
+            try:
+                self._db.execute("DELETE FROM completions WHERE key = ?", (key,))
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"[SmartType] Cache write failed: {e}")
+
+    def evict(self):
+        """Drops expired entries and trims the disk store to max_entries."""
+        with self._lock:
+            if self._db is None:
+                return
+            try:
+                self._db.execute(
+                    "DELETE FROM completions WHERE created < ?",
+                    (time.time() - self.max_age,),
+                )
+                self._db.execute(
+                    "DELETE FROM completions WHERE key NOT IN ("
+                    " SELECT key FROM completions ORDER BY last_used DESC LIMIT ?)",
+                    (self.max_entries,),
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"[SmartType] Cache eviction failed: {e}")
+
+    def close(self):
+        """Closes the disk store."""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _remember(self, key: str, value: str):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory:
+            self._memory.popitem(last=False)
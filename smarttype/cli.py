@@ -1,25 +1,33 @@
 """
 SmartType - CLI Entry Point
 ==============================
-Handles startup, API key prompt, and hotkey registration.
+Handles startup, API key prompt, and hotkey registration. The hotkeys
+are registered first; the Claude client (anthropic, httpx, pydantic) and
+local data are loaded by a background warm-up thread.
 """
 
 import sys
-import time
-import winsound
+import argparse
+import threading
+import functools
+import contextlib
 
 import keyboard
-import anthropic
 
 from smarttype import __version__
 from smarttype.app import (
-    API_KEY, HOTKEY, LANG_TOGGLE_HOTKEY, MARKER_TOGGLE_HOTKEY, MODEL,
-    LANG_NAMES, current_language, marker_mode,
-    load_prompt, on_hotkey, toggle_language, toggle_marker_mode,
+    API_KEY, LANG_NAMES, current_language, marker_mode,
+    cancel_completion, load_prompts, on_hotkey, toggle_language, toggle_marker_mode,
 )
 from pathlib import Path
 from dotenv import load_dotenv, set_key
 import smarttype.app as app
+from smarttype.cache import CompletionCache
+from smarttype.config import ConfigError, ConfigWatcher
+from smarttype.routing import Router
+from smarttype.speculative import Speculator
+from smarttype.latency import configure_log, format_report, read_records, summarize
+from smarttype.usage import GROUPS, UsageStore, find_drift, format_usage_report, summarize_usage
 
 
 def prompt_for_api_key():
@@ -61,25 +69,215 @@ def prompt_for_api_key():
     print()
 
 
-def main():
-    """Main entry point for SmartType."""
+def stats_latency():
+    """Prints latency percentiles per phase and per model/language."""
+    log_path = app.DATA_DIR / "latency.jsonl"
+    summary = summarize(read_records(log_path))
+    if not summary["phases"]:
+        print(f"No latency data in {log_path}")
+        return
+    print(format_report(summary))
+
+
+def stats_usage(args):
+    """Prints token usage and cost per group and flags drifting configurations."""
+    db_path = app.DATA_DIR / "usage.sqlite3"
+    group_by = tuple(args.by.split(","))
+    unknown = [name for name in group_by if name not in GROUPS]
+    if unknown:
+        print(f"[SmartType] ERROR: cannot group by {', '.join(unknown)} (choose from {', '.join(GROUPS)})")
+        sys.exit(1)
+    summary = summarize_usage(db_path, group_by, args.days)
+    if not summary:
+        print(f"No usage data in {db_path}")
+        return
+    print(format_usage_report(summary, find_drift(db_path), group_by))
+
+
+def expand(args):
+    """Expands abbreviated text from files or stdin (smarttype expand)."""
+    from smarttype.batch import (
+        Journal, Stats, expand_concurrently, expand_with_batches, join_units, read_input, split_units,
+    )
+    from smarttype.connection import ConnectionManager
+
+    if not app.API_KEY:
+        print("[SmartType] ERROR: CLAUDE_API_KEY is not set", file=sys.stderr)
+        sys.exit(1)
+    units = split_units(read_input(args.files), args.paragraphs)
+    language = args.language or app.current_language
+    app.PROMPTS.update(load_prompts())
+    # Rate limits are retried by the batch engine with one shared pause
+    connections = ConnectionManager(app.API_KEY, app.engine, keepalive_interval=0, max_retries=0)
+    app.client = connections.client
+    app.async_client = connections.async_client
+    try:
+        app.router = Router(app.MODELS, app.ROUTING)
+    except ValueError as e:
+        print(f"[SmartType] ERROR: {e}", file=sys.stderr)
+        sys.exit(1)
+    if app.CACHE_ENABLED:
+        app.completion_cache = CompletionCache(app.DATA_DIR / "cache.sqlite3")
+    if app.USAGE_LOG:
+        app.usage_store = UsageStore(app.DATA_DIR / "usage.sqlite3")
+
+    if args.journal:
+        journal_path = Path(args.journal)
+    elif args.output:
+        journal_path = Path(args.output + ".journal")
+    else:
+        journal_path = app.DATA_DIR / "expand.journal"
+    journal = Journal(journal_path, resume=args.resume)
+    stats = Stats()
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    separator = "\n\n" if args.paragraphs else "\n"
+
+    # Progress messages go to stderr so that stdout only carries the expanded text
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            if args.batch_api:
+                results = expand_with_batches(
+                    units, app.client, lambda unit: app.batch_params(unit, language=language),
+                    journal, stats,
+                )
+                out.write(join_units(results, args.paragraphs))
+            else:
+                complete = functools.partial(app.complete_with_ai, language=language)
+                for i, result in enumerate(expand_concurrently(units, complete, args.concurrency,
+                                                               journal, stats)):
+                    out.write((separator if i else "") + result)
+                    out.flush()
+                if units:
+                    out.write("\n")
+    except KeyboardInterrupt:
+        journal.close()
+        print(f"\n[SmartType] Interrupted. Resume with --resume (journal: {journal_path})",
+              file=sys.stderr)
+        sys.exit(130)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if app.completion_cache is not None:
+            app.completion_cache.close()
+        if app.usage_store is not None:
+            app.usage_store.close()
+    journal.close(delete=True)
+    print(stats.report(), file=sys.stderr)
+
+
+# Handles of the registered hotkeys (replaced when the configuration changes)
+_hotkeys = []
+
+
+def register_hotkeys():
+    """Registers the hotkeys of the current configuration, replacing the previous ones."""
+    for handle in _hotkeys:
+        keyboard.remove_hotkey(handle)
+    _hotkeys[:] = [
+        keyboard.add_hotkey(app.HOTKEY, on_hotkey, suppress=True),
+        keyboard.add_hotkey(app.LANG_TOGGLE_HOTKEY, toggle_language, suppress=True),
+        keyboard.add_hotkey(app.MARKER_TOGGLE_HOTKEY, toggle_marker_mode, suppress=True),
+        keyboard.add_hotkey(app.CANCEL_HOTKEY, cancel_completion, suppress=True),
+    ]
+
+
+def read_config():
+    """Reads a configuration snapshot whose hotkeys the keyboard library accepts."""
+    return app.read_config(check_hotkey=keyboard.parse_hotkey)
+
+
+def reload_config(new):
+    """Applies a changed configuration (called by the watcher)."""
+    old = app.config
+    app.apply_config(new)
+    changed = [name for name in new._fields if getattr(new, name) != getattr(old, name)]
+    if any(name.endswith("hotkey") for name in changed):
+        register_hotkeys()
+    print(f"[SmartType] Configuration reloaded ({', '.join(changed) or 'no changes'}).")
+
+
+def warm_up():
+    """Creates the Claude clients and loads local data (run in the background by run()).
+
+    A failure is reported and recorded in ``app.startup_error``, so
+    completions waiting for the clients fail instead of waiting forever.
+    """
+    try:
+        # Pulls in anthropic, httpx and pydantic, the bulk of the startup time
+        from smarttype.connection import ConnectionManager
+
+        connections = ConnectionManager(app.API_KEY, app.engine, keepalive_interval=app.KEEPALIVE)
+        app.connections = connections
+        app.client = connections.client
+        # Completions waiting for the client go ahead from here
+        app.async_client = connections.async_client
+        connections.start()
+        if app.CACHE_ENABLED:
+            app.completion_cache = CompletionCache(app.DATA_DIR / "cache.sqlite3")
+        if app.LATENCY_LOG:
+            # Earlier completions set the hedge delays and output budgets
+            records = list(read_records(app.DATA_DIR / "latency.jsonl"))
+            app.router.stats.seed(records)
+            app.output_budget.seed(records)
+        if app.LOCAL_EXPANSION:
+            app.load_local_indexes()
+        if app.SPECULATIVE:
+            app.speculator = Speculator(
+                app.astream_with_ai, app.speculable_text, app.engine,
+                pause=app.SPECULATIVE_PAUSE, max_per_minute=app.SPECULATIVE_MAX_PER_MINUTE,
+            )
+            keyboard.on_press(app.speculator.on_key)
+    except Exception as e:
+        app.startup_error = e
+        print(f"[SmartType] ERROR: Start-up failed: {e}")
+        app.show_toast(f"SmartType: start-up failed ({e})", 5000)
+
+
+def run():
+    """Starts SmartType: registers the hotkeys and waits for them."""
     if not app.API_KEY:
         prompt_for_api_key()
 
-    # Initialize prompt and Claude client
-    app.current_prompt = load_prompt(app.current_language)
-    app.client = anthropic.Anthropic(api_key=app.API_KEY)
+    # Edits from here on are picked up by the watcher
+    watcher = ConfigWatcher(app.config_files(), read_config, reload_config)
+    try:
+        app.apply_config(read_config())
+    except ConfigError as e:
+        for error in str(e).splitlines():
+            print(f"[SmartType] ERROR: {error}")
+        sys.exit(1)
+    if app.USAGE_LOG:
+        app.usage_store = UsageStore(app.DATA_DIR / "usage.sqlite3")
+    if app.LATENCY_LOG:
+        configure_log(app.DATA_DIR / "latency.jsonl")
+
+    # Hotkeys first: a press before the warm-up is done waits for the client
+    app.start_worker()
+    register_hotkeys()
+    if app.LOCAL_EXPANSION or app.CACHE_ENABLED:
+        # Passed on to the app; only tells SmartType not to learn or reuse an undone completion
+        keyboard.add_hotkey("ctrl+z", app.on_undo)
+    threading.Thread(target=warm_up, name="smarttype-warmup", daemon=True).start()
+    watcher.start()
 
     print()
     print("=" * 55)
     print(f"  SmartType v{__version__} - AI Text Completion")
     print("=" * 55)
-    print(f"  Complete:          {HOTKEY}")
-    print(f"  Toggle language:   {LANG_TOGGLE_HOTKEY}")
-    print(f"  Toggle ...marker:  {MARKER_TOGGLE_HOTKEY}")
+    print(f"  Complete:          {app.HOTKEY}")
+    print(f"  Toggle language:   {app.LANG_TOGGLE_HOTKEY}")
+    print(f"  Toggle ...marker:  {app.MARKER_TOGGLE_HOTKEY}")
+    print(f"  Cancel:            {app.CANCEL_HOTKEY}")
     print(f"  Language:          {LANG_NAMES.get(app.current_language, app.current_language)}")
-    print(f"  Model:             {MODEL}")
+    if app.router.policy == "single":
+        print(f"  Model:             {app.router.models[0]}")
+    else:
+        print(f"  Models:            {', '.join(app.router.models)} ({app.router.policy})")
     print(f"  Marker mode:       {'ON (...prefix)' if app.marker_mode else 'OFF (full line)'}")
+    print(f"  Cache:             {app.DATA_DIR if app.CACHE_ENABLED else 'OFF'}")
+    print(f"  Local expansion:   {'ON' if app.LOCAL_EXPANSION else 'OFF'}")
+    print(f"  Speculative:       {'ON' if app.SPECULATIVE else 'OFF'}")
+    print(f"  Keep-alive:        {f'every {app.KEEPALIVE:g} s' if app.KEEPALIVE > 0 else 'OFF'}")
     print("=" * 55)
     print()
     print("  Write ... before incomplete text (marker mode),")
@@ -92,25 +290,72 @@ def main():
     print('    "Hi, ...cn yu tll me hw to gt to th sttion"')
     print('    \u2192 "Hi, Can you tell me how to get to the station?"')
     print()
-    print(f"  {HOTKEY} = Complete")
-    print(f"  {LANG_TOGGLE_HOTKEY} = Toggle language DE/EN")
-    print(f"  {MARKER_TOGGLE_HOTKEY} = Toggle ...marker mode")
+    print(f"  {app.HOTKEY} = Complete")
+    print(f"  {app.LANG_TOGGLE_HOTKEY} = Toggle language DE/EN")
+    print(f"  {app.MARKER_TOGGLE_HOTKEY} = Toggle ...marker mode")
+    print(f"  {app.CANCEL_HOTKEY} = Cancel running completion")
     print("  Ctrl+C = Exit")
     print()
 
-    keyboard.add_hotkey(HOTKEY, on_hotkey, suppress=True)
-    keyboard.add_hotkey(LANG_TOGGLE_HOTKEY, toggle_language, suppress=True)
-    keyboard.add_hotkey(MARKER_TOGGLE_HOTKEY, toggle_marker_mode, suppress=True)
+    # Toasts then appear without creating the Tk root first
+    app.toasts.start()
 
     # Startup sound
-    winsound.Beep(1000, 100)
-    time.sleep(0.05)
-    winsound.Beep(1200, 100)
+    app.backend.play("startup")
 
     try:
         keyboard.wait()
     except KeyboardInterrupt:
         print("\n[SmartType] Stopped.")
+    finally:
+        watcher.stop()
+        app.restore_clipboard()
+        app.commit_learning()
+        if app.connections is not None:
+            app.connections.stop()
+        if app.usage_store is not None:
+            app.usage_store.close()
+
+
+def main(argv=None):
+    """Main entry point for SmartType."""
+    parser = argparse.ArgumentParser(prog="smarttype", description="AI text completion for any text field")
+    parser.add_argument("--version", action="version", version=f"SmartType {__version__}")
+    commands = parser.add_subparsers(dest="command")
+    stats = commands.add_parser("stats", help="show statistics")
+    stats_commands = stats.add_subparsers(dest="stats_command", required=True)
+    stats_commands.add_parser("latency", help="latency percentiles per phase and model/language")
+    usage_parser = stats_commands.add_parser("usage", help="token usage and cost per day/model/language")
+    usage_parser.add_argument("--by", default="day,model,language",
+                              help=f"comma-separated grouping (of {', '.join(GROUPS)}; default: day,model,language)")
+    usage_parser.add_argument("--days", type=float, help="only the last DAYS days (default: all)")
+    expand_parser = commands.add_parser("expand", help="expand abbreviated text from files or stdin")
+    expand_parser.add_argument("files", nargs="*", help='input files ("-" or none: stdin)')
+    expand_parser.add_argument("-o", "--output", help="output file (default: stdout)")
+    expand_parser.add_argument("-l", "--language", choices=sorted(LANG_NAMES),
+                               help="language of the text (default: SMARTTYPE_LANGUAGE)")
+    expand_parser.add_argument("-p", "--paragraphs", action="store_true",
+                               help="expand paragraphs separated by blank lines instead of single lines")
+    expand_parser.add_argument("-j", "--concurrency", type=int, default=4,
+                               help="requests running at the same time (default: 4)")
+    expand_parser.add_argument("--resume", action="store_true",
+                               help="continue an interrupted run from its journal")
+    expand_parser.add_argument("--journal", help="journal file (default: OUTPUT.journal, or"
+                               " expand.journal in the data directory)")
+    expand_parser.add_argument("--batch-api", action="store_true",
+                               help="submit through the Message Batches API (cheaper, results within 24 h)")
+    args = parser.parse_args(argv)
+
+    if args.command == "expand":
+        expand(args)
+        return
+    if args.command == "stats":
+        if args.stats_command == "latency":
+            stats_latency()
+        elif args.stats_command == "usage":
+            stats_usage(args)
+        return
+    run()
 
 
 if __name__ == "__main__":
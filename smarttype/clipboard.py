@@ -0,0 +1,116 @@
+"""
+SmartType - Clipboard Capture
+===============================
+Waits for the clipboard to actually change instead of sleeping for a
+fixed time, and remembers how long each application takes to respond.
+"""
+
+import sys
+import threading
+
+# First poll interval and upper bound of the exponential backoff (seconds)
+POLL_INITIAL = 0.005
+POLL_MAX = 0.08
+
+# How long to wait after a paste, relative to the app's copy latency
+SETTLE_FACTOR = 2.0
+SETTLE_MIN = 0.03
+SETTLE_MAX = 0.3
+# Used until an app has answered at least once
+SETTLE_DEFAULT = 0.2
+
+
+if sys.platform == "win32":
+    import ctypes
+    from ctypes import wintypes
+    from pathlib import Path
+
+    _user32 = ctypes.windll.user32
+    _kernel32 = ctypes.windll.kernel32
+    _PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+
+    def clipboard_sequence():
+        """Returns the Windows clipboard sequence number."""
+        return _user32.GetClipboardSequenceNumber()
+
+    def foreground_app() -> str:
+        """Returns the executable name of the foreground window's process."""
+        hwnd = _user32.GetForegroundWindow()
+        pid = wintypes.DWORD()
+        _user32.GetWindowThreadProcessId(hwnd, ctypes.byref(pid))
+        handle = _kernel32.OpenProcess(_PROCESS_QUERY_LIMITED_INFORMATION, False, pid.value)
+        if not handle:
+            return "unknown"
+        try:
+            buf = ctypes.create_unicode_buffer(260)
+            size = wintypes.DWORD(len(buf))
+            if not _kernel32.QueryFullProcessImageNameW(handle, 0, buf, ctypes.byref(size)):
+                return "unknown"
+            return Path(buf.value).name.lower()
+        finally:
+            _kernel32.CloseHandle(handle)
+else:
+    def clipboard_sequence():
+        """Clipboard sequence numbers are only available on Windows."""
+        return None
+
+    def foreground_app() -> str:
+        """Foreground app detection is only available on Windows."""
+        return "unknown"
+
+
+def wait_for_change(backend, sequence_before, text_before: str, timeout: float):
+    """Polls with exponential backoff until the clipboard changes.
+
+    Uses the clipboard sequence number where available and falls back to
+    comparing the content. ``backend`` is a smarttype.backend.Backend.
+    Returns the new text, or None on timeout.
+    """
+    deadline = backend.monotonic() + timeout
+    interval = POLL_INITIAL
+    while True:
+        if sequence_before is not None:
+            changed = backend.clipboard_sequence() != sequence_before
+            text = backend.paste() if changed else None
+        else:
+            text = backend.paste()
+            changed = text != text_before
+        if changed:
+            return text
+        remaining = deadline - backend.monotonic()
+        if remaining <= 0:
+            return None
+        backend.sleep(min(interval, remaining))
+        interval = min(interval * 2, POLL_MAX)
+
+
+class AppLatencies:
+    """Clipboard response times per application (exponential moving average)."""
+
+    def __init__(self, alpha: float = 0.3):
+        self.alpha = alpha
+        self._latency = {}
+        self._lock = threading.Lock()
+
+    def record(self, app: str, seconds: float):
+        """Records how long an app took to answer a copy."""
+        with self._lock:
+            old = self._latency.get(app)
+            self._latency[app] = seconds if old is None else old + self.alpha * (seconds - old)
+
+    def get(self, app: str):
+        """Returns the average copy latency of an app, or None if unknown."""
+        with self._lock:
+            return self._latency.get(app)
+
+    def settle_time(self, app: str) -> float:
+        """How long to give an app to read the clipboard after a paste."""
+        latency = self.get(app)
+        if latency is None:
+            return SETTLE_DEFAULT
+        return min(max(latency * SETTLE_FACTOR, SETTLE_MIN), SETTLE_MAX)
+
+    def snapshot(self) -> dict:
+        """Returns a copy of all recorded latencies."""
+        with self._lock:
+            return dict(self._latency)
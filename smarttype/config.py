@@ -0,0 +1,214 @@
+"""
+SmartType - Configuration
+===========================
+The settings that can change while SmartType runs (hotkeys, models,
+routing, streaming, limits) and the system prompts, read into one
+immutable snapshot. A watcher polls the modification times of ``.env``
+and the prompt files and hands a new, validated snapshot over when they
+change; a bad edit is reported and the previous snapshot stays in use.
+"""
+
+import os
+import threading
+from pathlib import Path
+from types import MappingProxyType
+from typing import NamedTuple
+
+from dotenv import dotenv_values
+
+# How often the watcher looks at the files (seconds)
+WATCH_INTERVAL = 1.0
+
+# The process environment before .env was loaded: it takes precedence over
+# .env (as with load_dotenv), also when .env is read again
+ENVIRONMENT = dict(os.environ)
+
+
+class ConfigError(ValueError):
+    """A configuration that cannot be used (every problem on its own line)."""
+
+
+class Config(NamedTuple):
+    """Snapshot of the reloadable settings and the prompts of all languages."""
+
+    hotkey: str
+    lang_hotkey: str
+    marker_hotkey: str
+    cancel_hotkey: str
+    # Ordered models for routing (fast model first)
+    models: tuple
+    routing: str
+    streaming: bool
+    context_tokens: int
+    deadline: float
+    capture_timeout: float
+    # Language -> system prompt (read-only)
+    prompts: MappingProxyType
+
+
+def _flag(value: str) -> bool:
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def parse_settings(env, check_hotkey=None) -> dict:
+    """Reads the reloadable settings from environment variables.
+
+    ``check_hotkey`` (e.g. keyboard.parse_hotkey) raises ValueError for a
+    hotkey it cannot register. Raises ConfigError listing all bad values.
+    """
+    errors = []
+
+    def number(name, default, kind=float, minimum=None):
+        raw = env.get(name) or default
+        try:
+            value = kind(raw)
+        except ValueError:
+            errors.append(f"{name}: {raw!r} is not a{'n integer' if kind is int else ' number'}")
+            return kind(default)
+        return value if minimum is None else max(minimum, value)
+
+    def hotkey(name, default):
+        value = env.get(name) or default
+        if check_hotkey is not None:
+            try:
+                check_hotkey(value)
+            except ValueError as e:
+                errors.append(f"{name}: {value!r} is not a valid hotkey ({e})")
+        return value
+
+    model = env.get("SMARTTYPE_MODEL") or "claude-sonnet-4-5-20250929"
+    models = tuple(m.strip() for m in env.get("SMARTTYPE_MODELS", "").split(",") if m.strip()) or (model,)
+    settings = dict(
+        hotkey=hotkey("SMARTTYPE_HOTKEY", "ctrl+shift+j"),
+        lang_hotkey=hotkey("SMARTTYPE_LANG_HOTKEY", "ctrl+shift+g"),
+        marker_hotkey=hotkey("SMARTTYPE_MARKER_HOTKEY", "ctrl+shift+h"),
+        cancel_hotkey=hotkey("SMARTTYPE_CANCEL_HOTKEY", "ctrl+shift+q"),
+        models=models,
+        routing=(env.get("SMARTTYPE_ROUTING") or "single").strip().lower(),
+        streaming=_flag(env.get("SMARTTYPE_STREAMING", "0")),
+        context_tokens=number("SMARTTYPE_CONTEXT_TOKENS", "400", int, minimum=0),
+        deadline=number("SMARTTYPE_DEADLINE", "15"),
+        capture_timeout=number("SMARTTYPE_CAPTURE_TIMEOUT", "1.0"),
+    )
+    hotkeys = [settings[name] for name in ("hotkey", "lang_hotkey", "marker_hotkey", "cancel_hotkey")]
+    if len(set(hotkeys)) < len(hotkeys):
+        errors.append(f"The same hotkey is used twice: {', '.join(hotkeys)}")
+    if errors:
+        raise ConfigError("\n".join(errors))
+    return settings
+
+
+def read_prompts(files: dict) -> dict:
+    """Reads {language: prompt text} from {language: [candidate paths, first existing wins]}.
+
+    Raises ConfigError listing missing, unreadable and empty prompt files.
+    """
+    prompts = {}
+    errors = []
+    for lang, candidates in files.items():
+        path = next((path for path in candidates if path.exists()), None)
+        if path is None:
+            errors.append(f"Prompt file not found: prompt_{lang}.txt")
+            continue
+        try:
+            text = path.read_text(encoding="utf-8").strip()
+        except (OSError, UnicodeDecodeError) as e:
+            errors.append(f"Cannot read {path}: {e}")
+            continue
+        if not text:
+            errors.append(f"Prompt file is empty: {path}")
+            continue
+        prompts[lang] = text
+    if errors:
+        raise ConfigError("\n".join(errors))
+    return prompts
+
+
+def load_config(env_path: Path, prompt_files: dict, check_hotkey=None, validate=None) -> Config:
+    """Reads .env (under the process environment) and the prompts into a snapshot.
+
+    ``validate(config)`` may raise ValueError for settings that only make
+    sense together (e.g. the routing policy and models). Raises ConfigError.
+    """
+    env = dict(dotenv_values(env_path)) if env_path.exists() else {}
+    env.update(ENVIRONMENT)
+    errors = []
+    settings = prompts = None
+    try:
+        settings = parse_settings(env, check_hotkey)
+    except ConfigError as e:
+        errors.append(str(e))
+    try:
+        prompts = read_prompts(prompt_files)
+    except ConfigError as e:
+        errors.append(str(e))
+    if errors:
+        raise ConfigError("\n".join(errors))
+    config = Config(**settings, prompts=MappingProxyType(prompts))
+    if validate is not None:
+        try:
+            validate(config)
+        except ValueError as e:
+            raise ConfigError(str(e)) from e
+    return config
+
+
+def _signature(paths) -> tuple:
+    signature = []
+    for path in paths:
+        try:
+            stat = path.stat()
+        except OSError:
+            signature.append((str(path), None))
+            continue
+        signature.append((str(path), stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+class ConfigWatcher:
+    """Polls files every ``interval`` seconds and reloads when one changes.
+
+    ``load()`` returns a new snapshot or raises ConfigError; ``on_change``
+    gets each new snapshot. Errors are printed and the old snapshot kept.
+    """
+
+    def __init__(self, paths: list, load, on_change, interval: float = WATCH_INTERVAL):
+        self.paths = list(paths)
+        self.load = load
+        self.on_change = on_change
+        self.interval = interval
+        self._signature = _signature(self.paths)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Starts the polling thread (once)."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="smarttype-config", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def check(self) -> bool:
+        """Reloads if a file changed since the last check; returns whether a new snapshot was applied."""
+        signature = _signature(self.paths)
+        if signature == self._signature:
+            return False
+        self._signature = signature
+        try:
+            config = self.load()
+        except ConfigError as e:
+            print("[SmartType] Configuration not reloaded, keeping the previous one:")
+            for line in str(e).splitlines():
+                print(f"  {line}")
+            return False
+        self.on_change(config)
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                print(f"[SmartType] Configuration reload failed: {e}")
@@ -0,0 +1,120 @@
+"""
+SmartType - Connection Management
+===================================
+Owns the Anthropic clients and their HTTP connection pools. Opens the
+connection before the first completion needs it and keeps it open with
+cheap requests while SmartType is in use, so completions don't pay for
+DNS, TCP and TLS setup.
+"""
+
+import time
+import asyncio
+
+import anthropic
+
+# Idle connections stay in the pool this long (the SDK default is 5 s)
+KEEPALIVE_EXPIRY = 120.0
+MAX_CONNECTIONS = 10
+MAX_KEEPALIVE_CONNECTIONS = 4
+
+# Keep-alive requests stop when no hotkey was pressed for this long (seconds)
+ACTIVE_WINDOW = 3600.0
+
+
+class ConnectionManager:
+    """Anthropic clients with a tuned connection pool that is kept warm.
+
+    ``async_client`` answers completions on the ``engine`` loop, whose pool
+    is the one kept warm; ``client`` is the synchronous client for
+    everything else (e.g. the Message Batches API). ``keepalive_interval``
+    is the idle time (seconds) after which a cheap request refreshes the
+    connection; 0 turns idle warming off.
+    """
+
+    def __init__(self, api_key: str, engine, keepalive_interval: float = 45.0, **client_options):
+        # Limits of the httpx version the SDK was built with
+        limits = type(anthropic.DEFAULT_CONNECTION_LIMITS)(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        )
+        self.engine = engine
+        self.http_client = anthropic.DefaultHttpxClient(limits=limits)
+        self.client = anthropic.Anthropic(api_key=api_key, http_client=self.http_client, **client_options)
+        self.async_http_client = anthropic.DefaultAsyncHttpxClient(
+            limits=limits, event_hooks={"response": [self._on_response]},
+        )
+        self.async_client = anthropic.AsyncAnthropic(
+            api_key=api_key, http_client=self.async_http_client, **client_options,
+        )
+        self.keepalive_interval = keepalive_interval
+        self._last_response = None
+        self._last_activity = time.monotonic()
+        # Only touched on the engine loop
+        self._warming = False
+        self._keepalive = None
+
+    async def _on_response(self, response):
+        self._last_response = time.monotonic()
+
+    def state(self) -> str:
+        """"warm" if the pool should still hold an open connection, else "cold"."""
+        last = self._last_response
+        if last is None or time.monotonic() - last >= KEEPALIVE_EXPIRY:
+            return "cold"
+        return "warm"
+
+    async def warm(self, reason: str, quiet: bool = False):
+        """Opens (or refreshes) the connection with a request that costs no tokens.
+
+        Returns the request latency in seconds, or None if another warm-up
+        is running or the request failed.
+        """
+        if self._warming:
+            return None
+        self._warming = True
+        try:
+            state = self.state()
+            start = time.perf_counter()
+            try:
+                await self.async_client.models.list(limit=1)
+            except anthropic.APIError as e:
+                if not quiet:
+                    print(f"[SmartType] Connection warm-up failed: {e}")
+                return None
+            elapsed = time.perf_counter() - start
+            if not quiet:
+                print(f"[SmartType] Connection warmed ({reason}, was {state}) in {elapsed * 1000:.0f} ms")
+            return elapsed
+        finally:
+            self._warming = False
+
+    def on_activity(self):
+        """Called on a hotkey press: re-opens a connection that went cold meanwhile."""
+        self._last_activity = time.monotonic()
+        if self.state() == "cold":
+            self.engine.submit(self.warm("hotkey"))
+
+    def start(self):
+        """Warms the connection and starts the keep-alive requests on the engine loop."""
+        self._keepalive = self.engine.submit(self._run())
+
+    def stop(self):
+        """Stops keep-alive requests and closes the connection pools."""
+        if self._keepalive is not None:
+            self._keepalive.cancel()
+        self.engine.run(self.async_client.close())
+        self.http_client.close()
+
+    async def _run(self):
+        await self.warm("startup")
+        if self.keepalive_interval <= 0:
+            return
+        while True:
+            await asyncio.sleep(self.keepalive_interval / 3)
+            now = time.monotonic()
+            if now - self._last_activity > ACTIVE_WINDOW:
+                continue
+            last = self._last_response
+            if last is None or now - last >= self.keepalive_interval:
+                await self.warm("keep-alive", quiet=True)
@@ -0,0 +1,115 @@
+"""
+SmartType - Completion Context
+================================
+In full line mode the captured text can be a whole email thread. Only
+the paragraph at the cursor is completed; the finished text before it
+is sent as context, trimmed to a token budget, and left untouched.
+Sentences SmartType wrote itself are recognized by their fingerprints,
+so a message written piece by piece only sends its new sentences.
+"""
+
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+
+from smarttype.cache import normalize_text
+
+# Rough characters per token of Claude's tokenizer for German and English prose
+CHARS_PER_TOKEN = 4
+
+# Recently written sentences remembered by SentenceMemo
+MEMO_SIZE = 2000
+
+# Blank lines (possibly with spaces) between paragraphs; Windows
+# clipboards end lines with \r\n
+_PARAGRAPH_BREAK = re.compile(r"\r?\n(?:[ \t]*\r?\n)+")
+# Whitespace after the end of a sentence
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?:])\s+|\r?\n")
+# A sentence with its closing punctuation, quotes and trailing whitespace, or the unfinished rest
+_SENTENCE = re.compile(r".*?[.!?\u2026]+[\"'\u00ab\u00bb\u201c\u201d)\]]*(?:\s+|$)|.+", re.S)
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimates the token count of text (without calling the API)."""
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def split_segment(text: str):
+    """Splits the text before the cursor into (finished text, paragraph to complete).
+
+    The finished text ends with the blank line(s) before the paragraph, so
+    both parts concatenated give the original text.
+    """
+    breaks = list(_PARAGRAPH_BREAK.finditer(text.rstrip()))
+    if not breaks:
+        return "", text
+    start = breaks[-1].end()
+    return text[:start], text[start:]
+
+
+def trim_context(text: str, max_tokens: int) -> str:
+    """Returns the end of text that fits into max_tokens.
+
+    The context closest to the cursor is kept. A cut text starts at a
+    sentence if that keeps at least half of the budget, else at a word.
+    """
+    text = text.strip()
+    if max_tokens <= 0:
+        return ""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    tail = text[-max_tokens * CHARS_PER_TOKEN:]
+    sentence = _SENTENCE_BREAK.search(tail)
+    if sentence is not None and sentence.end() <= len(tail) // 2:
+        return tail[sentence.end():].strip()
+    word = re.search(r"\s+", tail)
+    return tail[word.end():].strip() if word is not None else tail
+
+
+def split_sentences(text: str) -> list:
+    """Splits text into sentences that keep their trailing whitespace (joined they give text)."""
+    return _SENTENCE.findall(text)
+
+
+def _fingerprint(sentence: str):
+    normalized = normalize_text(sentence)
+    if not normalized:
+        return None
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=8).digest()
+
+
+class SentenceMemo:
+    """Fingerprints of the sentences SmartType wrote recently (in memory, bounded)."""
+
+    def __init__(self, max_sentences: int = MEMO_SIZE):
+        self.max_sentences = max_sentences
+        self._fingerprints = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, text: str):
+        """Remembers the sentences of a completion that was pasted."""
+        with self._lock:
+            for sentence in split_sentences(text):
+                fingerprint = _fingerprint(sentence)
+                if fingerprint is None:
+                    continue
+                self._fingerprints[fingerprint] = None
+                self._fingerprints.move_to_end(fingerprint)
+            while len(self._fingerprints) > self.max_sentences:
+                self._fingerprints.popitem(last=False)
+
+    def split_known(self, text: str):
+        """Splits text into (leading sentences SmartType wrote, the rest).
+
+        The rest starts at the first sentence SmartType did not write, so
+        both parts concatenated give the original text.
+        """
+        known = 0
+        with self._lock:
+            for sentence in split_sentences(text):
+                fingerprint = _fingerprint(sentence)
+                if fingerprint is not None and fingerprint not in self._fingerprints:
+                    break
+                known += len(sentence)
+        return text[:known], text[known:]
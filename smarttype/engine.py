@@ -0,0 +1,138 @@
+"""
+SmartType - Async Engine
+==========================
+One asyncio event loop on a background thread runs everything that waits
+on the network or on time: API requests and streams, hedged requests,
+connection warm-ups and timers. Hotkey callbacks and the completion
+worker hand it coroutines and callbacks instead of starting threads, and
+stop work they no longer need by cancelling it.
+"""
+
+import queue
+import asyncio
+import threading
+import concurrent.futures
+
+# How often a thread waiting for the loop checks whether it should give up (seconds)
+POLL_INTERVAL = 0.05
+
+_END = object()
+
+
+class Timer:
+    """A callback scheduled on the engine loop; ``cancel()`` works from any thread.
+
+    With ``blocking`` the callback runs on the loop's thread pool instead of
+    the loop thread, so clipboard and file I/O cannot stall requests.
+    """
+
+    def __init__(self, loop, delay: float, callback, args: tuple, blocking: bool = False):
+        self.cancelled = False
+        self._loop = loop
+        self._blocking = blocking
+        loop.call_soon_threadsafe(loop.call_later, max(delay, 0.0), self._fire, callback, args)
+
+    def _fire(self, callback, args):
+        if self.cancelled:
+            return
+        if self._blocking:
+            self._loop.run_in_executor(None, callback, *args)
+        else:
+            callback(*args)
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class Engine:
+    """An asyncio event loop running on its own daemon thread (started on first use)."""
+
+    def __init__(self, name: str = "smarttype-engine"):
+        self.name = name
+        self.loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Starts the loop thread (once); returns the loop."""
+        with self._lock:
+            if self.loop is None:
+                loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=loop.run_forever, name=self.name, daemon=True)
+                self._thread.start()
+                self.loop = loop
+        return self.loop
+
+    def in_loop(self) -> bool:
+        """Whether the caller runs on the loop thread."""
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def submit(self, coro) -> concurrent.futures.Future:
+        """Schedules a coroutine; cancelling the returned future cancels it."""
+        return asyncio.run_coroutine_threadsafe(coro, self.start())
+
+    def call_later(self, delay: float, callback, *args) -> Timer:
+        """Calls ``callback(*args)`` on the loop thread after delay seconds."""
+        return Timer(self.start(), delay, callback, args)
+
+    def call_later_blocking(self, delay: float, callback, *args) -> Timer:
+        """Calls ``callback(*args)`` after delay seconds on the loop's thread pool,
+        for callbacks that block (clipboard, files)."""
+        return Timer(self.start(), delay, callback, args, blocking=True)
+
+    def run(self, coro, check=None):
+        """Runs a coroutine on the loop and waits for its result.
+
+        ``check`` is called every POLL_INTERVAL while waiting; if it raises,
+        the coroutine is cancelled and the exception propagates.
+        """
+        if self.in_loop():
+            coro.close()
+            raise RuntimeError("Engine.run() would block the engine loop; await instead")
+        future = self.submit(coro)
+        try:
+            while True:
+                try:
+                    return future.result(timeout=POLL_INTERVAL if check else None)
+                except concurrent.futures.TimeoutError:
+                    if future.done():
+                        raise
+                    check()
+        except BaseException:
+            future.cancel()
+            raise
+
+    def iterate(self, items, check=None):
+        """Consumes an async iterator on the loop, yielding its items in the calling thread.
+
+        Closing the generator, or ``check`` raising, cancels the consuming
+        task, which closes the iterator and any request behind it.
+        """
+        if self.in_loop():
+            raise RuntimeError("Engine.iterate() would block the engine loop; use async for")
+        received = queue.Queue()
+
+        async def pump():
+            try:
+                async for item in items:
+                    received.put(item)
+            finally:
+                received.put(_END)
+
+        future = self.submit(pump())
+        try:
+            while True:
+                try:
+                    item = received.get(timeout=POLL_INTERVAL if check else None)
+                except queue.Empty:
+                    check()
+                    continue
+                if check is not None:
+                    check()
+                if item is _END:
+                    # Raises the iterator's error, if any
+                    future.result()
+                    return
+                yield item
+        finally:
+            future.cancel()
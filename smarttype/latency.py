@@ -0,0 +1,172 @@
+"""
+SmartType - Latency Instrumentation
+=====================================
+Timing spans for each phase of a completion, written to a rotating
+JSONL log, and percentile reports over that log.
+"""
+
+import json
+import math
+import time
+import logging
+import contextvars
+import logging.handlers
+from contextlib import contextmanager
+from pathlib import Path
+
+# Order of the phases in reports
+PHASES = [
+    "queue", "clipboard_save", "capture", "parse", "api_ttfb", "api_total",
+    "reselect", "paste", "sound", "restore", "total",
+]
+
+# Per thread; engine tasks inherit the trace of the thread that scheduled them
+_current = contextvars.ContextVar("smarttype_trace", default=None)
+_logger = logging.getLogger("smarttype.latency")
+_logger.propagate = False
+
+
+class Trace:
+    """Durations (ms) of the phases of one completion plus its attributes."""
+
+    def __init__(self, **attrs):
+        self.attrs = attrs
+        self.spans = {}
+        self.start = time.perf_counter()
+
+    def add(self, name: str, seconds: float):
+        """Adds a duration to a phase (phases can occur more than once)."""
+        self.spans[name] = self.spans.get(name, 0.0) + seconds * 1000
+
+    def record(self) -> dict:
+        """Returns the trace as a log record."""
+        return {"ts": time.time(), **self.attrs,
+                "spans": {name: round(ms, 2) for name, ms in self.spans.items()}}
+
+
+def start_trace(**attrs) -> Trace:
+    """Starts a trace for the current thread."""
+    trace = Trace(**attrs)
+    _current.set(trace)
+    return trace
+
+
+def current_trace():
+    """Returns the trace of the current thread or task, or None."""
+    return _current.get()
+
+
+def end_trace():
+    """Finishes the current thread's trace and writes it to the log."""
+    trace = current_trace()
+    _current.set(None)
+    if trace is not None and _logger.handlers:
+        _logger.info(json.dumps(trace.record(), ensure_ascii=False))
+    return trace
+
+
+def log_span(name: str, seconds: float, **attrs):
+    """Writes a phase that ends after its completion's trace was written (the
+    delayed clipboard restore) as a record of its own, keyed by ``attrs``."""
+    if _logger.handlers:
+        record = {"ts": time.time(), **attrs, "spans": {name: round(seconds * 1000, 2)}}
+        _logger.info(json.dumps(record, ensure_ascii=False))
+
+
+@contextmanager
+def span(name: str):
+    """Times a block as a phase of the current trace (no-op without trace)."""
+    trace = current_trace()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if trace is not None:
+            trace.add(name, time.perf_counter() - start)
+
+
+def annotate(**attrs):
+    """Sets attributes on the current trace."""
+    trace = current_trace()
+    if trace is not None:
+        trace.attrs.update(attrs)
+
+
+def configure_log(path: Path, max_bytes: int = 1_000_000, backups: int = 3):
+    """Writes finished traces to a rotating JSONL file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    handler = logging.handlers.RotatingFileHandler(
+        path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8",
+    )
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    _logger.handlers[:] = [handler]
+    _logger.setLevel(logging.INFO)
+
+
+# ── Reports ──────────────────────────────────────────────────────
+
+def read_records(path: Path):
+    """Yields the records of the log and its rotated backups, oldest first."""
+    files = sorted(path.parent.glob(path.name + ".*"), key=lambda p: p.suffix, reverse=True)
+    for file in [*files, path]:
+        try:
+            lines = file.read_text(encoding="utf-8").splitlines()
+        except OSError:
+            continue
+        for line in lines:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def percentile(values: list, p: float) -> float:
+    """Returns the p-th percentile (nearest rank) of values."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(records) -> dict:
+    """Groups phase durations.
+
+    Returns {"phases": {phase: [ms]}, "groups": {(model, lang): [total ms]},
+    "connections": {"cold"/"warm": [api_total ms]}}.
+    """
+    phases = {}
+    groups = {}
+    connections = {}
+    for record in records:
+        spans = record.get("spans", {})
+        for name, ms in spans.items():
+            phases.setdefault(name, []).append(ms)
+        if "total" in spans:
+            key = (record.get("model", "?"), record.get("language", "?"))
+            groups.setdefault(key, []).append(spans["total"])
+        if "api_total" in spans and record.get("connection"):
+            connections.setdefault(record["connection"], []).append(spans["api_total"])
+    return {"phases": phases, "groups": groups, "connections": connections}
+
+
+def format_report(summary: dict) -> str:
+    """Formats p50/p90/p99 per phase and per model/language."""
+    def row(label, values):
+        return (f"  {label:<40} {len(values):>6} {percentile(values, 50):>8.1f}"
+                f" {percentile(values, 90):>8.1f} {percentile(values, 99):>8.1f}")
+
+    header = f"  {'':<40} {'n':>6} {'p50':>8} {'p90':>8} {'p99':>8}"
+    lines = ["  Latency per phase (ms)", header]
+    phases = summary["phases"]
+    for name in [*PHASES, *sorted(set(phases) - set(PHASES))]:
+        if name in phases:
+            lines.append(row(name, phases[name]))
+    lines += ["", "  Total latency per model / language (ms)", header]
+    for (model, lang), values in sorted(summary["groups"].items()):
+        lines.append(row(f"{model} / {lang}", values))
+    if summary.get("connections"):
+        lines += ["", "  API latency per connection state (ms)", header]
+        for state, values in sorted(summary["connections"].items()):
+            lines.append(row(state, values))
+    return "\n".join(lines)
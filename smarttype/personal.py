@@ -0,0 +1,189 @@
+"""
+SmartType - Personal Language Model
+=====================================
+Learns from accepted completions how this user abbreviates words
+("hte" -> "heute") and which words they put next to each other. Local
+expansion ranks its candidates with it and trusts an abbreviation the
+user always expanded the same way, so such inputs skip the API. Counts
+live in a prebuilt file plus an append-only log of new completions, and
+are halved when they outgrow their limits.
+"""
+
+import re
+import pickle
+from pathlib import Path
+
+from smarttype.abbrev import _is_subsequence, fold
+
+MODEL_VERSION = 1
+
+# An abbreviation expanded this often, and to the same word this share of the time, needs no API
+TRUST_COUNT = 3
+TRUST_SHARE = 0.9
+
+# Candidate score x (1 + expansion count + BIGRAM_WEIGHT x times it followed the previous word)
+BIGRAM_WEIGHT = 0.5
+
+# Words of the completion an abbreviation may skip (missing words Claude filled in)
+ALIGN_LOOKAHEAD = 3
+
+# Entries kept; beyond this all counts are halved and the ones reaching 0 dropped
+MAX_EXPANSIONS = 20000
+MAX_BIGRAMS = 100000
+
+_WORD_RE = re.compile(r"[^\W\d_]+")
+
+
+def align(abbreviated: str, completed: str):
+    """Yields (abbreviation, word) pairs, folded, of an input and its completion.
+
+    Each abbreviation is matched to the next word within ALIGN_LOOKAHEAD
+    that starts with the same letter and contains its letters in order.
+    """
+    words = [fold(word) for word in _WORD_RE.findall(completed)]
+    pos = 0
+    for token in _WORD_RE.findall(abbreviated):
+        token = fold(token)
+        for i in range(pos, min(pos + ALIGN_LOOKAHEAD, len(words))):
+            word = words[i]
+            if word[0] == token[0] and _is_subsequence(token, word):
+                yield token, word
+                pos = i + 1
+                break
+
+
+class PersonalModel:
+    """Abbreviation -> word counts and word bigram counts of one user and language."""
+
+    def __init__(self, language: str):
+        self.language = language
+        self.expansions = {}
+        self.bigrams = {}
+        self.expansion_count = 0
+        self.bigram_count = 0
+        self.history_offset = 0
+
+    # ── Learning ────────────────────────────────────────────────
+
+    def learn(self, abbreviated: str, completed: str):
+        """Counts the expansions and word pairs of an accepted completion."""
+        for token, word in align(abbreviated, completed):
+            self.expansion_count += _increment(self.expansions, token, word)
+        words = [fold(word) for word in _WORD_RE.findall(completed)]
+        for previous, word in zip(words, words[1:]):
+            self.bigram_count += _increment(self.bigrams, previous, word)
+        if self.expansion_count > MAX_EXPANSIONS or self.bigram_count > MAX_BIGRAMS:
+            self.prune()
+
+    def add_history(self, path: Path):
+        """Learns the completions appended to the log since the last call."""
+        try:
+            with open(path, "rb") as f:
+                f.seek(self.history_offset)
+                data = f.read()
+        except OSError:
+            return
+        # Only complete lines; a partly written one is read next time
+        data = data[:data.rfind(b"\n") + 1]
+        self.history_offset += len(data)
+        for line in data.decode("utf-8", errors="replace").splitlines():
+            abbreviated, _, completed = line.partition("\t")
+            if completed:
+                self.learn(abbreviated, completed)
+
+    def prune(self):
+        """Halves all counts until both tables fit their limits (old, rare entries go first)."""
+        while self.expansion_count > MAX_EXPANSIONS or self.bigram_count > MAX_BIGRAMS:
+            self.expansion_count = _halve(self.expansions)
+            self.bigram_count = _halve(self.bigrams)
+
+    # ── Lookup ───────────────────────────────────────────────
+
+    def trusted(self, token: str):
+        """Returns the (folded) word the user always expands token to, or None."""
+        counts = self.expansions.get(fold(token))
+        if not counts:
+            return None
+        word, count = max(counts.items(), key=lambda item: item[1])
+        if count < TRUST_COUNT or count < TRUST_SHARE * sum(counts.values()):
+            return None
+        return word
+
+    def rank(self, token: str, previous, ranked: list) -> list:
+        """Reorders [(word, score)] candidates of token by the user's own usage."""
+        counts = self.expansions.get(fold(token), {})
+        follows = self.bigrams.get(fold(previous), {}) if previous else {}
+        rescored = []
+        for word, score in ranked:
+            folded = fold(word)
+            boost = 1 + counts.get(folded, 0) + BIGRAM_WEIGHT * follows.get(folded, 0)
+            rescored.append((word, score * boost))
+        rescored.sort(key=lambda item: item[1], reverse=True)
+        return rescored
+
+    # ── Persistence ─────────────────────────────────────────────
+
+    def save(self, path: Path):
+        """Writes the counts to a compact prebuilt file."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump((MODEL_VERSION, self.__dict__), f, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path):
+        """Loads a prebuilt model, or returns None if it is missing or outdated."""
+        try:
+            with open(path, "rb") as f:
+                version, state = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+            return None
+        if version != MODEL_VERSION:
+            return None
+        model = cls(state["language"])
+        model.__dict__.update(state)
+        return model
+
+
+def _increment(table: dict, key: str, word: str) -> int:
+    """Counts word under key; returns 1 if that added an entry."""
+    counts = table.setdefault(key, {})
+    new = word not in counts
+    counts[word] = counts.get(word, 0) + 1
+    return int(new)
+
+
+def _halve(table: dict) -> int:
+    """Halves every count, drops the ones reaching 0; returns the entries left."""
+    entries = 0
+    for key in list(table):
+        counts = {word: count // 2 for word, count in table[key].items() if count > 1}
+        if counts:
+            table[key] = counts
+            entries += len(counts)
+        else:
+            del table[key]
+    return entries
+
+
+def load_personal_model(language: str, model_path: Path, history_path: Path) -> PersonalModel:
+    """Loads the user's model for a language and learns new log entries."""
+    model = PersonalModel.load(model_path)
+    if model is None:
+        model = PersonalModel(language)
+    offset = model.history_offset
+    model.add_history(history_path)
+    if model.history_offset != offset:
+        try:
+            model.save(model_path)
+        except OSError as e:
+            print(f"[SmartType] Could not save personal model: {e}")
+    return model
+
+
+def append_learned(history_path: Path, abbreviated: str, completed: str):
+    """Appends an accepted input and its completion to the learning log."""
+    history_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(history_path, "a", encoding="utf-8") as f:
+        f.write(" ".join(abbreviated.split()) + "\t" + " ".join(completed.split()) + "\n")
@@ -0,0 +1,185 @@
+"""
+SmartType - Record/Replay Client
+==================================
+Stands in for ``anthropic.Anthropic`` in tests (and, wrapped in
+``AsyncReplayClient``, for ``anthropic.AsyncAnthropic``). In record mode,
+requests go to the real client and request/response pairs are saved to a
+fixture file. In replay mode, the saved responses are served without
+network access.
+
+Entries marked ``"synthetic": true`` were written by hand rather than
+recorded; recording a request again replaces its entry with the real
+response.
+"""
+
+import json
+import asyncio
+import hashlib
+import threading
+from pathlib import Path
+
+from anthropic.types import Message
+
+
+def request_key(system, messages) -> str:
+    """Identifies a request by its system prompt and messages.
+
+    Model, token limits and cache_control markers are left out so that
+    fixtures survive changes to those settings.
+    """
+    if not isinstance(system, str):
+        system = "".join(block.get("text", "") for block in system or [])
+    payload = json.dumps({"system": system, "messages": list(messages)},
+                         sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:24]
+
+
+class FixtureMissing(LookupError):
+    """Raised in replay mode for a request that was never recorded."""
+
+
+class _ReplayStream:
+    """Minimal MessageStream replaying a recorded message word by word."""
+
+    def __init__(self, message: Message):
+        self._message = message
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def text_stream(self):
+        text = "".join(block.text for block in self._message.content if block.type == "text")
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            yield word if i == 0 else " " + word
+
+    def get_final_message(self) -> Message:
+        return self._message
+
+    def close(self):
+        pass
+
+
+class _ReplayMessages:
+    def __init__(self, owner: "ReplayClient"):
+        self._owner = owner
+
+    def create(self, **kwargs) -> Message:
+        owner = self._owner
+        key = request_key(kwargs.get("system", ""), kwargs["messages"])
+        if owner.mode == "replay":
+            return owner.lookup(key)
+        response = owner.client.messages.create(**kwargs)
+        owner.store(key, kwargs, response)
+        return response
+
+    def stream(self, **kwargs):
+        owner = self._owner
+        key = request_key(kwargs.get("system", ""), kwargs["messages"])
+        if owner.mode == "replay":
+            return _ReplayStream(owner.lookup(key))
+        # Record the complete message, then replay it like any other
+        with owner.client.messages.stream(**kwargs) as stream:
+            response = stream.get_final_message()
+        owner.store(key, kwargs, response)
+        return _ReplayStream(response)
+
+
+class ReplayClient:
+    """Anthropic client stand-in with "record" and "replay" modes.
+
+    ``client`` is the real client and is only needed for recording.
+    """
+
+    def __init__(self, fixtures: Path, mode: str = "replay", client=None):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown replay mode: {mode}")
+        if mode == "record" and client is None:
+            raise ValueError("Record mode needs a real client")
+        self.fixtures = Path(fixtures)
+        self.mode = mode
+        self.client = client
+        self.messages = _ReplayMessages(self)
+        self._lock = threading.Lock()
+        try:
+            self._entries = json.loads(self.fixtures.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            self._entries = {}
+
+    def lookup(self, key: str) -> Message:
+        """Returns the recorded response for a request key."""
+        entry = self._entries.get(key)
+        if entry is None:
+            raise FixtureMissing(
+                f"No recorded response for request {key} in {self.fixtures}"
+                " (record it with SMARTTYPE_TEST_MODE=record)"
+            )
+        return Message.model_validate(entry["response"])
+
+    def synthetic(self, key: str) -> bool:
+        """Whether the response for a request key was written by hand rather than recorded."""
+        return bool(self._entries.get(key, {}).get("synthetic"))
+
+    def store(self, key: str, request: dict, response: Message):
+        """Saves a request/response pair to the fixture file."""
+        messages = list(request["messages"])
+        with self._lock:
+            self._entries[key] = {
+                "request": {"model": request.get("model"), "user": messages[-1]["content"]},
+                "response": response.model_dump(mode="json", exclude_none=True),
+            }
+            self.fixtures.parent.mkdir(parents=True, exist_ok=True)
+            self.fixtures.write_text(
+                json.dumps(self._entries, indent=2, sort_keys=True, ensure_ascii=False) + "\n",
+                encoding="utf-8",
+            )
+
+
+class _AsyncReplayStream:
+    """Async MessageStream counterpart of _ReplayStream."""
+
+    def __init__(self, messages: _ReplayMessages, kwargs: dict):
+        self._messages = messages
+        self._kwargs = kwargs
+        self._stream = None
+
+    async def __aenter__(self):
+        # Recording waits for the real API
+        self._stream = await asyncio.to_thread(self._messages.stream, **self._kwargs)
+        return self
+
+    async def __aexit__(self, *exc):
+        self._stream.close()
+
+    @property
+    def text_stream(self):
+        async def chunks():
+            for text in self._stream.text_stream:
+                yield text
+        return chunks()
+
+    async def get_final_message(self) -> Message:
+        return self._stream.get_final_message()
+
+
+class _AsyncReplayMessages:
+    def __init__(self, messages: _ReplayMessages):
+        self._messages = messages
+
+    async def create(self, **kwargs) -> Message:
+        return await asyncio.to_thread(self._messages.create, **kwargs)
+
+    def stream(self, **kwargs):
+        return _AsyncReplayStream(self._messages, kwargs)
+
+
+class AsyncReplayClient:
+    """``anthropic.AsyncAnthropic`` stand-in sharing the fixtures of a ReplayClient."""
+
+    def __init__(self, replay: ReplayClient):
+        self.replay = replay
+        self.messages = _AsyncReplayMessages(replay.messages)
@@ -0,0 +1,154 @@
+"""
+SmartType - Model Routing
+===========================
+Decides which Claude model answers a completion: a single model, a
+cascade that sends simple inputs to a fast model and the rest to a
+larger one, or hedged requests that ask a second model when the first
+takes longer than it usually does.
+"""
+
+import time
+import asyncio
+import threading
+from collections import deque
+
+from smarttype.abbrev import VOWELS
+from smarttype.latency import percentile
+
+POLICIES = ("single", "cascade", "hedge")
+
+# Cascade: inputs with more words go to the large model
+CASCADE_MAX_WORDS = 8
+# Cascade: inputs where a larger share of words has no vowel left are
+# ambiguous and go to the large model
+CASCADE_MAX_BARE = 0.6
+
+# Hedge delay = p90 of the primary model's recent latencies, within bounds
+HEDGE_MIN_SAMPLES = 10
+HEDGE_DEFAULT_DELAY = 2.0
+HEDGE_MIN_DELAY = 0.3
+HEDGE_MAX_DELAY = 10.0
+# Recent requests per model kept for the statistics
+STATS_WINDOW = 200
+
+
+def is_simple(text: str) -> bool:
+    """Whether an input is short and unambiguous enough for the fast model."""
+    words = [w for w in text.split() if any(c.isalpha() for c in w)]
+    if not words or len(words) > CASCADE_MAX_WORDS:
+        return False
+    bare = sum(1 for w in words if not VOWELS & set(w.lower()))
+    return bare / len(words) <= CASCADE_MAX_BARE
+
+
+class ModelStats:
+    """Recent request latencies per model."""
+
+    def __init__(self, window: int = STATS_WINDOW):
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, model: str, seconds: float):
+        """Adds the latency of one request."""
+        with self._lock:
+            self._samples.setdefault(model, deque(maxlen=self.window)).append(seconds)
+
+    def seed(self, records):
+        """Adds the API latencies of latency log records (see smarttype.latency)."""
+        for record in records:
+            ms = record.get("spans", {}).get("api_total")
+            if ms is not None and record.get("model") and not record.get("hedged"):
+                self.record(record["model"], ms / 1000)
+
+    def p90(self, model: str):
+        """Returns the 90th percentile latency of a model, or None without enough data."""
+        with self._lock:
+            samples = list(self._samples.get(model, ()))
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return percentile(samples, 90)
+
+    def hedge_delay(self, model: str) -> float:
+        """How long to wait for a model before asking the backup model."""
+        p90 = self.p90(model)
+        if p90 is None:
+            return HEDGE_DEFAULT_DELAY
+        return min(max(p90, HEDGE_MIN_DELAY), HEDGE_MAX_DELAY)
+
+
+class Router:
+    """Routes completion requests to an ordered list of models.
+
+    ``single`` uses the first model. ``cascade`` sends simple inputs to the
+    first (fast) model and the others to the last (large) one. ``hedge``
+    asks the first model and, if it has not answered within its hedge
+    delay, the second one as well; the first answer wins.
+    """
+
+    def __init__(self, models: list, policy: str = "single", stats: ModelStats = None):
+        if not models:
+            raise ValueError("No model configured")
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown routing policy: {policy} (expected one of {', '.join(POLICIES)})")
+        if policy != "single" and len(models) < 2:
+            raise ValueError(f"Routing policy {policy} needs at least two models")
+        self.models = list(models)
+        self.policy = policy
+        self.stats = stats or ModelStats()
+
+    @property
+    def cache_id(self) -> str:
+        """Identifies the models that may answer, for completion cache keys."""
+        if self.policy == "single":
+            return self.models[0]
+        return f"{self.policy}:{','.join(self.models)}"
+
+    def route(self, text: str) -> list:
+        """Returns the models to ask for a text, in order."""
+        if self.policy == "cascade":
+            return [self.models[0] if is_simple(text) else self.models[-1]]
+        if self.policy == "hedge":
+            return self.models[:2]
+        return self.models[:1]
+
+    async def run(self, text: str, request):
+        """Answers a text with ``await request(model)``; returns (model, result, hedged).
+
+        A failed primary request is hedged right away, and the request that
+        loses the race is cancelled. If both fail, the first error is raised.
+        Cancelling the caller, also while waiting to hedge, cancels both.
+        """
+        models = self.route(text)
+        if len(models) == 1:
+            return models[0], await self._timed(models[0], request), False
+
+        primary, backup = models
+        tasks = {asyncio.ensure_future(self._timed(primary, request)): primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.stats.hedge_delay(primary))
+            hedged = not done or next(iter(done)).exception() is not None
+            if hedged:
+                tasks[asyncio.ensure_future(self._timed(backup, request))] = backup
+
+            errors = []
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # Primary first, so that its error is the one raised
+                for task in sorted(done, key=lambda t: models.index(tasks[t])):
+                    if task.exception() is None:
+                        return tasks[task], task.result(), hedged
+                    errors.append(task.exception())
+            raise errors[0]
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def _timed(self, model: str, request):
+        start = time.perf_counter()
+        result = await request(model)
+        # Only completed requests: a hedge loser cancelled early would pull the p90 down
+        self.stats.record(model, time.perf_counter() - start)
+        return result
@@ -0,0 +1,127 @@
+"""
+SmartType - Audio Feedback
+============================
+Feedback sounds are rendered to in-memory WAV files once at startup and
+played by a dedicated player thread, so nothing that plays a sound ever
+waits for it. Without ``winsound`` (Linux, tests, benchmarks) a silent
+player is used.
+"""
+
+import io
+import math
+import wave
+import array
+import queue
+import threading
+
+try:
+    import winsound
+except ImportError:
+    winsound = None
+
+SAMPLE_RATE = 22050
+VOLUME = 0.4
+# Fade in/out of each tone (seconds), avoids clicks
+FADE = 0.005
+
+# Feedback patterns: (frequency Hz, duration ms) tones, frequency 0 = pause
+PATTERNS = {
+    "startup": [(1000, 100), (0, 50), (1200, 100)],
+    "start": [(800, 150)],
+    "done": [(1200, 150), (0, 100), (1500, 150)],
+    "cancelled": [(700, 80), (500, 80)],
+    # Falling tones: distinct from the warning and error sounds
+    "deadline": [(440, 150), (330, 150), (220, 300)],
+    "lang_de": [(600, 150), (0, 50), (800, 150)],
+    "lang_en": [(800, 150), (0, 50), (1100, 150)],
+    "marker_on": [(900, 100), (0, 50), (1100, 100)],
+    "marker_off": [(1100, 100), (0, 50), (900, 100)],
+}
+
+# Sounds played with the Windows system sounds
+SYSTEM_SOUNDS = ("warning", "error")
+
+# Sounds waiting to be played; older ones are dropped when it is full
+MAX_PENDING = 4
+
+
+def render(tones: list, rate: int = SAMPLE_RATE) -> bytes:
+    """Renders a tone pattern to a 16-bit mono WAV file in memory."""
+    samples = array.array("h")
+    fade = int(FADE * rate)
+    for frequency, duration_ms in tones:
+        count = int(rate * duration_ms / 1000)
+        if frequency <= 0:
+            samples.extend([0] * count)
+            continue
+        step = 2 * math.pi * frequency / rate
+        for i in range(count):
+            envelope = min(1.0, i / fade, (count - i) / fade) if fade else 1.0
+            samples.append(int(32767 * VOLUME * envelope * math.sin(step * i)))
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(samples.tobytes())
+    return buffer.getvalue()
+
+
+class NullPlayer:
+    """Plays nothing (platforms without winsound)."""
+
+    def play(self, name: str):
+        """Plays a feedback sound by name."""
+        if name not in PATTERNS and name not in SYSTEM_SOUNDS:
+            raise KeyError(f"Unknown sound: {name}")
+
+
+class WinsoundPlayer(NullPlayer):
+    """Plays pre-rendered sounds on a dedicated thread.
+
+    ``winsound`` cannot play memory WAVs asynchronously (SND_MEMORY with
+    SND_ASYNC is rejected), so the player thread plays them synchronously
+    and callers only enqueue.
+    """
+
+    def __init__(self):
+        self._waves = {}
+        self._queue = queue.Queue(maxsize=MAX_PENDING)
+        self._thread = threading.Thread(target=self._run, name="smarttype-sound", daemon=True)
+        self._thread.start()
+
+    def play(self, name: str):
+        """Queues a feedback sound; returns immediately."""
+        super().play(name)
+        while True:
+            try:
+                self._queue.put_nowait(name)
+                return
+            except queue.Full:
+                # Stale feedback is worse than none: make room for the new sound
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def _run(self):
+        # Rendering takes a few dozen ms: done here so that startup doesn't wait
+        self._waves = {name: render(tones) for name, tones in PATTERNS.items()}
+        while True:
+            name = self._queue.get()
+            try:
+                if name == "warning":
+                    winsound.MessageBeep(winsound.MB_ICONEXCLAMATION)
+                elif name == "error":
+                    winsound.MessageBeep(winsound.MB_ICONHAND)
+                else:
+                    winsound.PlaySound(self._waves[name], winsound.SND_MEMORY)
+            except RuntimeError as e:
+                print(f"[SmartType] Cannot play sound {name}: {e}")
+
+
+def create_player():
+    """Returns the sound player for this platform."""
+    if winsound is None:
+        return NullPlayer()
+    return WinsoundPlayer()
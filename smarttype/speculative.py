@@ -0,0 +1,170 @@
+"""
+SmartType - Speculative Completion
+====================================
+Keeps a rolling buffer of recent keystrokes and, after a short typing
+pause, completes the buffer in the background so the result is ready
+when the hotkey is pressed.
+"""
+
+import time
+import threading
+from collections import deque
+
+import keyboard
+
+from smarttype.cache import normalize_text
+from smarttype.engine import POLL_INTERVAL
+
+# Longest buffer kept (characters)
+MAX_BUFFER = 500
+
+# Keys that move the cursor or leave the field: the buffer no longer
+# describes the text in front of the cursor
+_RESET_KEYS = {
+    "enter", "tab", "esc", "left", "right", "up", "down", "home", "end",
+    "page up", "page down", "delete",
+}
+
+
+class Speculation:
+    """One background completion of a buffer snapshot."""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.key = normalize_text(text)
+        self.result = None
+        self.cancelled = False
+        self.done = threading.Event()
+        # Task on the engine loop (cancelling it ends the request)
+        self.future = None
+
+
+class Speculator:
+    """Debounced background completion of the text being typed.
+
+    ``stream`` returns an async completion stream (e.g. ``app.astream_with_ai``),
+    run on ``engine`` so a stale speculation can be cancelled mid-request.
+    ``extract`` turns the keystroke buffer into the text that the hotkey
+    would complete, or None if there is nothing to speculate on.
+    """
+
+    def __init__(self, stream, extract, engine, pause: float = 0.8, max_per_minute: int = 6):
+        self._stream = stream
+        self._extract = extract
+        self._engine = engine
+        self.pause = pause
+        self.max_per_minute = max_per_minute
+        self._buffer = []
+        self._timer = None
+        self._current = None
+        self._started = deque()
+        self._paused = False
+        self._lock = threading.Lock()
+
+    # ── Keyboard hook ────────────────────────────────────────────
+
+    def on_key(self, event):
+        """keyboard.on_press callback: updates the buffer and re-arms the debounce timer."""
+        name = event.name or ""
+        if self._paused or keyboard.is_modifier(name):
+            return
+        if keyboard.is_pressed("ctrl") or keyboard.is_pressed("alt"):
+            # Shortcuts (including the SmartType hotkeys) are not typed text
+            return
+        with self._lock:
+            if len(name) == 1:
+                self._buffer.append(name)
+            elif name == "space":
+                self._buffer.append(" ")
+            elif name == "backspace":
+                if self._buffer:
+                    self._buffer.pop()
+            elif name in _RESET_KEYS:
+                self._buffer.clear()
+            else:
+                return
+            del self._buffer[:-MAX_BUFFER]
+            self._cancel_locked()
+            self._timer = self._engine.call_later(self.pause, self._fire)
+
+    # ── Hotkey side ──────────────────────────────────────────────
+
+    def suspend(self):
+        """Stops listening while SmartType itself sends keys (keeps in-flight work)."""
+        with self._lock:
+            self._paused = True
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    def take(self, text: str, timeout: float = 10.0, check=None):
+        """Returns the speculated completion if it was made for text.
+
+        A matching speculation that is still running is waited for instead
+        of starting a second request, at most ``timeout`` seconds (None: no
+        limit). ``check`` is called every POLL_INTERVAL while waiting; if it
+        raises, the exception propagates.
+        """
+        with self._lock:
+            spec = self._current
+        if spec is None or spec.cancelled or spec.key != normalize_text(text):
+            return None
+        if check is None:
+            spec.done.wait(timeout)
+            return spec.result
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not spec.done.is_set():
+            check()
+            wait = POLL_INTERVAL if deadline is None else min(POLL_INTERVAL, deadline - time.monotonic())
+            if wait <= 0:
+                break
+            spec.done.wait(wait)
+        return spec.result
+
+    def reset(self):
+        """Clears the buffer, cancels pending work and resumes listening."""
+        with self._lock:
+            self._buffer.clear()
+            self._cancel_locked()
+            self._current = None
+            self._paused = False
+
+    # ── Internals ────────────────────────────────────────────────
+
+    def _cancel_locked(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._current is not None and not self._current.done.is_set():
+            self._current.cancelled = True
+            self._current.future.cancel()
+
+    def _fire(self):
+        with self._lock:
+            self._timer = None
+            text = self._extract("".join(self._buffer))
+            if not text or not text.strip():
+                return
+            current = self._current
+            if current is not None and not current.cancelled and current.key == normalize_text(text):
+                return
+            now = time.monotonic()
+            while self._started and now - self._started[0] > 60:
+                self._started.popleft()
+            if len(self._started) >= self.max_per_minute:
+                return
+            self._started.append(now)
+            spec = Speculation(text)
+            spec.future = self._engine.submit(self._run(spec))
+            self._current = spec
+
+    async def _run(self, spec: Speculation):
+        chunks = []
+        try:
+            async for chunk in self._stream(spec.text):
+                chunks.append(chunk)
+            spec.result = "".join(chunks).strip()
+        except Exception as e:
+            print(f"[SmartType] Speculation failed: {e}")
+        finally:
+            spec.done.set()
@@ -0,0 +1,101 @@
+"""
+SmartType - Toast Notifications
+=================================
+One UI thread owns the Tk root and two prebuilt toast windows (top and
+bottom of the screen). Other threads hand messages over through a queue;
+a new toast replaces the one currently shown.
+"""
+
+import queue
+import threading
+
+BG = "#1e1e2e"
+FG = "#cdd6f4"
+FONT = ("Segoe UI", 18, "bold")
+# Distance of the toasts from the top and bottom screen edges (pixels)
+MARGIN = 80
+# How often the UI thread looks for new toasts (ms)
+POLL_MS = 10
+
+
+class Toasts:
+    """Thread-safe toast notifications shown by a single Tk thread."""
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._root = None
+        self._windows = []
+        self._hide_job = None
+
+    def show(self, message: str, duration_ms: int = 1500):
+        """Shows a toast, replacing the current one (callable from any thread)."""
+        self.start()
+        self._queue.put((message, duration_ms))
+
+    def start(self):
+        """Starts the UI thread (once)."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="smarttype-ui", daemon=True)
+                self._thread.start()
+
+    # ── UI thread ────────────────────────────────────────────────
+
+    def _run(self):
+        # Loading Tk takes a while (more so in the frozen build): not at startup
+        import tkinter as tk
+
+        try:
+            self._root = tk.Tk()
+        except tk.TclError as e:
+            print(f"[SmartType] Toasts unavailable: {e}")
+            return
+        self._root.withdraw()
+        for _ in ("top", "bottom"):
+            win = tk.Toplevel(self._root)
+            win.withdraw()
+            win.overrideredirect(True)
+            win.attributes("-topmost", True)
+            win.attributes("-alpha", 0.9)
+            win.configure(bg=BG)
+            label = tk.Label(win, font=FONT, fg=FG, bg=BG, padx=30, pady=15)
+            label.pack()
+            self._windows.append((win, label))
+        self._root.after(POLL_MS, self._poll)
+        self._root.mainloop()
+
+    def _poll(self):
+        latest = None
+        try:
+            while True:
+                latest = self._queue.get_nowait()
+        except queue.Empty:
+            pass
+        if latest is not None:
+            # Only the newest of several queued toasts is worth showing
+            self._display(*latest)
+        self._root.after(POLL_MS, self._poll)
+
+    def _display(self, message: str, duration_ms: int):
+        if self._hide_job is not None:
+            self._root.after_cancel(self._hide_job)
+        screen_w = self._root.winfo_screenwidth()
+        screen_h = self._root.winfo_screenheight()
+        for position, (win, label) in zip(("top", "bottom"), self._windows):
+            label.configure(text=message)
+            win.update_idletasks()
+            w = win.winfo_reqwidth()
+            h = win.winfo_reqheight()
+            x = (screen_w - w) // 2
+            y = MARGIN if position == "top" else screen_h - h - MARGIN
+            win.geometry(f"{w}x{h}+{x}+{y}")
+            win.deiconify()
+            win.lift()
+        self._hide_job = self._root.after(duration_ms, self._hide)
+
+    def _hide(self):
+        self._hide_job = None
+        for win, _ in self._windows:
+            win.withdraw()
@@ -0,0 +1,313 @@
+"""
+SmartType - Usage Accounting
+==============================
+Token usage of every Messages API request (input, output, cache read and
+cache write tokens) with model, language, prompt, latency and outcome,
+stored in SQLite by a background writer in batches. Reports aggregate
+it with estimated costs and flag configurations whose tokens per
+completion are drifting upward.
+"""
+
+import time
+import queue
+import sqlite3
+import threading
+from pathlib import Path
+
+# Rows written together, and the longest a row waits for its batch (seconds)
+BATCH_SIZE = 50
+FLUSH_INTERVAL = 2.0
+
+# USD per million input and output tokens, first matching model prefix wins
+# (list prices; cache writes cost 1.25x input, cache reads 0.1x input)
+PRICES = [
+    ("claude-opus-4-5", 5.0, 25.0),
+    ("claude-opus", 15.0, 75.0),
+    ("claude-3-opus", 15.0, 75.0),
+    ("claude-sonnet", 3.0, 15.0),
+    ("claude-3-7-sonnet", 3.0, 15.0),
+    ("claude-3-5-sonnet", 3.0, 15.0),
+    ("claude-haiku-4-5", 1.0, 5.0),
+    ("claude-3-5-haiku", 0.8, 4.0),
+    ("claude-3-haiku", 0.25, 1.25),
+]
+CACHE_WRITE_FACTOR = 1.25
+CACHE_READ_FACTOR = 0.1
+
+# Drift: tokens per completion of the last DRIFT_RECENT_DAYS against the
+# DRIFT_BASELINE_DAYS before, flagged when they grew by more than DRIFT_THRESHOLD
+DRIFT_RECENT_DAYS = 7
+DRIFT_BASELINE_DAYS = 28
+DRIFT_THRESHOLD = 0.2
+DRIFT_MIN_REQUESTS = 20
+
+# Columns usage can be grouped by
+GROUPS = {
+    "day": "date(ts, 'unixepoch', 'localtime')",
+    "model": "model",
+    "language": "language",
+    "prompt": "prompt",
+    "kind": "kind",
+}
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS requests ("
+    " ts REAL NOT NULL, model TEXT NOT NULL, language TEXT, prompt TEXT, kind TEXT,"
+    " input_tokens INTEGER NOT NULL, output_tokens INTEGER NOT NULL,"
+    " cache_read_tokens INTEGER NOT NULL, cache_write_tokens INTEGER NOT NULL,"
+    " latency_ms REAL, outcome TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS requests_ts ON requests(ts)",
+)
+_COLUMNS = ("ts", "model", "language", "prompt", "kind", "input_tokens", "output_tokens",
+            "cache_read_tokens", "cache_write_tokens", "latency_ms", "outcome")
+
+_CLOSE = object()
+
+
+def price(model: str):
+    """Returns (input, output) USD per million tokens of a model, or None if unknown."""
+    for prefix, input_price, output_price in PRICES:
+        if model.startswith(prefix):
+            return input_price, output_price
+    return None
+
+
+def cost(model: str, input_tokens: int, output_tokens: int, cache_read_tokens: int = 0,
+         cache_write_tokens: int = 0):
+    """Estimated USD cost of tokens of a model, or None if its price is unknown."""
+    prices = price(model)
+    if prices is None:
+        return None
+    input_price, output_price = prices
+    return (input_tokens * input_price
+            + cache_write_tokens * input_price * CACHE_WRITE_FACTOR
+            + cache_read_tokens * input_price * CACHE_READ_FACTOR
+            + output_tokens * output_price) / 1e6
+
+
+def _connect(path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    db = sqlite3.connect(str(path))
+    for statement in _SCHEMA:
+        db.execute(statement)
+    db.commit()
+    return db
+
+
+class UsageStore:
+    """Appends request usage to a SQLite file from a background thread.
+
+    ``record`` only queues the row, so the completion never waits for the
+    disk; the writer inserts up to ``batch_size`` rows per transaction and
+    at the latest ``flush_interval`` seconds after a row arrived.
+    """
+
+    def __init__(self, path: Path, batch_size: int = BATCH_SIZE, flush_interval: float = FLUSH_INTERVAL):
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def record(self, model: str, usage, language: str = None, prompt: str = None, kind: str = None,
+               latency: float = None, outcome: str = "ok"):
+        """Queues one request: ``usage`` is the response's usage (None if unknown), ``latency`` in seconds."""
+        self._start()
+        self._queue.put((
+            time.time(), model, language, prompt, kind,
+            getattr(usage, "input_tokens", None) or 0,
+            getattr(usage, "output_tokens", None) or 0,
+            getattr(usage, "cache_read_input_tokens", None) or 0,
+            getattr(usage, "cache_creation_input_tokens", None) or 0,
+            None if latency is None else round(latency * 1000, 2),
+            outcome,
+        ))
+
+    def close(self):
+        """Writes the queued rows and stops the writer."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_CLOSE)
+            thread.join()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="smarttype-usage", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        try:
+            db = _connect(self.path)
+        except sqlite3.Error as e:
+            print(f"[SmartType] Usage log disabled ({self.path}): {e}")
+            db = None
+        batch = []
+        flush_at = None
+        while True:
+            timeout = None if flush_at is None else max(flush_at - time.monotonic(), 0)
+            try:
+                row = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                row = None
+            if row is not None and row is not _CLOSE:
+                batch.append(row)
+                if flush_at is None:
+                    flush_at = time.monotonic() + self.flush_interval
+            if batch and (row is None or row is _CLOSE or len(batch) >= self.batch_size):
+                self._write(db, batch)
+                batch = []
+                flush_at = None
+            if row is _CLOSE:
+                break
+        if db is not None:
+            db.close()
+
+    def _write(self, db, rows: list):
+        if db is None:
+            return
+        try:
+            with db:
+                db.executemany(
+                    f"INSERT INTO requests ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+                    rows,
+                )
+        except sqlite3.Error as e:
+            print(f"[SmartType] Usage log write failed: {e}")
+
+
+# ── Reports ──────────────────────────────────────────────────────
+
+def _read(path: Path, query: str, params: tuple) -> list:
+    if not Path(path).exists():
+        return []
+    db = _connect(Path(path))
+    try:
+        return db.execute(query, params).fetchall()
+    finally:
+        db.close()
+
+
+def summarize_usage(path: Path, group_by=("day", "model", "language"), days: float = None) -> list:
+    """Totals per group (of GROUPS), oldest/first group first.
+
+    Returns dicts with the group columns, requests, errors, the four token
+    counts, tokens per completion, average latency (ms) and cost (USD or None).
+    """
+    columns = [GROUPS[name] for name in group_by]
+    since = 0 if days is None else time.time() - days * 86400
+    rows = _read(path, (
+        f"SELECT {', '.join(columns)}, COUNT(*), SUM(outcome != 'ok'),"
+        " SUM(input_tokens), SUM(output_tokens), SUM(cache_read_tokens), SUM(cache_write_tokens),"
+        " AVG(latency_ms)"
+        f" FROM requests WHERE ts >= ? GROUP BY {', '.join(columns)} ORDER BY {', '.join(columns)}"
+    ), (since,))
+    summary = []
+    for row in rows:
+        entry = dict(zip(group_by, row))
+        requests, errors, input_tokens, output_tokens, cache_read, cache_write, latency = row[len(group_by):]
+        entry.update(
+            requests=requests, errors=errors, input_tokens=input_tokens, output_tokens=output_tokens,
+            cache_read_tokens=cache_read, cache_write_tokens=cache_write, latency_ms=latency,
+            tokens_per_completion=(input_tokens + output_tokens + cache_read + cache_write) / requests,
+        )
+        if "model" in group_by:
+            entry["cost"] = cost(entry["model"], input_tokens, output_tokens, cache_read, cache_write)
+        else:
+            entry["cost"] = _group_cost(path, group_by, row[:len(group_by)], since)
+        summary.append(entry)
+    return summary
+
+
+def _group_cost(path: Path, group_by, values, since: float):
+    """Cost of a group that spans several models (summed per model)."""
+    where = " AND ".join(f"{GROUPS[name]} IS ?" for name in group_by)
+    total = 0.0
+    for model, *tokens in _read(path, (
+        "SELECT model, SUM(input_tokens), SUM(output_tokens), SUM(cache_read_tokens),"
+        f" SUM(cache_write_tokens) FROM requests WHERE ts >= ? AND {where} GROUP BY model"
+    ), (since, *values)):
+        model_cost = cost(model, *tokens)
+        if model_cost is None:
+            return None
+        total += model_cost
+    return total
+
+
+def find_drift(path: Path, now: float = None, threshold: float = DRIFT_THRESHOLD) -> list:
+    """Configurations (model, language, prompt) whose tokens per completion grew.
+
+    Compares the last DRIFT_RECENT_DAYS with the DRIFT_BASELINE_DAYS before
+    them, both with at least DRIFT_MIN_REQUESTS successful requests. Returns
+    dicts with model, language, prompt, baseline and recent average tokens
+    (total and output) and the relative change, largest first.
+    """
+    now = time.time() if now is None else now
+    split = now - DRIFT_RECENT_DAYS * 86400
+    start = split - DRIFT_BASELINE_DAYS * 86400
+    rows = _read(path, (
+        "SELECT model, language, prompt, ts >= ?, COUNT(*),"
+        " AVG(input_tokens + output_tokens + cache_read_tokens + cache_write_tokens), AVG(output_tokens)"
+        " FROM requests WHERE ts >= ? AND ts <= ? AND outcome = 'ok'"
+        " GROUP BY model, language, prompt, ts >= ?"
+    ), (split, start, now, split))
+    periods = {}
+    for model, language, prompt, recent, requests, tokens, output in rows:
+        periods.setdefault((model, language, prompt), {})[bool(recent)] = (requests, tokens, output)
+    drifting = []
+    for (model, language, prompt), period in periods.items():
+        if False not in period or True not in period:
+            continue
+        (old_requests, old_tokens, old_output), (new_requests, new_tokens, new_output) = period[False], period[True]
+        if min(old_requests, new_requests) < DRIFT_MIN_REQUESTS or not old_tokens:
+            continue
+        change = new_tokens / old_tokens - 1
+        if change > threshold:
+            drifting.append(dict(
+                model=model, language=language, prompt=prompt, change=change,
+                baseline_tokens=old_tokens, recent_tokens=new_tokens,
+                baseline_output=old_output, recent_output=new_output,
+            ))
+    drifting.sort(key=lambda entry: entry["change"], reverse=True)
+    return drifting
+
+
+def format_usage_report(summary: list, drifting: list, group_by=("day", "model", "language")) -> str:
+    """Formats usage totals per group and the drifting configurations."""
+    width = max([len(" / ".join(str(entry[name]) for name in group_by)) for entry in summary] + [20])
+    header = (f"  {'':<{width}} {'n':>6} {'err':>4} {'input':>9} {'output':>8} {'c.read':>9}"
+              f" {'c.write':>8} {'tok/req':>8} {'ms':>7} {'USD':>9}")
+    lines = [f"  Token usage per {' / '.join(group_by)}", header]
+    totals = [0, 0, 0, 0, 0, 0]
+    total_cost = 0.0
+    for entry in summary:
+        label = " / ".join(str(entry[name]) for name in group_by)
+        latency = "-" if entry["latency_ms"] is None else f"{entry['latency_ms']:.0f}"
+        usd = "?" if entry["cost"] is None else f"{entry['cost']:.4f}"
+        lines.append(
+            f"  {label:<{width}} {entry['requests']:>6} {entry['errors']:>4} {entry['input_tokens']:>9}"
+            f" {entry['output_tokens']:>8} {entry['cache_read_tokens']:>9} {entry['cache_write_tokens']:>8}"
+            f" {entry['tokens_per_completion']:>8.0f} {latency:>7} {usd:>9}"
+        )
+        for i, name in enumerate(("requests", "errors", "input_tokens", "output_tokens",
+                                  "cache_read_tokens", "cache_write_tokens")):
+            totals[i] += entry[name]
+        total_cost = None if total_cost is None or entry["cost"] is None else total_cost + entry["cost"]
+    lines.append(
+        f"  {'total':<{width}} {totals[0]:>6} {totals[1]:>4} {totals[2]:>9} {totals[3]:>8}"
+        f" {totals[4]:>9} {totals[5]:>8} {'':>8} {'':>7}"
+        f" {'?' if total_cost is None else f'{total_cost:.4f}':>9}"
+    )
+    if drifting:
+        lines += ["", f"  Tokens per completion drifting upward (last {DRIFT_RECENT_DAYS} days"
+                      f" vs. {DRIFT_BASELINE_DAYS} days before)"]
+        for entry in drifting:
+            lines.append(
+                f"  ! {entry['model']} / {entry['language']} / prompt {entry['prompt']}:"
+                f" {entry['baseline_tokens']:.0f} -> {entry['recent_tokens']:.0f} tokens"
+                f" (+{entry['change']:.0%}), output {entry['baseline_output']:.0f}"
+                f" -> {entry['recent_output']:.0f}"
+            )
+    return "\n".join(lines)
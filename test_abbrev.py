@@ -0,0 +1,120 @@
+"""
+SmartType Local Expansion Tests
+===============================
+Tests the offline abbreviation index against the bundled word lists.
+"""
+
+import sys
+import time
+import tempfile
+import unittest
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import test_smarttype
+from smarttype.abbrev import append_history, build_index, load_index, skeleton
+
+WORDLISTS = Path(__file__).parent / "smarttype" / "wordlists"
+
+
+class TestSkeleton(unittest.TestCase):
+    """Tests for consonant skeletons."""
+
+    def test_skeleton(self):
+        """Vowels after the first letter and doubled letters are dropped."""
+        self.assertEqual(skeleton("swimming"), "swmng")
+        self.assertEqual(skeleton("especially"), "espcly")
+        self.assertEqual(skeleton("Spaß"), "sps")
+
+
+class TestExpansion(unittest.TestCase):
+    """Tests for whole-input expansion."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.de = build_index("de", WORDLISTS / "words_de.txt")
+        cls.en = build_index("en", WORDLISTS / "words_en.txt")
+
+    def test_unambiguous_german(self):
+        """'ich mss mrgn zum arzt' resolves completely offline."""
+        self.assertEqual(self.de.expand("ich mss mrgn zum arzt"),
+                         "Ich muss morgen zum Arzt.")
+
+    def test_question_english(self):
+        """A question with its typed question mark is expanded offline."""
+        self.assertEqual(self.en.expand("can you tll me whr the librry is?"),
+                         "Can you tell me where the library is?")
+
+    def test_question_without_mark_falls_back(self):
+        """Without a typed '?' Claude decides on punctuation and word order."""
+        self.assertIsNone(self.en.expand("can you tll me whr the librry is"))
+        # "Want we actually go swimming." would be wrong: it is "Do we want to ...?"
+        self.assertIsNone(self.en.expand("wnt we actly go swmmng"))
+
+    def test_short_tokens_fall_back(self):
+        """One- and two-letter tokens are only accepted as typed words."""
+        self.assertIsNone(self.en.expand("i m hngry"))
+        self.assertIsNone(self.de.expand("ih mss mrgn zm arzt ghn"))
+        self.assertEqual(self.de.resolve("zu"), "zu")
+
+    def test_completion_cases(self):
+        """The inputs of test_smarttype expand to an answer its checks accept, or not at all."""
+        indexes = {"de": self.de, "en": self.en}
+        for name, (text, lang, _) in test_smarttype.CASES.items():
+            result = indexes[lang].expand(text)
+            if result is None:
+                continue
+            with self.subTest(text=text, result=result):
+                class_name, method = name.split(".")
+                check = getattr(getattr(test_smarttype, class_name), method).__wrapped__
+                check(self, result)
+
+    def test_ambiguous_falls_back(self):
+        """'hte' could be 'hatte' or 'heute', so Claude has to decide."""
+        self.assertIsNone(self.de.expand("Hst du hte Zt?"))
+
+    def test_words_are_kept(self):
+        """A typed word is never replaced by a more frequent one, only capitalized."""
+        self.assertEqual(self.de.resolve("kein"), "kein")
+        self.assertEqual(self.de.resolve("arzt"), "Arzt")
+        self.assertEqual(self.en.resolve("it"), "it")
+
+    def test_close_matches_fall_back(self):
+        """Without a clear winner over every word of the skeleton Claude decides."""
+        for index, text in ((self.de, "kein prblm"), (self.de, "ich kmme spter"),
+                            (self.en, "it is cld"), (self.de, "bitte sch"),
+                            (self.en, "how do I get to the sttion?")):
+            with self.subTest(text=text):
+                self.assertIsNone(index.expand(text))
+
+    def test_full_words_fall_back(self):
+        """Input without abbreviations needs missing words from Claude."""
+        self.assertIsNone(self.en.expand("I tomorrow doctor go"))
+
+    def test_lookup_is_fast(self):
+        """Token lookup stays well below a millisecond."""
+        start = time.perf_counter()
+        for _ in range(1000):
+            self.en.resolve("espcly")
+        self.assertLess((time.perf_counter() - start) / 1000, 0.001)
+
+
+class TestPersistence(unittest.TestCase):
+    """Tests for the prebuilt index file and history."""
+
+    def test_history_reaches_reloaded_index(self):
+        """Words from accepted completions are added on the next load."""
+        with tempfile.TemporaryDirectory() as tmp:
+            index_path = Path(tmp) / "abbrev_en.idx"
+            history = Path(tmp) / "history_en.txt"
+            load_index("en", WORDLISTS / "words_en.txt", index_path, history)
+            self.assertTrue(index_path.exists())
+            append_history(history, "Say hi to Gwendolyn.")
+            index = load_index("en", WORDLISTS / "words_en.txt", index_path, history)
+            self.assertEqual(index.resolve("gwndln"), "Gwendolyn")
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,148 @@
+"""
+SmartType Batch Tests
+=====================
+Tests batch expansion: ordering, journal/resume and the Message Batches path.
+"""
+
+import sys
+import time
+import random
+import tempfile
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from smarttype.batch import (
+    Journal, Stats, expand_concurrently, expand_with_batches, join_units, split_units,
+)
+
+
+def slow_upper(unit: str) -> str:
+    """Completion stand-in that finishes in random order."""
+    time.sleep(random.uniform(0, 0.01))
+    return unit.upper()
+
+
+class FakeBatches:
+    """messages.batches stand-in that finishes every batch on the first poll."""
+
+    def __init__(self):
+        self.created = []
+        self._requests = {}
+
+    def create(self, requests):
+        batch_id = f"batch-{len(self.created)}"
+        self.created.append(batch_id)
+        self._requests[batch_id] = list(requests)
+        return SimpleNamespace(id=batch_id)
+
+    def retrieve(self, batch_id):
+        counts = SimpleNamespace(succeeded=0, processing=0, errored=0)
+        return SimpleNamespace(processing_status="ended", request_counts=counts)
+
+    def results(self, batch_id):
+        for request in self._requests[batch_id]:
+            text = request["params"]["messages"][0]["content"].upper()
+            message = SimpleNamespace(content=[SimpleNamespace(text=text)])
+            yield SimpleNamespace(custom_id=request["custom_id"],
+                                  result=SimpleNamespace(type="succeeded", message=message))
+
+
+class TestUnits(unittest.TestCase):
+    """Tests for splitting and joining input."""
+
+    def test_paragraphs_round_trip(self):
+        """Paragraphs are split on blank lines and joined back."""
+        text = "ein absz\nzwei zln\n\n  \nnoch ein absz\n"
+        units = split_units(text, paragraphs=True)
+        self.assertEqual(units, ["ein absz\nzwei zln", "noch ein absz"])
+        self.assertEqual(join_units(units, paragraphs=True), "ein absz\nzwei zln\n\nnoch ein absz\n")
+
+
+class TestExpandConcurrently(unittest.TestCase):
+    """Tests for the thread pool path."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.journal_path = Path(self.tmp.name) / "out.journal"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_order_and_blank_lines(self):
+        """Results keep input order and blank lines are not sent."""
+        units = [f"zeile {i}" if i % 5 else "" for i in range(100)]
+        sent = []
+
+        def complete(unit):
+            sent.append(unit)
+            return slow_upper(unit)
+
+        results = list(expand_concurrently(units, complete, concurrency=8))
+        self.assertEqual(results, [u.upper() for u in units])
+        self.assertEqual(len(sent), 80)
+
+    def test_resume_skips_finished_units(self):
+        """Units in the journal are not completed again, changed ones are."""
+        units = ["a", "b", "c", "d"]
+        journal = Journal(self.journal_path)
+        list(expand_concurrently(units[:2], slow_upper, journal=journal))
+        journal.close()
+
+        units[1] = "b changed"
+        sent = []
+        journal = Journal(self.journal_path, resume=True)
+        stats = Stats()
+        results = list(expand_concurrently(units, lambda u: sent.append(u) or u.upper(),
+                                           journal=journal, stats=stats))
+        journal.close()
+        self.assertEqual(results, ["A", "B CHANGED", "C", "D"])
+        self.assertEqual(sorted(sent), ["b changed", "c", "d"])
+        self.assertEqual(stats.resumed, 1)
+
+    def test_failed_unit_is_kept(self):
+        """A unit whose completion fails is passed through unchanged."""
+        def complete(unit):
+            if unit == "kaputt":
+                raise ValueError("no completion")
+            return unit.upper()
+
+        stats = Stats()
+        results = list(expand_concurrently(["gut", "kaputt", "auch gut"], complete, stats=stats))
+        self.assertEqual(results, ["GUT", "kaputt", "AUCH GUT"])
+        self.assertEqual(stats.failed, 1)
+
+
+class TestMessageBatches(unittest.TestCase):
+    """Tests for the Message Batches API path."""
+
+    def test_submit_collect_and_resume(self):
+        """Results come back in order; a resumed run collects instead of resubmitting."""
+        units = ["eins", "", "zwei", "drei"]
+        client = SimpleNamespace(messages=SimpleNamespace(batches=FakeBatches()))
+
+        def params(unit):
+            return {"messages": [{"role": "user", "content": unit}]}
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "batch.journal"
+            journal = Journal(path)
+            results = expand_with_batches(units, client, params, journal, poll_interval=0)
+            journal.close()
+            self.assertEqual(results, ["EINS", "", "ZWEI", "DREI"])
+            self.assertEqual(client.messages.batches.created, ["batch-0"])
+
+            journal = Journal(path, resume=True)
+            stats = Stats()
+            results = expand_with_batches(units, client, params, journal, stats, poll_interval=0)
+            journal.close()
+            self.assertEqual(results, ["EINS", "", "ZWEI", "DREI"])
+            self.assertEqual(client.messages.batches.created, ["batch-0"])
+            self.assertEqual(stats.resumed, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+"""
+SmartType Output Budget Tests
+=============================
+Tests the learned max_tokens budget and the runaway output guard.
+"""
+
+import sys
+import unittest
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from smarttype import budget
+from smarttype.budget import OutputBudget, RunawayGuard, RunawayOutput
+
+
+class TestOutputBudget(unittest.TestCase):
+    """Tests for OutputBudget."""
+
+    def test_default_and_bounds(self):
+        """Without history the generous default ratio is used, within the bounds."""
+        output_budget = OutputBudget()
+        self.assertEqual(output_budget.max_tokens("de", "ih mss"), budget.MIN_OUTPUT_TOKENS)
+        self.assertEqual(output_budget.max_tokens("de", "x" * 100), 150)
+        self.assertEqual(output_budget.max_tokens("de", "x" * 10000), budget.MAX_OUTPUT_TOKENS)
+
+    def test_learned_per_language(self):
+        """Recorded completions set the ratio of their language only."""
+        output_budget = OutputBudget()
+        output_budget.seed([{"language": "de", "input_chars": 100, "output_tokens": 40}]
+                           * budget.BUDGET_MIN_SAMPLES)
+        self.assertAlmostEqual(output_budget.ratio("de"), 0.4)
+        self.assertEqual(output_budget.max_tokens("de", "x" * 200), 120)
+        self.assertEqual(output_budget.ratio("en"), budget.DEFAULT_RATIO)
+
+
+class TestRunawayGuard(unittest.TestCase):
+    """Tests for RunawayGuard."""
+
+    def test_normal_output(self):
+        """A plain completion passes, including a trailing newline."""
+        guard = RunawayGuard("ih mss mrgn zm arzt ghn")
+        self.assertIsNone(guard.check("Ich muss morgen zum Arzt gehen.\n"))
+        self.assertEqual(guard.accept("Ich muss morgen zum Arzt gehen.\n"), "Ich muss morgen zum Arzt gehen.")
+        self.assertIsNone(guard.reason)
+
+    def test_line_break_after_single_line(self):
+        """A single line input keeps only the output before a line break."""
+        guard = RunawayGuard("ih mss mrgn zm arzt ghn")
+        self.assertEqual(guard.check("Ich muss morgen zum Arzt gehen.\n- Ich muss"), "Ich muss morgen zum Arzt gehen.")
+        self.assertEqual(guard.reason, "a line break")
+
+    def test_paragraphs(self):
+        """Lines are fine for multi-line input, a second paragraph is not."""
+        guard = RunawayGuard("Hallo Anna,\nih mss mrgn zm arzt ghn")
+        self.assertIsNone(guard.check("Hallo Anna,\nich muss morgen zum Arzt gehen."))
+        self.assertEqual(guard.check("Hallo Anna,\nich muss.\n\nOder auch:"), "Hallo Anna,\nich muss.")
+        self.assertIsNone(RunawayGuard("eins\n\nzwei").check("Eins.\n\nZwei."))
+        self.assertEqual(RunawayGuard("eins\n\nzwei").check("Eins.\n\nZwei.\n\nOder:"), "Eins.\n\nZwei.")
+        self.assertEqual(guard.reason, "an extra paragraph")
+
+    def test_windows_line_breaks(self):
+        """\\r\\n breaks of the input are counted like \\n ones and kept."""
+        text = "Hallo Anna,\r\n\r\nwie gehts dir?\r\n\r\nih mss mrgn zm arzt ghn"
+        output = "Hallo Anna,\r\n\r\nwie geht es dir?\r\n\r\nIch muss morgen zum Arzt gehen."
+        self.assertEqual(RunawayGuard(text).accept(output), output)
+        self.assertEqual(RunawayGuard("ih mss mrgn").check("Ich muss morgen.\r\nOder:"), "Ich muss morgen.")
+
+    def test_too_long(self):
+        """Output far longer than the input has no usable part."""
+        guard = RunawayGuard("ds wttr")
+        self.assertIsNone(guard.check("Das Wetter"))
+        with self.assertRaises(RunawayOutput):
+            guard.check("Das Wetter ist ein Thema, über das man lange sprechen kann. " * 3)
+        # Leading whitespace is not a break
+        self.assertEqual(RunawayGuard("ds wttr").accept("\nDas Wetter\nist schön"), "Das Wetter")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+"""
+SmartType Cache Tests
+=====================
+Tests the two-tier completion cache (memory LRU + SQLite).
+"""
+
+import sys
+import time
+import tempfile
+import unittest
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from smarttype.cache import CompletionCache, make_key, normalize_text
+
+
+class TestCacheKey(unittest.TestCase):
+    """Tests for key normalization."""
+
+    def test_whitespace_and_unicode_normalized(self):
+        """Extra whitespace and decomposed umlauts map to the same key."""
+        a = make_key("ih  mss mrgn\tzm arzt ghn ", "de", "prompt", "model")
+        b = make_key("ih mss mrgn zm arzt ghn", "de", "prompt", "model")
+        self.assertEqual(a, b)
+        self.assertEqual(normalize_text("schön"), "schön")
+
+    def test_language_prompt_and_model_change_key(self):
+        """Language, prompt and model are part of the key."""
+        base = make_key("hst du zt", "de", "prompt", "model")
+        self.assertNotEqual(base, make_key("hst du zt", "en", "prompt", "model"))
+        self.assertNotEqual(base, make_key("hst du zt", "de", "prompt 2", "model"))
+        self.assertNotEqual(base, make_key("hst du zt", "de", "prompt", "model 2"))
+
+
+class TestCompletionCache(unittest.TestCase):
+    """Tests for the memory and disk tiers."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "cache.sqlite3"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_survives_restart(self):
+        """Entries are read back from disk by a fresh cache."""
+        cache = CompletionCache(self.path)
+        cache.put("k", "Ich muss morgen zum Arzt gehen.")
+        cache.close()
+        cache = CompletionCache(self.path)
+        self.assertEqual(cache.get("k"), "Ich muss morgen zum Arzt gehen.")
+        self.assertIsNone(cache.get("missing"))
+        cache.close()
+
+    def test_discard(self):
+        """A discarded entry is gone from both tiers."""
+        cache = CompletionCache(self.path)
+        cache.put("k", "Ich muss morgen zum Arzt gehen.")
+        cache.discard("k")
+        self.assertIsNone(cache.get("k"))
+        cache.close()
+        cache = CompletionCache(self.path)
+        self.assertIsNone(cache.get("k"))
+        cache.close()
+
+    def test_memory_lru_bound(self):
+        """The memory tier keeps only the most recently used entries."""
+        cache = CompletionCache(self.path, max_memory=2)
+        for key in ("a", "b", "c"):
+            cache.put(key, key.upper())
+        self.assertEqual(list(cache._memory), ["b", "c"])
+        self.assertEqual(cache.get("a"), "A")
+        cache.close()
+
+    def test_size_eviction(self):
+        """The disk tier is trimmed to max_entries by last use."""
+        cache = CompletionCache(self.path, max_memory=1, max_entries=2)
+        for key in ("a", "b", "c"):
+            cache.put(key, key.upper())
+            time.sleep(0.01)
+        cache.evict()
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("c"), "C")
+        cache.close()
+
+    def test_age_eviction(self):
+        """Entries older than max_age_days are not returned."""
+        cache = CompletionCache(self.path, max_memory=1, max_age_days=0)
+        cache.put("a", "A")
+        cache.put("b", "B")
+        time.sleep(0.01)
+        self.assertIsNone(cache.get("a"))
+        cache.close()
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
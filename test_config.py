@@ -0,0 +1,112 @@
+"""
+SmartType Configuration Tests
+=============================
+Tests reading .env and the prompt files into a snapshot, reporting bad
+values, and the watcher keeping the previous snapshot after a bad edit.
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from smarttype import config
+from smarttype.config import ConfigError, ConfigWatcher, load_config, parse_settings
+
+
+class TestSettings(unittest.TestCase):
+    """Tests for parse_settings."""
+
+    def test_defaults(self):
+        """Without variables the defaults are used and SMARTTYPE_MODEL is the only model."""
+        settings = parse_settings({"SMARTTYPE_MODEL": "m1"})
+        self.assertEqual(settings["hotkey"], "ctrl+shift+j")
+        self.assertEqual(settings["models"], ("m1",))
+        self.assertEqual((settings["streaming"], settings["context_tokens"]), (False, 400))
+
+    def test_errors_are_collected(self):
+        """Every bad value is reported at once."""
+        def check_hotkey(hotkey):
+            if "bogus" in hotkey:
+                raise ValueError("unknown key")
+
+        env = {"SMARTTYPE_CONTEXT_TOKENS": "many", "SMARTTYPE_DEADLINE": "soon",
+               "SMARTTYPE_HOTKEY": "ctrl+bogus", "SMARTTYPE_CANCEL_HOTKEY": "ctrl+shift+g"}
+        with self.assertRaises(ConfigError) as raised:
+            parse_settings(env, check_hotkey)
+        errors = str(raised.exception).splitlines()
+        self.assertEqual(len(errors), 4)
+        self.assertTrue(errors[0].startswith("SMARTTYPE_HOTKEY"))
+        self.assertIn("used twice", errors[-1])
+
+
+class TestConfigFiles(unittest.TestCase):
+    """Tests for load_config and ConfigWatcher."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+        self.env = self.dir / ".env"
+        self.prompts = {lang: [self.dir / f"prompt_{lang}.txt"] for lang in ("de", "en")}
+        for lang, (path,) in self.prompts.items():
+            path.write_text(f"Prompt {lang}\n", encoding="utf-8")
+        self.write_env("SMARTTYPE_STREAMING=1\n")
+        # The test runner's own environment must not override the files
+        patcher = mock.patch.object(config, "ENVIRONMENT", {})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_env(self, text):
+        self.env.write_text(text, encoding="utf-8")
+        # Make the change visible to coarse modification times
+        stat = self.env.stat()
+        os.utime(self.env, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    def load(self):
+        return load_config(self.env, self.prompts)
+
+    def test_load(self):
+        """Settings come from .env, the process environment wins, prompts are read-only."""
+        snapshot = self.load()
+        self.assertTrue(snapshot.streaming)
+        self.assertEqual(snapshot.prompts["de"], "Prompt de")
+        with self.assertRaises(TypeError):
+            snapshot.prompts["de"] = "changed"
+        with mock.patch.object(config, "ENVIRONMENT", {"SMARTTYPE_STREAMING": "0"}):
+            self.assertFalse(self.load().streaming)
+
+    def test_missing_prompt(self):
+        """A missing or empty prompt file is an error, not an empty prompt."""
+        self.prompts["en"][0].write_text("  \n", encoding="utf-8")
+        self.prompts["de"][0].unlink()
+        with self.assertRaises(ConfigError) as raised:
+            self.load()
+        self.assertEqual(len(str(raised.exception).splitlines()), 2)
+
+    def test_watcher_keeps_previous_on_bad_edit(self):
+        """A bad edit is reported and skipped; the next good edit is applied."""
+        applied = [self.load()]
+        watcher = ConfigWatcher([self.env, *self.prompts["de"]], self.load, applied.append)
+        self.assertFalse(watcher.check())
+
+        self.write_env("SMARTTYPE_DEADLINE=soon\n")
+        with mock.patch("builtins.print") as printed:
+            self.assertFalse(watcher.check())
+        self.assertIn("SMARTTYPE_DEADLINE", str(printed.call_args_list))
+        self.assertEqual(len(applied), 1)
+
+        self.write_env("SMARTTYPE_DEADLINE=5\n")
+        self.assertTrue(watcher.check())
+        self.assertEqual((applied[-1].deadline, applied[-1].streaming), (5.0, False))
+
+
+if __name__ == "__main__":
+    unittest.main()
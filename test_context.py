@@ -0,0 +1,96 @@
+"""
+SmartType Context Tests
+=======================
+Tests splitting the captured text into context and the paragraph to
+complete, trimming the context to its token budget, and recognizing
+sentences SmartType wrote before.
+"""
+
+import sys
+import unittest
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from smarttype.context import SentenceMemo, split_sentences, estimate_tokens, split_segment, trim_context
+
+
+class TestSplitSegment(unittest.TestCase):
+    """Tests for split_segment."""
+
+    def test_single_paragraph(self):
+        """Text without blank lines is completed as a whole."""
+        self.assertEqual(split_segment("ds wttr\nist hte shr schn"), ("", "ds wttr\nist hte shr schn"))
+
+    def test_last_paragraph(self):
+        """Only the paragraph after the last blank line is completed."""
+        text = "Hallo Anna,\n\nErster Absatz.\n \nih mss mrgn zm arzt ghn"
+        finished, segment = split_segment(text)
+        self.assertEqual(segment, "ih mss mrgn zm arzt ghn")
+        self.assertEqual(finished + segment, text)
+
+    def test_trailing_blank_lines(self):
+        """Blank lines right before the cursor don't make the segment empty."""
+        finished, segment = split_segment("Erster Absatz.\n\nih mss mrgn\n\n")
+        self.assertEqual((finished, segment), ("Erster Absatz.\n\n", "ih mss mrgn\n\n"))
+
+    def test_windows_line_breaks(self):
+        """Blank lines copied from Windows (\\r\\n) separate paragraphs too."""
+        finished, segment = split_segment("Hallo Anna,\r\n\r\nErster Absatz.\r\n \r\nih mss mrgn")
+        self.assertEqual((finished, segment), ("Hallo Anna,\r\n\r\nErster Absatz.\r\n \r\n", "ih mss mrgn"))
+
+
+class TestTrimContext(unittest.TestCase):
+    """Tests for trim_context."""
+
+    def test_short_context_is_kept(self):
+        """Context within the budget is only stripped."""
+        self.assertEqual(trim_context("  Hallo Anna,\n\n", 100), "Hallo Anna,")
+        self.assertEqual(trim_context("Hallo Anna,", 0), "")
+
+    def test_long_context_keeps_the_end(self):
+        """Long context is cut at a sentence near its start and fits the budget."""
+        text = " ".join(f"Das ist Satz Nummer {i}." for i in range(200))
+        trimmed = trim_context(text, 50)
+        self.assertLessEqual(estimate_tokens(trimmed), 50)
+        self.assertTrue(trimmed.startswith("Das ist Satz"))
+        self.assertTrue(trimmed.endswith("Nummer 199."))
+
+    def test_cut_at_word_without_sentences(self):
+        """Without a sentence end nearby, the cut is at a word boundary."""
+        text = "wort " * 100
+        self.assertTrue(trim_context(text, 10).startswith("wort"))
+
+
+class TestSentenceMemo(unittest.TestCase):
+    """Tests for split_sentences and SentenceMemo."""
+
+    def test_split_sentences(self):
+        """Sentences keep their punctuation, quotes and whitespace; the rest is unfinished."""
+        text = 'Er sagte: "Komm mit!" Ich muss gehen.  ih mss mrgn'
+        sentences = split_sentences(text)
+        self.assertEqual(sentences, ['Er sagte: "Komm mit!" ', "Ich muss gehen.  ", "ih mss mrgn"])
+        self.assertEqual("".join(sentences), text)
+
+    def test_split_known(self):
+        """Leading sentences SmartType wrote are split off; edited ones are not."""
+        memo = SentenceMemo()
+        memo.add("Das Wetter ist heute sehr schön. Hast du Zeit?")
+        text = "Das Wetter ist  heute sehr schön.\nHast du Zeit? ih mss mrgn. Hast du Zeit?"
+        known, rest = memo.split_known(text)
+        self.assertEqual(rest, "ih mss mrgn. Hast du Zeit?")
+        self.assertEqual(known + rest, text)
+        self.assertEqual(memo.split_known("Das Wetter ist heute schön."), ("", "Das Wetter ist heute schön."))
+
+    def test_oldest_sentences_are_forgotten(self):
+        """The memo keeps only its most recent sentences."""
+        memo = SentenceMemo(max_sentences=2)
+        memo.add("Eins. Zwei.")
+        memo.add("Eins. Drei.")
+        self.assertEqual(memo.split_known("Eins. ")[1], "")
+        self.assertEqual(memo.split_known("Zwei. ")[1], "Zwei. ")
+
+
+if __name__ == "__main__":
+    unittest.main()
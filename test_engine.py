@@ -0,0 +1,134 @@
+"""
+SmartType Engine Tests
+======================
+Tests the async engine: running coroutines and streams from other
+threads, cancellation, timers and latency traces across the loop.
+"""
+
+import sys
+import time
+import asyncio
+import threading
+import unittest
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from smarttype.engine import Engine
+from smarttype.latency import end_trace, span, start_trace
+
+
+class Abort(Exception):
+    pass
+
+
+class TestEngine(unittest.TestCase):
+    """Tests for Engine."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.engine = Engine("test-engine")
+
+    def test_run_and_cancel(self):
+        """run() returns the result; a failing check cancels the coroutine."""
+        async def answer():
+            await asyncio.sleep(0)
+            return 42
+
+        self.assertEqual(self.engine.run(answer()), 42)
+
+        cancelled = threading.Event()
+
+        async def stalled():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        deadline = time.monotonic() + 0.1
+
+        def check():
+            if time.monotonic() > deadline:
+                raise Abort()
+
+        start = time.monotonic()
+        with self.assertRaises(Abort):
+            self.engine.run(stalled(), check)
+        self.assertLess(time.monotonic() - start, 1.0)
+        self.assertTrue(cancelled.wait(1.0), "coroutine was not cancelled")
+
+    def test_iterate_closes_stream(self):
+        """Items arrive in order; leaving the loop early closes the async iterator."""
+        closed = threading.Event()
+
+        async def numbers():
+            try:
+                for i in range(20):
+                    await asyncio.sleep(0.001)
+                    yield i
+            finally:
+                closed.set()
+
+        self.assertEqual(list(self.engine.iterate(numbers()))[:3], [0, 1, 2])
+        closed.clear()
+        for i in self.engine.iterate(numbers()):
+            if i == 2:
+                break
+        self.assertTrue(closed.wait(1.0), "stream was not closed")
+
+    def test_iterate_raises_errors(self):
+        """An error of the stream is raised in the consuming thread."""
+        async def failing():
+            yield "partial"
+            raise ValueError("stream broke")
+
+        received = []
+        with self.assertRaisesRegex(ValueError, "stream broke"):
+            for item in self.engine.iterate(failing()):
+                received.append(item)
+        self.assertEqual(received, ["partial"])
+
+    def test_timers(self):
+        """Timers fire on the loop thread unless cancelled first."""
+        fired = []
+        done = threading.Event()
+        cancelled = self.engine.call_later(0.02, fired.append, "cancelled")
+        self.engine.call_later(0.05, lambda: (fired.append(self.engine.in_loop()), done.set()))
+        cancelled.cancel()
+        self.assertTrue(done.wait(1.0))
+        self.assertEqual(fired, [True])
+
+    def test_blocking_timers_leave_loop_free(self):
+        """Blocking timer callbacks run on the thread pool while the loop keeps firing timers."""
+        fired = []
+        done = threading.Event()
+
+        def blocking():
+            fired.append(self.engine.in_loop())
+            time.sleep(0.3)
+
+        start = time.monotonic()
+        self.engine.call_later_blocking(0.01, blocking)
+        self.engine.call_later(0.05, lambda: (fired.append(time.monotonic() - start), done.set()))
+        self.assertTrue(done.wait(1.0))
+        self.assertIs(fired[0], False)
+        self.assertLess(fired[1], 0.25)
+
+    def test_trace_follows_coroutines(self):
+        """Spans recorded on the loop land in the trace of the thread that waits."""
+        async def traced():
+            with span("api_total"):
+                await asyncio.sleep(0.01)
+
+        trace = start_trace()
+        try:
+            self.engine.run(traced())
+        finally:
+            end_trace()
+        self.assertGreaterEqual(trace.spans["api_total"], 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
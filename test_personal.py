@@ -0,0 +1,89 @@
+"""
+SmartType Personal Model Tests
+==============================
+Tests learning abbreviations and word pairs from accepted completions,
+their use in local expansion, pruning and the model files.
+"""
+
+import sys
+import time
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from smarttype import personal
+from smarttype.abbrev import build_index
+from smarttype.personal import PersonalModel, align, append_learned, load_personal_model
+
+WORDLISTS = Path(__file__).parent / "smarttype" / "wordlists"
+
+
+class TestLearning(unittest.TestCase):
+    """Tests for aligning and counting accepted completions."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.de = build_index("de", WORDLISTS / "words_de.txt")
+
+    def test_align(self):
+        """Abbreviations match their words; words Claude added are skipped."""
+        self.assertEqual(list(align("ih mss mrgn arzt", "Ich muss morgen zum Arzt.")),
+                         [("ih", "ich"), ("mss", "muss"), ("mrgn", "morgen"), ("arzt", "arzt")])
+
+    def test_trusted_expansion_skips_api(self):
+        """'hte' is ambiguous until the user expanded it to 'heute' often enough."""
+        model = PersonalModel("de")
+        for _ in range(personal.TRUST_COUNT):
+            self.assertIsNone(self.de.expand("Hst du hte Zt?", model))
+            model.learn("Hst du hte Zt?", "Hast du heute Zeit?")
+        self.assertEqual(self.de.expand("Hst du hte Zt?", model), "Hast du heute Zeit?")
+        # Lookups stay well below a millisecond
+        start = time.perf_counter()
+        for _ in range(1000):
+            self.de.resolve("hte", "du", model)
+        self.assertLess((time.perf_counter() - start) / 1000, 0.001)
+
+    def test_rank_by_previous_word(self):
+        """Candidates are reordered by the words the user writes after the previous one."""
+        model = PersonalModel("de")
+        ranked = [("hatte", 0.010), ("heute", 0.006)]
+        model.learn("", "Bis heute")
+        model.learn("", "bis heute Abend")
+        self.assertEqual(model.rank("hte", "bis", ranked)[0][0], "heute")
+        self.assertEqual(model.rank("hte", "ich", ranked)[0][0], "hatte")
+
+    def test_prune(self):
+        """Rare entries are dropped once a table is full; frequent ones survive halved."""
+        model = PersonalModel("de")
+        with mock.patch.object(personal, "MAX_BIGRAMS", 50):
+            for _ in range(4):
+                model.learn("", "ich muss")
+            for i in range(60):
+                model.learn("", f"wort{chr(97 + i % 26)} anders{chr(97 + i // 26)}")
+        self.assertLessEqual(model.bigram_count, 50)
+        self.assertEqual(model.bigrams["ich"], {"muss": 2})
+
+
+class TestModelFiles(unittest.TestCase):
+    """Tests for the prebuilt model file and learning log."""
+
+    def test_log_reaches_reloaded_model(self):
+        """Logged completions are learned on the next load, and only once."""
+        with tempfile.TemporaryDirectory() as tmp:
+            model_path = Path(tmp) / "personal_de.model"
+            log = Path(tmp) / "learned_de.tsv"
+            append_learned(log, "Hst du hte\nZt?", "Hast du heute Zeit?")
+            load_personal_model("de", model_path, log)
+            self.assertTrue(model_path.exists())
+            append_learned(log, "bs hte", "Bis heute")
+            model = load_personal_model("de", model_path, log)
+            self.assertEqual(model.expansions["hte"], {"heute": 2})
+            self.assertEqual(load_personal_model("de", model_path, log).expansions["hte"], {"heute": 2})
+
+
+if __name__ == "__main__":
+    unittest.main()
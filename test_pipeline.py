@@ -0,0 +1,479 @@
+"""
+SmartType Pipeline Tests
+========================
+Runs process_textfield end to end against a simulated text field:
+capture, marker parsing, replacement, clipboard restore and sounds.
+Completions are replayed from fixtures/completions.json.
+"""
+
+import sys
+import asyncio
+import concurrent.futures
+import time
+import tempfile
+import unittest
+import threading
+from pathlib import Path
+from types import MappingProxyType
+from unittest import mock
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from anthropic import APIError
+from anthropic.types import Message
+
+import smarttype.app as app
+import smarttype.cli as cli
+import smarttype.latency as latency
+from smarttype.abbrev import AbbreviationIndex
+from smarttype.backend import SimulatedTextField
+from smarttype.cache import CompletionCache
+from smarttype.context import SentenceMemo
+from smarttype.latency import configure_log, read_records
+from smarttype.personal import PersonalModel
+from smarttype.replay import AsyncReplayClient, ReplayClient
+from smarttype.speculative import Speculation, Speculator
+from smarttype.usage import UsageStore, summarize_usage
+
+FIXTURES = Path(__file__).parent / "fixtures" / "completions.json"
+
+# Module settings changed by the tests
+SETTINGS = ("backend", "async_client", "completion_cache", "speculator", "marker_mode",
+            "current_language", "STREAMING", "LOCAL_EXPANSION", "CAPTURE_TIMEOUT", "CONTEXT_TOKENS",
+            "sentence_memo", "local_indexes", "personal_models", "DATA_DIR", "UNDO_WINDOW",
+            "usage_store", "DEADLINE", "current_prompt", "startup_error", "connections")
+
+
+class _RecordingMessages:
+    def __init__(self, requests: list, reply, delay: float):
+        self._requests = requests
+        self._reply = reply
+        self._delay = delay
+
+    async def create(self, **kwargs) -> Message:
+        self._requests.append(kwargs)
+        await asyncio.sleep(self._delay)
+        text = self._reply(kwargs["messages"][-1]["content"].rsplit(": ", 1)[-1])
+        return Message.model_validate({
+            "id": "msg_test", "type": "message", "role": "assistant", "model": kwargs["model"],
+            "content": [{"type": "text", "text": text}], "stop_reason": "end_turn",
+            "usage": {"input_tokens": 1, "output_tokens": 1},
+        })
+
+
+class RecordingClient:
+    """Async client stand-in that answers with reply(input) after delay seconds and keeps the requests."""
+
+    def __init__(self, reply=str.upper, delay: float = 0.0):
+        self.requests = []
+        self.messages = _RecordingMessages(self.requests, reply, delay)
+
+
+class _FailingStream:
+    """MessageStream stand-in that breaks off with an API error after its chunks."""
+
+    def __init__(self, chunks: list):
+        self._chunks = chunks
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+    @property
+    def text_stream(self):
+        async def chunks():
+            for text in self._chunks:
+                yield text
+            raise APIError("Overloaded", None, body=None)
+        return chunks()
+
+
+class TestPipeline(unittest.TestCase):
+    """Tests for process_textfield with a simulated text field."""
+
+    def setUp(self):
+        self.saved = {name: getattr(app, name) for name in SETTINGS}
+        app.PROMPTS.update(app.load_prompts())
+        app.async_client = AsyncReplayClient(ReplayClient(FIXTURES))
+        app.completion_cache = None
+        app.speculator = None
+        app.current_language = "de"
+        app.marker_mode = False
+        app.STREAMING = False
+        app.LOCAL_EXPANSION = False
+        app.sentence_memo = SentenceMemo()
+        app.usage_store = None
+        app.current_prompt = app.PROMPTS["de"]
+        self.field = SimulatedTextField()
+        self.field.copy("clipboard before")
+        app.backend = self.field
+
+    def tearDown(self):
+        for name, value in self.saved.items():
+            setattr(app, name, value)
+
+    def run_pipeline(self, text: str, cursor: int = None) -> str:
+        self.field.type(text, cursor)
+        app.process_textfield()
+        return self.field.text
+
+    def test_full_line(self):
+        """The whole text before the cursor is replaced by its completion."""
+        self.assertEqual(self.run_pipeline("ds wttr ist hte shr schn"), "Das Wetter ist heute sehr schön.")
+        self.assertEqual(self.field.paste(), "clipboard before")
+        self.assertEqual(self.field.played, ["start", "done"])
+
+    def test_restore_is_timed(self):
+        """The delayed clipboard restore is logged as the restore phase of its completion."""
+        with tempfile.TemporaryDirectory() as tmp:
+            log = Path(tmp) / "latency.jsonl"
+            configure_log(log)
+            self.addCleanup(latency._logger.handlers.clear)
+            self.run_pipeline("ds wttr ist hte shr schn")
+            latency._logger.handlers[0].close()
+            records = list(read_records(log))
+        # The simulated field restores at once; the real one after the trace is written
+        restore, = [record for record in records if "restore" in record["spans"]]
+        completion, = [record for record in records if "total" in record["spans"]]
+        self.assertEqual(restore["job"], completion["job"])
+
+    def test_marker_keeps_prefix(self):
+        """In marker mode only the text after ... is completed."""
+        app.marker_mode = True
+        self.assertEqual(self.run_pipeline("Hallo Anna, ...Hst du hte Zt?"), "Hallo Anna, Hast du heute Zeit?")
+
+    def test_text_after_cursor_is_kept(self):
+        """Only the text before the cursor is captured and replaced."""
+        text = "Hst du hte Zt? Bis später"
+        self.assertEqual(self.run_pipeline(text, cursor=len("Hst du hte Zt?")), "Hast du heute Zeit? Bis später")
+
+    def test_streaming(self):
+        """Streaming mode ends with the same text as a single paste."""
+        app.STREAMING = True
+        self.assertEqual(self.run_pipeline("Knnst du mr den wg zum bhnhf erkrn"),
+                         "Kannst du mir den Weg zum Bahnhof erklären?")
+        self.assertEqual(self.field.paste(), "clipboard before")
+
+    def test_streaming_error(self):
+        """An API error after part of the stream was pasted puts the field and clipboard back."""
+        app.STREAMING = True
+        client = RecordingClient()
+        client.messages.stream = lambda **kwargs: _FailingStream(["Das Wetter ", "ist heute"])
+        app.async_client = client
+        self.assertEqual(self.run_pipeline("ds wttr ist hte shr schn"), "ds wttr ist hte shr schn")
+        self.assertEqual(self.field.paste(), "clipboard before")
+        self.assertEqual(self.field.played, ["start", "error"])
+
+    def test_finished_paragraphs_are_context(self):
+        """In full line mode only the paragraph at the cursor is rewritten; earlier ones are context."""
+        client = RecordingClient()
+        app.async_client = client
+        finished = "Hallo Anna,\n\nwie besprochen schicke ich dir die Unterlagen.\n\n"
+        text = finished + "ds wttr ist hte shr schn"
+        self.assertEqual(self.run_pipeline(text), finished + "DS WTTR IST HTE SHR SCHN")
+        user = client.requests[0]["messages"][0]["content"]
+        self.assertTrue(user.startswith("Previous context: Hallo Anna,\n\nwie besprochen"))
+        self.assertTrue(user.endswith(": ds wttr ist hte shr schn"))
+
+        app.CONTEXT_TOKENS = 0
+        self.run_pipeline(text)
+        self.assertNotIn("Previous context", client.requests[1]["messages"][0]["content"])
+
+    def test_windows_line_breaks(self):
+        """A field copied with \\r\\n line breaks is split into paragraphs like one with \\n."""
+        client = RecordingClient()
+        app.async_client = client
+        finished = "Hallo Anna,\r\n\r\nwie besprochen schicke ich dir die Unterlagen.\r\n\r\n"
+        text = finished + "ds wttr ist hte shr schn"
+        self.assertEqual(self.run_pipeline(text), finished + "DS WTTR IST HTE SHR SCHN")
+        user = client.requests[0]["messages"][0]["content"]
+        self.assertTrue(user.startswith("Previous context: Hallo Anna,\r\n\r\nwie besprochen"))
+        self.assertTrue(user.endswith(": ds wttr ist hte shr schn"))
+
+    def test_windows_line_breaks_are_not_cut(self):
+        """Paragraph breaks the input already had are no reason to cut the completion."""
+        # Claude answers with \n line breaks
+        app.async_client = RecordingClient(lambda text: text.upper().replace("\r\n", "\n"))
+        text = "Hallo Anna,\r\n\r\nwie gehts dir?\r\n\r\nih mss mrgn zm arzt ghn"
+        self.assertEqual(self.run_pipeline(text),
+                         "Hallo Anna,\r\n\r\nwie gehts dir?\r\n\r\nIH MSS MRGN ZM ARZT GHN")
+        # In marker mode the whole field is completed
+        app.marker_mode = True
+        self.assertEqual(self.run_pipeline("..." + text), "HALLO ANNA,\n\nWIE GEHTS DIR?\n\nIH MSS MRGN ZM ARZT GHN")
+
+    def test_completed_sentences_are_context(self):
+        """Sentences SmartType already wrote are not sent again, only the new text."""
+        first = self.run_pipeline("ds wttr ist hte shr schn")
+        client = RecordingClient()
+        app.async_client = client
+        self.assertEqual(self.run_pipeline(first + " ih mss mrgn zm arzt ghn"), first + " IH MSS MRGN ZM ARZT GHN")
+        user = client.requests[0]["messages"][0]["content"]
+        self.assertTrue(user.startswith("Previous context: Das Wetter ist heute sehr schön."))
+        self.assertTrue(user.endswith(": ih mss mrgn zm arzt ghn"))
+
+        # Everything before the cursor was written by SmartType
+        self.field.played.clear()
+        self.assertEqual(self.run_pipeline(first), first)
+        self.assertEqual(len(client.requests), 1)
+        self.assertEqual(self.field.paste(), "clipboard before")
+        self.assertEqual(self.field.played, ["warning"])
+
+    def test_undone_completion_is_not_learned(self):
+        """A completion undone right after its paste is not learned; one that stays is."""
+        model = PersonalModel("de")
+        app.local_indexes = {"de": AbbreviationIndex("de")}
+        app.personal_models = {"de": model}
+        app.UNDO_WINDOW = 0.05
+        self.field.realtime = True
+        with tempfile.TemporaryDirectory() as tmp:
+            app.DATA_DIR = Path(tmp)
+            self.run_pipeline("ds wttr ist hte shr schn")
+            app.on_undo()
+            time.sleep(0.2)
+            self.assertEqual(model.expansions, {})
+
+            self.run_pipeline("ds wttr ist hte shr schn")
+            time.sleep(0.2)
+            self.assertEqual(model.expansions["hte"], {"heute": 1})
+            self.assertTrue((Path(tmp) / "learned_de.tsv").exists())
+
+    def test_undone_completion_is_not_cached(self):
+        """A completion undone right after its paste is asked for again on the next press."""
+        client = RecordingClient()
+        app.async_client = client
+        with tempfile.TemporaryDirectory() as tmp:
+            app.completion_cache = CompletionCache(Path(tmp) / "cache.sqlite3")
+            self.run_pipeline("ds wttr")
+            self.run_pipeline("ds wttr")
+            self.assertEqual(len(client.requests), 1)
+            app.on_undo()
+            self.assertEqual(self.run_pipeline("ds wttr"), "DS WTTR")
+            self.assertEqual(len(client.requests), 2)
+            app.completion_cache.close()
+
+    def test_usage_is_recorded(self):
+        """Requests and streams are recorded in the usage store."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "usage.sqlite3"
+            app.usage_store = UsageStore(path)
+            self.run_pipeline("ds wttr ist hte shr schn")
+            app.STREAMING = True
+            self.run_pipeline("Knnst du mr den wg zum bhnhf erkrn")
+            app.usage_store.close()
+            rows = summarize_usage(path, ("kind", "language"))
+        self.assertEqual([(row["kind"], row["language"], row["requests"], row["errors"]) for row in rows],
+                         [("create", "de", 1, 0), ("stream", "de", 1, 0)])
+        self.assertTrue(all(row["output_tokens"] > 0 for row in rows))
+
+    def test_waits_for_client(self):
+        """A hotkey pressed while the client is still being created waits for it."""
+        client, app.async_client = app.async_client, None
+        timer = threading.Timer(0.1, setattr, (app, "async_client", client))
+        timer.start()
+        self.assertEqual(self.run_pipeline("ds wttr ist hte shr schn"), "Das Wetter ist heute sehr schön.")
+        timer.join()
+
+    def test_failed_startup_fails_fast(self):
+        """If creating the client failed, a waiting completion fails instead of waiting forever."""
+        app.async_client = None
+        app.DEADLINE = 0
+        with mock.patch("smarttype.connection.ConnectionManager", side_effect=RuntimeError("no network")), \
+                mock.patch.object(app, "show_toast") as toast:
+            cli.warm_up()
+        self.assertIn("no network", toast.call_args.args[0])
+        start = time.monotonic()
+        self.assertEqual(self.run_pipeline("ds wttr ist hte shr schn"), "ds wttr ist hte shr schn")
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(self.field.paste(), "clipboard before")
+        self.assertEqual(self.field.played, ["error"])
+
+    def test_job_keeps_prompt_of_press(self):
+        """A job completes with the prompt that was active when its hotkey was pressed."""
+        job = app.CompletionJob("de", False)
+        pressed = app.PROMPTS["de"]
+        self.addCleanup(app.PROMPTS.__setitem__, "de", pressed)
+        app.PROMPTS["de"] = "Neuer Prompt"
+        client = RecordingClient()
+        app.async_client = client
+        self.field.type("ds wttr")
+        app.process_textfield(job)
+        self.assertEqual(client.requests[0]["system"][0]["text"], pressed)
+
+    def test_reloaded_config(self):
+        """A new configuration snapshot is used by the next completion, not by one already queued."""
+        old = app.read_config()
+        self.addCleanup(app.apply_config, old)
+        queued = app.CompletionJob("de", False)
+        prompts = MappingProxyType({**old.prompts, "de": "Neuer Prompt"})
+        app.apply_config(old._replace(prompts=prompts, context_tokens=0))
+        client = RecordingClient()
+        app.async_client = client
+        self.run_pipeline("ds wttr")
+        self.assertEqual(client.requests[0]["system"][0]["text"], "Neuer Prompt")
+        self.assertEqual(app.CONTEXT_TOKENS, 0)
+        self.field.type("hst du zt")
+        app.process_textfield(queued)
+        self.assertEqual(client.requests[1]["system"][0]["text"], old.prompts["de"])
+
+    def test_runaway_output(self):
+        """Output after an unexpected line break is dropped; far too long output is discarded."""
+        client = RecordingClient(lambda text: "Das Wetter ist heute sehr schön.\n\nAlternativ: Heute ist es schön.")
+        app.async_client = client
+        self.assertEqual(self.run_pipeline("ds wttr ist hte shr schn"), "Das Wetter ist heute sehr schön.")
+        self.assertEqual(client.requests[0]["max_tokens"], 64)
+
+        app.async_client = RecordingClient(lambda text: "Gerne erkläre ich dir, was das bedeutet. " * 5)
+        self.field.played.clear()
+        self.assertEqual(self.run_pipeline("ds wttr"), "ds wttr")
+        self.assertEqual(self.field.paste(), "clipboard before")
+        self.assertEqual(self.field.played, ["start", "warning"])
+
+    def test_cancel(self):
+        """The cancel hotkey aborts a running completion and restores the field and clipboard."""
+        app.async_client = RecordingClient(delay=5)
+        self.field.realtime = True
+        self.field.type("ds wttr ist hte shr schn")
+        self.assertTrue(app.submit(app.CompletionJob("de", False)))
+        deadline = time.monotonic() + 5
+        while not self.field.played and time.monotonic() < deadline:
+            time.sleep(0.005)
+        app.cancel_completion()
+        app._jobs.join()
+        self.assertEqual(self.field.text, "ds wttr ist hte shr schn")
+        self.assertEqual(self.field.paste(), "clipboard before")
+        self.assertEqual(self.field.played, ["start", "cancelled"])
+
+    def test_deadline(self):
+        """A completion without result within DEADLINE is aborted and the field restored."""
+        app.DEADLINE = 0.2
+        app.async_client = RecordingClient(delay=5)
+        self.field.realtime = True
+        start = time.monotonic()
+        self.assertEqual(self.run_pipeline("ds wttr ist hte shr schn"), "ds wttr ist hte shr schn")
+        self.assertLess(time.monotonic() - start, 2)
+        self.assertEqual(self.field.paste(), "clipboard before")
+        self.assertEqual(self.field.played, ["start", "deadline"])
+
+    def test_no_deadline_waits_for_speculation(self):
+        """With DEADLINE 0 (no limit) a matching speculation still running is waited for."""
+        app.DEADLINE = 0
+        spec = Speculation("ds wttr")
+        spec.future = concurrent.futures.Future()
+        app.speculator = Speculator(app.astream_with_ai, app.speculable_text, app.engine)
+        app.speculator._current = spec
+
+        def finish():
+            spec.result = "Das Wetter."
+            spec.done.set()
+
+        threading.Timer(0.05, finish).start()
+        self.assertEqual(self.run_pipeline("ds wttr"), "Das Wetter.")
+        self.assertEqual(self.field.paste(), "clipboard before")
+        self.assertEqual(self.field.played, ["done"])
+
+    def test_cancel_while_waiting_for_speculation(self):
+        """The cancel hotkey also ends the wait for a speculation still running."""
+        app.DEADLINE = 0
+        app.speculator = Speculator(app.astream_with_ai, app.speculable_text, app.engine)
+        spec = app.speculator._current = Speculation("ds wttr")
+        # Never finishes; the worker cancels it when it resets the speculator
+        spec.future = concurrent.futures.Future()
+        self.field.realtime = True
+        self.field.type("ds wttr")
+        job = app.CompletionJob("de", False)
+        self.assertTrue(app.submit(job))
+        deadline = time.monotonic() + 5
+        while app._current_job is not job and time.monotonic() < deadline:
+            time.sleep(0.005)
+        time.sleep(0.1)
+        app.cancel_completion()
+        app._jobs.join()
+        self.assertEqual(self.field.text, "ds wttr")
+        self.assertEqual(self.field.paste(), "clipboard before")
+        self.assertEqual(self.field.played, ["cancelled"])
+        self.assertTrue(spec.future.cancelled())
+
+    def test_missing_marker(self):
+        """Without ... the field and clipboard stay unchanged and a warning sounds."""
+        app.marker_mode = True
+        self.assertEqual(self.run_pipeline("ds wttr ist hte shr schn"), "ds wttr ist hte shr schn")
+        self.assertIsNone(self.field.anchor)
+        self.assertEqual(self.field.paste(), "clipboard before")
+        self.assertEqual(self.field.played, ["warning"])
+
+    def test_slow_app_times_out(self):
+        """An app that doesn't answer Ctrl+C in time leaves the field unchanged."""
+        app.CAPTURE_TIMEOUT = 0.05
+        self.field.delays["copy"] = 0.2
+        self.field.realtime = True
+        self.assertEqual(self.run_pipeline("ds wttr ist hte shr schn"), "ds wttr ist hte shr schn")
+        self.assertEqual(self.field.played, ["warning"])
+
+
+
+class TestCompletionQueue(unittest.TestCase):
+    """Tests for submit and the completion worker, with process_textfield held until released."""
+
+    def setUp(self):
+        self.saved = {name: getattr(app, name) for name in ("backend", "current_language", "marker_mode")}
+        self.field = SimulatedTextField()
+        app.backend = self.field
+        app.PROMPTS.update(app.load_prompts())
+        self.release = threading.Event()
+        self.processed = []
+        self.running = 0
+        self.overlapped = False
+
+        def process(job):
+            self.running += 1
+            self.overlapped |= self.running > 1
+            self.processed.append(job)
+            self.release.wait(5)
+            self.running -= 1
+
+        patcher = mock.patch.object(app, "process_textfield", process)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.release.set()
+        app._jobs.join()
+        for name, value in self.saved.items():
+            setattr(app, name, value)
+
+    def submit_running(self) -> app.CompletionJob:
+        """Submits a job and waits until the worker is busy with it."""
+        job = app.CompletionJob("de", False)
+        self.assertTrue(app.submit(job))
+        deadline = time.monotonic() + 5
+        while job not in self.processed and time.monotonic() < deadline:
+            time.sleep(0.005)
+        return job
+
+    def test_repeated_press_is_coalesced(self):
+        """A press identical to a waiting one is dropped; jobs run one at a time in order."""
+        running = self.submit_running()
+        queued = app.CompletionJob("de", False)
+        self.assertTrue(app.submit(queued))
+        self.assertFalse(app.submit(app.CompletionJob("de", False)))
+        english = app.CompletionJob("en", False)
+        self.assertTrue(app.submit(english))
+        self.release.set()
+        app._jobs.join()
+        self.assertEqual(self.processed, [running, queued, english])
+        self.assertFalse(self.overlapped)
+
+    def test_full_queue_rejects_press(self):
+        """Presses beyond QUEUE_SIZE are rejected with a warning sound."""
+        self.submit_running()
+        keys = [("de", True), ("en", False), ("en", True), ("de", False)]
+        accepted = [app.submit(app.CompletionJob(*key)) for key in keys[:app.QUEUE_SIZE + 1]]
+        self.assertEqual(accepted, [True] * app.QUEUE_SIZE + [False])
+        self.assertEqual(self.field.played, ["warning"])
+
+
+if __name__ == "__main__":
+    unittest.main()
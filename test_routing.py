@@ -0,0 +1,145 @@
+"""
+SmartType Routing Tests
+=======================
+Tests model selection, hedged requests and the hedge delay statistics.
+"""
+
+import sys
+import time
+import asyncio
+import unittest
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from smarttype import routing
+from smarttype.routing import ModelStats, Router, is_simple
+
+
+def fake_request(latencies: dict, calls: list, failing=()):
+    """A request coroutine function answering after a per-model latency."""
+    async def request(model):
+        calls.append(model)
+        if model in failing:
+            raise RuntimeError(f"{model} failed")
+        await asyncio.sleep(latencies[model])
+        return f"answer from {model}"
+    return request
+
+
+class TestCascade(unittest.TestCase):
+    """Tests for routing by input."""
+
+    def test_simple_inputs(self):
+        """Short inputs with most vowels left count as simple."""
+        self.assertTrue(is_simple("Knnst du mr den wg zum bhnhf erkrn"))
+        self.assertFalse(is_simple("ih mss mrgn zm arzt ghn"))
+        self.assertFalse(is_simple("ich habe heute keine zeit weil ich noch arbeiten muss"))
+        self.assertFalse(is_simple("..."))
+
+    def test_cascade_routes_to_fast_or_large_model(self):
+        """Simple inputs go to the first model, the others to the last."""
+        router = Router(["fast", "medium", "large"], "cascade")
+        self.assertEqual(router.route("wie gehts dr"), ["fast"])
+        self.assertEqual(router.route("ih mss mrgn zm arzt ghn"), ["large"])
+
+    def test_invalid_configuration(self):
+        """Unknown policies and too few models are rejected."""
+        with self.assertRaises(ValueError):
+            Router(["a", "b"], "fastest")
+        with self.assertRaises(ValueError):
+            Router(["a"], "hedge")
+
+
+class TestHedge(unittest.TestCase):
+    """Tests for hedged requests."""
+
+    def setUp(self):
+        self.stats = ModelStats()
+        for _ in range(routing.HEDGE_MIN_SAMPLES):
+            self.stats.record("primary", 0.05)
+        self.router = Router(["primary", "backup"], "hedge", self.stats)
+
+    def test_fast_primary_is_not_hedged(self):
+        """A primary answering within its p90 is the only request."""
+        calls = []
+        model, result, hedged = asyncio.run(
+            self.router.run("x", fake_request({"primary": 0.0, "backup": 0.0}, calls)),
+        )
+        self.assertEqual((model, hedged), ("primary", False))
+        self.assertEqual(calls, ["primary"])
+
+    def test_slow_primary_is_hedged_and_cancelled(self):
+        """A slow primary triggers the backup, and the loser is cancelled."""
+        calls = []
+        cancelled = []
+        request = fake_request({"primary": 2.0, "backup": 0.0}, calls)
+
+        async def tracked(model):
+            try:
+                return await request(model)
+            except asyncio.CancelledError:
+                cancelled.append(model)
+                raise
+
+        start = time.monotonic()
+        model, result, hedged = asyncio.run(self.router.run("x", tracked))
+        self.assertEqual((model, result, hedged), ("backup", "answer from backup", True))
+        self.assertLess(time.monotonic() - start, 1.0)
+        self.assertEqual(cancelled, ["primary"], "primary request was not cancelled")
+
+    def test_losers_do_not_move_hedge_delay(self):
+        """Only completed requests are timed: cancelled and failed ones are not samples."""
+        asyncio.run(self.router.run("x", fake_request({"primary": 2.0, "backup": 0.0}, [])))
+        asyncio.run(self.router.run("x", fake_request({"backup": 0.0}, [], failing={"primary"})))
+        self.assertEqual(list(self.stats._samples["primary"]), [0.05] * routing.HEDGE_MIN_SAMPLES)
+        self.assertEqual(len(self.stats._samples["backup"]), 2)
+
+    def test_cancelled_while_waiting_to_hedge(self):
+        """Cancelling the caller before the hedge delay is over also cancels the primary."""
+        finished = []
+        cancelled = []
+
+        async def request(model):
+            try:
+                await asyncio.sleep(0.5)
+            except asyncio.CancelledError:
+                cancelled.append(model)
+                raise
+            finished.append(model)
+
+        async def cancel_early():
+            task = asyncio.ensure_future(self.router.run("x", request))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            await asyncio.sleep(0.6)
+
+        asyncio.run(cancel_early())
+        self.assertEqual((cancelled, finished), (["primary"], []))
+
+    def test_failed_primary_falls_back(self):
+        """An error of the primary starts the backup right away."""
+        calls = []
+        model, result, hedged = asyncio.run(self.router.run(
+            "x", fake_request({"primary": 0.0, "backup": 0.0}, calls, failing={"primary"}),
+        ))
+        self.assertEqual(model, "backup")
+        with self.assertRaisesRegex(RuntimeError, "primary failed"):
+            asyncio.run(self.router.run("x", fake_request({}, [], failing={"primary", "backup"})))
+
+    def test_hedge_delay_follows_p90(self):
+        """The delay is the p90 of recent latencies, bounded, with a default."""
+        stats = ModelStats()
+        self.assertEqual(stats.hedge_delay("m"), routing.HEDGE_DEFAULT_DELAY)
+        for ms in range(1, 11):
+            stats.record("m", ms / 10)
+        self.assertAlmostEqual(stats.hedge_delay("m"), 0.9)
+        stats.seed([{"model": "n", "spans": {"api_total": 60000}}] * routing.HEDGE_MIN_SAMPLES)
+        self.assertEqual(stats.hedge_delay("n"), routing.HEDGE_MAX_DELAY)
+
+
+if __name__ == "__main__":
+    unittest.main()
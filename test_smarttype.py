@@ -1,35 +1,97 @@
 """
 SmartType Unit Tests
 ====================
-Tests AI text completion with real API calls in DE and EN.
+Tests AI text completion in DE and EN.
 Verifies that sentences are correctly and meaningfully completed.
+
+SMARTTYPE_TEST_MODE selects where the completions come from:
+  replay (default)  recorded responses from fixtures/completions.json, offline;
+                    cases whose fixture is synthetic (hand-written) are skipped
+  record            real API calls, saved to the fixture file
+  live              real API calls, nothing saved
+Record and live mode run all cases concurrently on a thread pool.
 """
 
 import os
 import sys
+import functools
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 # Add project root to path
 sys.path.insert(0, str(Path(__file__).parent))
 
-from smarttype import complete_with_ai, load_prompt, client, MODEL
+import anthropic
+
+import smarttype.app as app
+from smarttype.app import complete_with_ai
+from smarttype.replay import AsyncReplayClient, ReplayClient, request_key
 
 SCRIPT_DIR = Path(__file__).parent
-PROMPT_DE = load_prompt("de")
-PROMPT_EN = load_prompt("en")
+FIXTURES = SCRIPT_DIR / "fixtures" / "completions.json"
+MODE = os.getenv("SMARTTYPE_TEST_MODE", "replay").strip().lower()
+WORKERS = int(os.getenv("SMARTTYPE_TEST_WORKERS", "8"))
+
+# Completion cases registered with @case: test name -> (text, lang, context)
+CASES = {}
+# Results of the cases (or the exception they raised), filled by setUpModule
+RESULTS = {}
 
 
 def complete(text: str, lang: str = "de", context: str = "") -> str:
-    """Helper: Completes text using the appropriate prompt."""
-    import smarttype
-    old_prompt = smarttype.current_prompt
-    smarttype.current_prompt = PROMPT_DE if lang == "de" else PROMPT_EN
-    try:
-        result = complete_with_ai(text, context_before=context)
-    finally:
-        smarttype.current_prompt = old_prompt
-    return result
+    """Helper: Completes text using the prompt of the given language."""
+    return complete_with_ai(text, context_before=context, language=lang)
+
+
+def case(text: str, lang: str = "de", context: str = ""):
+    """Registers a completion case; the decorated test receives its result."""
+    def decorator(test):
+        name = test.__qualname__
+        CASES[name] = (text, lang, context)
+
+        @functools.wraps(test)
+        def wrapper(self):
+            result = RESULTS[name]
+            if isinstance(result, Exception):
+                raise result
+            return test(self, result)
+        return wrapper
+    return decorator
+
+
+def setUpModule():
+    """Sets up the client for MODE and completes all registered cases."""
+    app.PROMPTS.update(app.load_prompts())
+    app.completion_cache = None
+    replay = None
+    if MODE == "replay":
+        replay = ReplayClient(FIXTURES)
+        app.async_client = AsyncReplayClient(replay)
+    elif not app.API_KEY:
+        raise unittest.SkipTest(f"CLAUDE_API_KEY is required in {MODE} mode")
+    elif MODE == "record":
+        app.async_client = AsyncReplayClient(ReplayClient(
+            FIXTURES, mode="record", client=anthropic.Anthropic(api_key=app.API_KEY),
+        ))
+    else:
+        app.async_client = anthropic.AsyncAnthropic(api_key=app.API_KEY)
+
+    def run(name):
+        text, lang, context = CASES[name]
+        if replay is not None:
+            params = app.batch_params(text, context, language=lang)
+            if replay.synthetic(request_key(params["system"], params["messages"])):
+                # A hand-written answer would only be checked against itself
+                return unittest.SkipTest("synthetic fixture, record it with SMARTTYPE_TEST_MODE=record")
+        try:
+            return complete(text, lang, context)
+        except Exception as e:
+            return e
+
+    workers = 1 if MODE == "replay" else WORKERS
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        RESULTS.update(zip(CASES, pool.map(run, CASES)))
 
 
 def verify(result: str, expected_words: list[str], forbidden_words: list[str] = None,
@@ -51,17 +113,17 @@ def verify(result: str, expected_words: list[str], forbidden_words: list[str] =
 class TestGermanCompletion(unittest.TestCase):
     """Tests for German text completion."""
 
-    def test_articles_and_prepositions(self):
+    @case("Katze schläft Sofa", lang="de")
+    def test_articles_and_prepositions(self, result):
         """'Katze schläft Sofa' → 'Die Katze schläft auf dem Sofa.'"""
-        result = complete("Katze schläft Sofa", lang="de")
         verify(result,
                expected_words=["die", "katze", "schläft", "auf", "dem", "sofa"],
                must_end_with=".", msg="Artikel+Präposition:")
         print(f"  OK: '{result}'")
 
-    def test_auxiliary_verb(self):
+    @case("Ich morgen Arzt gehen", lang="de")
+    def test_auxiliary_verb(self, result):
         """'Ich morgen Arzt gehen' → Hilfsverb + Präposition nötig."""
-        result = complete("Ich morgen Arzt gehen", lang="de")
         verify(result,
                expected_words=["ich", "morgen", "arzt", "gehen"],
                must_end_with=".", msg="Hilfsverb:")
@@ -73,25 +135,25 @@ class TestGermanCompletion(unittest.TestCase):
         )
         print(f"  OK: '{result}'")
 
-    def test_abbreviated_swimming(self):
+    @case("wln wr eign ma schw ghn", lang="de")
+    def test_abbreviated_swimming(self, result):
         """'wln wr eign ma schw ghn' → 'Wollen wir eigentlich mal schwimmen gehen?'"""
-        result = complete("wln wr eign ma schw ghn", lang="de")
         verify(result,
                expected_words=["wollen", "wir", "eigentlich", "mal", "schwimmen", "gehen"],
                must_end_with="?", msg="Abkürzungen:")
         print(f"  OK: '{result}'")
 
-    def test_abbreviated_hobbies(self):
+    @case("ih hbe sps bei vln din abr bsors brtsple", lang="de")
+    def test_abbreviated_hobbies(self, result):
         """'ih hbe sps bei vln din abr bsors brtsple' → korrekter Satz über Brettspiele."""
-        result = complete("ih hbe sps bei vln din abr bsors brtsple", lang="de")
         verify(result,
                expected_words=["ich", "habe", "spaß", "vielen", "dingen", "besonders", "brettspielen"],
                must_end_with=".", msg="Stark abgekürzt:")
         print(f"  OK: '{result}'")
 
-    def test_two_sentences(self):
+    @case("mir geht gut. Keine schmerzen", lang="de")
+    def test_two_sentences(self, result):
         """'mir geht gut. Keine schmerzen' → Zwei grammatisch korrekte Sätze."""
-        result = complete("mir geht gut. Keine schmerzen", lang="de")
         verify(result,
                expected_words=["mir", "geht", "gut", "keine", "schmerzen"],
                msg="Zwei Sätze:")
@@ -103,34 +165,33 @@ class TestGermanCompletion(unittest.TestCase):
         )
         print(f"  OK: '{result}'")
 
-    def test_context_grilling(self):
+    @case("knn ich etws mtbrngn", lang="de", context="Am Samstag grillen wir bei mir.")
+    def test_context_grilling(self, result):
         """Mit Kontext 'Grillen' → sinnvolle Antwort zum Mitbringen."""
-        result = complete("knn ich etws mtbrngn", lang="de",
-                          context="Am Samstag grillen wir bei mir.")
         verify(result,
                expected_words=["kann", "ich", "etwas", "mitbringen"],
                must_end_with="?", msg="Kontext Grillen:")
         print(f"  OK: '{result}'")
 
-    def test_question_time(self):
+    @case("Hst du hte Zt?", lang="de")
+    def test_question_time(self, result):
         """'Hst du hte Zt?' → 'Hast du heute Zeit?'"""
-        result = complete("Hst du hte Zt?", lang="de")
         verify(result,
                expected_words=["hast", "du", "heute", "zeit"],
                must_end_with="?", msg="Frage Zeit:")
         print(f"  OK: '{result}'")
 
-    def test_direction(self):
+    @case("Knnst du mr den wg zum bhnhf erkrn", lang="de")
+    def test_direction(self, result):
         """'Knnst du mr den wg zum bhnhf erkrn' → korrekter Satz."""
-        result = complete("Knnst du mr den wg zum bhnhf erkrn", lang="de")
         verify(result,
                expected_words=["kannst", "du", "mir", "weg", "bahnhof", "erklären"],
                must_end_with="?", msg="Wegbeschreibung:")
         print(f"  OK: '{result}'")
 
-    def test_weather(self):
+    @case("ds wttr ist hte shr schn", lang="de")
+    def test_weather(self, result):
         """'ds wttr ist hte shr schn' → korrekter Wettersatz."""
-        result = complete("ds wttr ist hte shr schn", lang="de")
         verify(result,
                expected_words=["wetter", "ist", "heute", "sehr", "schön"],
                must_end_with=".", msg="Wetter:")
@@ -140,17 +201,17 @@ class TestGermanCompletion(unittest.TestCase):
 class TestEnglishCompletion(unittest.TestCase):
     """Tests for English text completion."""
 
-    def test_articles_and_prepositions(self):
+    @case("cat sleeping sofa", lang="en")
+    def test_articles_and_prepositions(self, result):
         """'cat sleeping sofa' → 'The cat is sleeping on the sofa.'"""
-        result = complete("cat sleeping sofa", lang="en")
         verify(result,
                expected_words=["the", "cat", "sleeping", "on", "sofa"],
                must_end_with=".", msg="Articles:")
         print(f"  OK: '{result}'")
 
-    def test_auxiliary_verb(self):
+    @case("I tomorrow doctor go", lang="en")
+    def test_auxiliary_verb(self, result):
         """'I tomorrow doctor go' → need auxiliary + preposition."""
-        result = complete("I tomorrow doctor go", lang="en")
         verify(result,
                expected_words=["i", "tomorrow", "doctor"],
                must_end_with=".", msg="Auxiliary:")
@@ -161,25 +222,25 @@ class TestEnglishCompletion(unittest.TestCase):
         )
         print(f"  OK: '{result}'")
 
-    def test_abbreviated_swimming(self):
+    @case("wnt we actly go swmmng", lang="en")
+    def test_abbreviated_swimming(self, result):
         """'wnt we actly go swmmng' → correct swimming question."""
-        result = complete("wnt we actly go swmmng", lang="en")
         verify(result,
                expected_words=["want", "actually", "go", "swimming"],
                must_end_with="?", msg="Swimming:")
         print(f"  OK: '{result}'")
 
-    def test_abbreviated_hobbies(self):
+    @case("i hve fun mny thngs but espcly bord gmes", lang="en")
+    def test_abbreviated_hobbies(self, result):
         """'i hve fun mny thngs but espcly bord gmes' → correct hobby sentence."""
-        result = complete("i hve fun mny thngs but espcly bord gmes", lang="en")
         verify(result,
                expected_words=["have", "fun", "many", "things", "especially", "board", "games"],
                must_end_with=".", msg="Hobbies:")
         print(f"  OK: '{result}'")
 
-    def test_two_sentences(self):
+    @case("me feeling good. no pain", lang="en")
+    def test_two_sentences(self, result):
         """'me feeling good. no pain' → Two correct sentences."""
-        result = complete("me feeling good. no pain", lang="en")
         verify(result,
                expected_words=["feeling", "good", "no", "pain"],
                msg="Two sentences:")
@@ -189,34 +250,33 @@ class TestEnglishCompletion(unittest.TestCase):
         )
         print(f"  OK: '{result}'")
 
-    def test_context_barbecue(self):
+    @case("cn i brng smthng", lang="en", context="We're having a barbecue on Saturday.")
+    def test_context_barbecue(self, result):
         """With context 'barbecue' → meaningful offer to bring something."""
-        result = complete("cn i brng smthng", lang="en",
-                          context="We're having a barbecue on Saturday.")
         verify(result,
                expected_words=["can", "i", "bring", "something"],
                must_end_with="?", msg="Context BBQ:")
         print(f"  OK: '{result}'")
 
-    def test_question_time(self):
+    @case("Do yu hve tme tdy?", lang="en")
+    def test_question_time(self, result):
         """'Do yu hve tme tdy?' → 'Do you have time today?'"""
-        result = complete("Do yu hve tme tdy?", lang="en")
         verify(result,
                expected_words=["do", "you", "have", "time", "today"],
                must_end_with="?", msg="Question time:")
         print(f"  OK: '{result}'")
 
-    def test_directions(self):
+    @case("cn yu tll me hw to gt to th sttion", lang="en")
+    def test_directions(self, result):
         """'cn yu tll me hw to gt to th sttio' → correct direction question."""
-        result = complete("cn yu tll me hw to gt to th sttion", lang="en")
         verify(result,
                expected_words=["can", "you", "tell", "me", "how", "to", "get", "station"],
                must_end_with="?", msg="Directions:")
         print(f"  OK: '{result}'")
 
-    def test_weather(self):
+    @case("th wthr is vry nce tdy", lang="en")
+    def test_weather(self, result):
         """'th wthr is vry nce tdy' → correct weather sentence."""
-        result = complete("th wthr is vry nce tdy", lang="en")
         verify(result,
                expected_words=["weather", "is", "very", "nice", "today"],
                must_end_with=".", msg="Weather:")
@@ -0,0 +1,39 @@
+"""
+SmartType Sound Tests
+=====================
+Tests the pre-rendered feedback sounds.
+"""
+
+import io
+import sys
+import wave
+import unittest
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from smarttype.sound import PATTERNS, SAMPLE_RATE, NullPlayer, render
+
+
+class TestSound(unittest.TestCase):
+    """Tests for WAV rendering and the silent player."""
+
+    def test_render_length_and_format(self):
+        """A pattern renders to a 16-bit mono WAV as long as its tones and pauses."""
+        with wave.open(io.BytesIO(render(PATTERNS["done"]))) as wav:
+            self.assertEqual((wav.getnchannels(), wav.getsampwidth()), (1, 2))
+            self.assertEqual(wav.getframerate(), SAMPLE_RATE)
+            self.assertEqual(wav.getnframes(), int(SAMPLE_RATE * 0.15) * 2 + int(SAMPLE_RATE * 0.1))
+
+    def test_null_player_checks_names(self):
+        """The silent player accepts every known sound and rejects typos."""
+        player = NullPlayer()
+        for name in [*PATTERNS, "warning", "error"]:
+            player.play(name)
+        with self.assertRaises(KeyError):
+            player.play("dnoe")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+"""
+SmartType Usage Tests
+=====================
+Tests the token usage store: batched background writes, totals and
+costs per group, and flagging configurations whose tokens per
+completion drift upward.
+"""
+
+import sys
+import time
+import tempfile
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from smarttype import usage
+from smarttype.usage import UsageStore, cost, find_drift, format_usage_report, summarize_usage
+
+SONNET = "claude-sonnet-4-5-20250929"
+HAIKU = "claude-haiku-4-5-20251001"
+
+
+def tokens(input_tokens, output_tokens, cache_read=0, cache_write=0):
+    return SimpleNamespace(input_tokens=input_tokens, output_tokens=output_tokens,
+                           cache_read_input_tokens=cache_read, cache_creation_input_tokens=cache_write)
+
+
+class TestUsageStore(unittest.TestCase):
+    """Tests for UsageStore and the usage reports."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "usage.sqlite3"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def insert(self, rows):
+        """Inserts (days ago, model, language, prompt, input tokens, output tokens) rows."""
+        db = usage._connect(self.path)
+        now = time.time()
+        with db:
+            db.executemany(
+                "INSERT INTO requests VALUES (?, ?, ?, ?, 'create', ?, ?, 0, 0, 500, 'ok')",
+                [(now - days * 86400, *row) for days, *row in rows],
+            )
+        db.close()
+
+    def test_record_and_summarize(self):
+        """Queued rows are written on close and totalled per model and language."""
+        store = UsageStore(self.path, batch_size=2, flush_interval=60)
+        store.record(SONNET, tokens(100, 20, cache_read=1000), language="de", prompt="a", latency=0.4)
+        store.record(SONNET, tokens(120, 30), language="de", prompt="a", latency=0.6)
+        store.record(HAIKU, tokens(80, 10, cache_write=1200), language="en", prompt="b", latency=0.2)
+        store.record(HAIKU, None, language="en", prompt="b", outcome="cancelled")
+        store.close()
+
+        summary = summarize_usage(self.path, ("model", "language"))
+        self.assertEqual([(row["model"], row["requests"], row["errors"]) for row in summary],
+                         [(HAIKU, 2, 1), (SONNET, 2, 0)])
+        sonnet = summary[1]
+        self.assertEqual((sonnet["input_tokens"], sonnet["output_tokens"], sonnet["cache_read_tokens"]),
+                         (220, 50, 1000))
+        self.assertAlmostEqual(sonnet["latency_ms"], 500)
+        self.assertAlmostEqual(sonnet["cost"], (220 * 3 + 1000 * 0.3 + 50 * 15) / 1e6)
+
+        by_day = summarize_usage(self.path, ("day",))
+        self.assertEqual(len(by_day), 1)
+        self.assertAlmostEqual(by_day[0]["cost"], sum(row["cost"] for row in summary))
+        report = format_usage_report(by_day, [], ("day",))
+        self.assertIn("total", report)
+
+    def test_cost(self):
+        """Cache reads and writes are priced relative to input tokens; unknown models have no price."""
+        self.assertAlmostEqual(cost(HAIKU, 0, 0, cache_read_tokens=1_000_000, cache_write_tokens=1_000_000),
+                               0.1 + 1.25)
+        self.assertIsNone(cost("some-other-model", 100, 10))
+
+    def test_drift(self):
+        """A configuration whose completions grew by more than the threshold is flagged."""
+        rows = []
+        for day in range(30):
+            recent = day < usage.DRIFT_RECENT_DAYS
+            rows += [(day + 0.5, SONNET, "de", "a", 400 if recent else 300, 30)] * 3
+            rows += [(day + 0.5, SONNET, "en", "a", 310, 30)] * 3
+        self.insert(rows)
+        drifting = find_drift(self.path)
+        self.assertEqual([(row["model"], row["language"]) for row in drifting], [(SONNET, "de")])
+        self.assertAlmostEqual(drifting[0]["change"], 100 / 330)
+        self.assertIn("drifting upward", format_usage_report(summarize_usage(self.path), drifting))
+
+
+if __name__ == "__main__":
+    unittest.main()